@@ -0,0 +1,88 @@
+"""
+Compares the NumPy TimelineMixer against the old pydub overlay path on a
+synthetic timeline (default: 2 hours, 2,000 segments).
+
+    python -m benchmarks.bench_mixing
+    python -m benchmarks.bench_mixing --minutes 10 --segments 200 --pydub-segments 200
+
+The pydub path copies the whole track on every overlay, so by default only
+--pydub-segments overlays are timed and the total is extrapolated linearly.
+"""
+import argparse
+import time
+
+import numpy as np
+from pydub import AudioSegment
+
+from src.mixer import TimelineMixer, array_to_segment, segment_to_array
+
+
+def make_clips(n_segments, total_seconds, clip_rate=24000, seed=0):
+    rng = np.random.default_rng(seed)
+    starts_ms = np.sort(rng.uniform(0, (total_seconds - 5) * 1000, n_segments)).astype(int)
+    clips = []
+    for start_ms in starts_ms:
+        n = int(rng.uniform(1.0, 4.0) * clip_rate)
+        samples = (rng.standard_normal(n) * 3000).astype(np.int16)
+        clips.append((int(start_ms), AudioSegment(
+            data=samples.tobytes(), sample_width=2, frame_rate=clip_rate, channels=1
+        )))
+    return clips
+
+
+def bench_numpy(background, clips, sample_rate):
+    start = time.perf_counter()
+    mixer = TimelineMixer(len(background), sample_rate=sample_rate)
+    for start_ms, clip in clips:
+        mixer.add(segment_to_array(clip, sample_rate, 1), mixer.ms_to_frames(start_ms))
+    out = mixer.render(background, background_gain_db=-8.0)
+    elapsed = time.perf_counter() - start
+    return elapsed, out
+
+
+def bench_pydub(background, clips, sample_rate, n_timed):
+    background_segment = array_to_segment(background, sample_rate)
+    total_ms = len(background_segment)
+    start = time.perf_counter()
+    speech_track = AudioSegment.silent(duration=total_ms, frame_rate=sample_rate)
+    for start_ms, clip in clips[:n_timed]:
+        speech_track = speech_track.overlay(clip, position=start_ms)
+    overlay_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    (background_segment - 8).overlay(speech_track)
+    final_time = time.perf_counter() - start
+
+    per_overlay = overlay_time / max(1, n_timed)
+    return per_overlay * len(clips) + final_time, per_overlay
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=120)
+    parser.add_argument("--segments", type=int, default=2000)
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    parser.add_argument("--pydub-segments", type=int, default=10,
+                        help="Overlays to actually time on the pydub path (rest is extrapolated)")
+    args = parser.parse_args()
+
+    total_seconds = args.minutes * 60
+    n_frames = int(total_seconds * args.sample_rate)
+    print(f"Timeline: {args.minutes:g} min, {args.segments} segments, {args.sample_rate} Hz stereo")
+
+    rng = np.random.default_rng(1)
+    background = (rng.standard_normal((n_frames, 2)) * 2000).astype(np.int16)
+    clips = make_clips(args.segments, total_seconds)
+
+    numpy_time, _ = bench_numpy(background, clips, args.sample_rate)
+    print(f"NumPy mixer: {numpy_time:.2f}s")
+
+    n_timed = min(args.pydub_segments, len(clips))
+    pydub_time, per_overlay = bench_pydub(background, clips, args.sample_rate, n_timed)
+    note = "" if n_timed == len(clips) else f" (extrapolated from {n_timed} overlays, {per_overlay:.3f}s each)"
+    print(f"pydub overlay: {pydub_time:.2f}s{note}")
+    print(f"Speed-up: {pydub_time / numpy_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+End-to-end pipeline benchmark on synthetic media, no GPU, tokens or network.
+
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --minutes 1 10 --update-baseline
+    python -m benchmarks.bench_pipeline --minutes 1 --separation-rtf 0 --asr-rtf 0
+
+For each length a synthetic video is generated with ffmpeg (a test pattern
+plus a stereo track: tone "lines" 3.5s on / 1.5s off on the left, a
+steady "music" tone on the right) and run through the same stages as the
+web UI (extract, separate, transcribe, dub) with the heavy models replaced
+by deterministic fakes:
+
+    separator  left channel -> Vocals, right -> Instrumental, sleeping
+               --separation-rtf seconds per second of audio, per model
+    WhisperX   one segment per voiced stretch (energy based), three
+               rotating speakers, sleeping --asr-rtf seconds per second
+    edge-tts   FakeTTSBackend with --tts-latency seconds per request
+
+The default costs are in line with the real models on a 6GB GPU: an
+MDX-Net model separates at about 10x realtime (0.1; CPU is closer to
+1.0), WhisperX large-v2 int8 with alignment and diarization runs at about
+20x realtime (0.05), and an edge-tts request takes 0.5-1.5s round trip
+(0.8). Pass 0 for any of them to time only the real code around it.
+
+Extraction, resampling, planning, time fitting, mixing and encoding are
+the real code. Every length runs in a fresh interpreter so peak memory
+is per run. Reported per stage: wall time, throughput (seconds of media
+per wall second) and peak RSS; synthesize is dub.tts, mix is dub.mix +
+dub.render.
+
+Results are compared with --baseline. The run fails if a stage's
+throughput drops, or its peak memory grows, by more than --tolerance, and
+also if there is no baseline for a length or it was recorded with other
+fake costs. --update-baseline writes the results as the new baseline;
+record it on the machine the check runs on. Needs ffmpeg on PATH.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pipeline_baseline.json")
+STAGES = ["extract", "separate", "transcribe", "synthesize", "mix"]
+# Pipeline metrics stages that make up each reported stage
+STAGE_SOURCES = {
+    "extract": ["extract"],
+    "separate": ["separate"],
+    "transcribe": ["transcribe"],
+    "synthesize": ["dub.tts"],
+    "mix": ["dub.mix", "dub.render"]
+}
+LINE_SECONDS, GAP_SECONDS = 3.5, 1.5
+SPEAKERS = ["SPEAKER_00", "SPEAKER_01", "SPEAKER_02"]
+
+
+def make_video(path, minutes):
+    """
+    Writes a synthetic test video of `minutes` length with ffmpeg.
+    """
+    seconds = minutes * 60
+    period = LINE_SECONDS + GAP_SECONDS
+    voice = f"0.3*sin(2*PI*220*t)*lt(mod(t\\,{period})\\,{LINE_SECONDS})"
+    music = "0.1*sin(2*PI*110*t)"
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size=160x120:rate=5:duration={seconds}",
+        "-f", "lavfi", "-i", f"aevalsrc={voice}|{music}:s=44100:d={seconds}",
+        "-c:v", "mpeg4", "-q:v", "10", "-c:a", "aac", "-b:a", "128k", "-shortest", path
+    ], check=True)
+    return path
+
+
+def _fake_stem_model_class():
+    from src.chunked_separation import StemModel
+
+    class FakeStemModel(StemModel):
+        """
+        Vocals = left channel, Instrumental = right channel (both duplicated
+        to stereo), after sleeping `rtf` seconds per second of audio.
+        """
+        stems = ("Vocals", "Instrumental")
+
+        def __init__(self, name, rtf):
+            self._name = name
+            self.rtf = rtf
+
+        @property
+        def name(self):
+            return self._name
+
+        def separate(self, chunk, sample_rate):
+            if self.rtf:
+                time.sleep(self.rtf * len(chunk) / float(sample_rate))
+            left, right = chunk[:, :1], chunk[:, 1:2]
+            return {"Vocals": left.repeat(chunk.shape[1], axis=1), "Instrumental": right.repeat(chunk.shape[1], axis=1)}
+
+    return FakeStemModel
+
+
+class FakeTranscriber:
+    """
+    Stands in for Transcriber: loads the vocals the same way, then finds one
+    segment per voiced stretch with FakeWhisperModel and gives it a speaker
+    and text of a plausible length for its duration.
+    """
+    def __init__(self, rtf, chars_per_second=14.0):
+        self.device = "cpu"
+        self.rtf = rtf
+        self.chars_per_second = chars_per_second
+
+    def transcribe_and_diarize(self, audio_path, num_speakers=None, task="transcribe"):
+        from src.transcriber import Transcriber
+        from src.sharded_transcription import FakeWhisperModel, SAMPLE_RATE
+        from src.segment_table import SegmentTable
+
+        audio = Transcriber.load_audio(audio_path)
+        if self.rtf:
+            time.sleep(self.rtf * len(audio) / float(SAMPLE_RATE))
+        segments = FakeWhisperModel().transcribe(audio, task=task)["segments"]
+        for i, seg in enumerate(segments):
+            n_chars = max(4, int((seg["end"] - seg["start"]) * self.chars_per_second))
+            seg["text"] = ("lorem ipsum dolor sit amet " * (n_chars // 27 + 1))[:n_chars].strip()
+            seg["speaker"] = SPEAKERS[i % len(SPEAKERS)]
+            for word in seg["words"]:
+                word["speaker"] = seg["speaker"]
+        return SegmentTable.from_whisperx(segments)
+
+
+def run_one(minutes, media_dir, args):
+    """
+    Runs every stage once on a `minutes` long video; returns the stage report.
+    """
+    from src import separation_service
+    from src.dubbing_engine import DubbingEngine
+    from src.job_store import JobStore
+    from src.pipeline import DubbingPipeline
+    from src.tts_backend import FakeTTSBackend
+
+    video_path = os.path.join(media_dir, f"synthetic_{minutes:g}min.mp4")
+    if not os.path.exists(video_path):
+        print(f"Generating {minutes:g} min synthetic video...")
+        make_video(video_path, minutes)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    try:
+        store = JobStore(work_dir)
+        pipeline = DubbingPipeline(
+            job_store=store,
+            device="cpu",
+            chunk_seconds=args.chunk_seconds,
+            dubbing=DubbingEngine(tts_backend=FakeTTSBackend(latency=args.tts_latency))
+        )
+        # The pipeline's separation goes through the process-wide service
+        fake_model = _fake_stem_model_class()
+        separation_service._default_service = separation_service.SeparationService(
+            pipeline.model_dir, model_factory=lambda name: fake_model(name, args.separation_rtf)
+        )
+        pipeline._transcriber = FakeTranscriber(args.asr_rtf)
+
+        job = pipeline.open_job(video_path)
+        start = time.perf_counter()
+        extract_key, audio_path, _ = pipeline.extract(job)
+        separate_key, (vocals_path, inst_path), _ = pipeline.separate(job, extract_key, audio_path)
+        transcribe_key, segments, _ = pipeline.transcribe(job, separate_key, vocals_path)
+        pipeline.dub(job, transcribe_key, segments, inst_path)
+        total = time.perf_counter() - start
+
+        recorded = {record["stage"]: record for record in job.metrics.to_dict()["stages"]}
+        media_seconds = minutes * 60.0
+        report = {"minutes": minutes, "segments": len(segments), "total_seconds": round(total, 3),
+                  "settings": bench_settings(args), "stages": {}}
+        for stage in STAGES:
+            records = [recorded[name] for name in STAGE_SOURCES[stage] if name in recorded]
+            wall = sum(record["wall_seconds"] for record in records)
+            peaks = [record["peak_rss_bytes"] for record in records if record["peak_rss_bytes"]]
+            report["stages"][stage] = {
+                "wall_seconds": round(wall, 3),
+                "throughput": round(media_seconds / wall, 2) if wall else None,
+                "peak_rss_mb": round(max(peaks) / 1024 ** 2, 1) if peaks else None,
+                "error": next((record["error"] for record in records if record["error"]), None)
+            }
+        return report
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_settings(args):
+    """
+    Fake costs and windowing a run was made with; results only compare under the same ones.
+    """
+    return {
+        "chunk_seconds": args.chunk_seconds,
+        "separation_rtf": args.separation_rtf,
+        "asr_rtf": args.asr_rtf,
+        "tts_latency": args.tts_latency
+    }
+
+
+def run_isolated(minutes, media_dir, args):
+    """
+    run_one in a fresh interpreter, so each length's peak memory is its own.
+    """
+    out_path = os.path.join(media_dir, f"report_{minutes:g}min.json")
+    command = [
+        sys.executable, "-m", "benchmarks.bench_pipeline", "--run-one", str(minutes),
+        "--media-dir", media_dir, "--report-path", out_path,
+        "--chunk-seconds", str(args.chunk_seconds),
+        "--separation-rtf", str(args.separation_rtf), "--asr-rtf", str(args.asr_rtf),
+        "--tts-latency", str(args.tts_latency)
+    ]
+    subprocess.run(command, check=True)
+    with open(out_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def print_report(report):
+    print(f"\n{report['minutes']:g} min, {report['segments']} segments, {report['total_seconds']:.1f}s total")
+    print(f"  {'stage':<12}{'wall s':>10}{'x realtime':>12}{'peak MB':>10}")
+    for stage in STAGES:
+        row = report["stages"][stage]
+        throughput = f"{row['throughput']:.1f}" if row["throughput"] else "-"
+        peak = f"{row['peak_rss_mb']:.0f}" if row["peak_rss_mb"] else "-"
+        print(f"  {stage:<12}{row['wall_seconds']:>10.2f}{throughput:>12}{peak:>10}")
+
+
+def check_regressions(reports, baseline, tolerance):
+    """
+    Failure messages for stages slower or bigger than the baseline allows.
+    """
+    failures = []
+    for report in reports:
+        expected = baseline.get(f"{report['minutes']:g}")
+        if expected is None:
+            failures.append(f"{report['minutes']:g} min: no baseline (run with --update-baseline)")
+        elif expected.get("settings") != report["settings"]:
+            failures.append(f"{report['minutes']:g} min: baseline recorded with {expected.get('settings')}, "
+                            f"this run used {report['settings']}")
+            expected = None
+        for stage, row in report["stages"].items():
+            if row["error"]:
+                failures.append(f"{report['minutes']:g} min {stage}: {row['error']}")
+            if expected is None:
+                continue
+            base = expected.get("stages", {}).get(stage)
+            if not base:
+                failures.append(f"{report['minutes']:g} min {stage}: not in baseline")
+                continue
+            if base["throughput"] and row["throughput"] and row["throughput"] < base["throughput"] * (1 - tolerance):
+                failures.append(f"{report['minutes']:g} min {stage}: throughput {row['throughput']}x "
+                                f"< baseline {base['throughput']}x")
+            if base["peak_rss_mb"] and row["peak_rss_mb"] and row["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+                failures.append(f"{report['minutes']:g} min {stage}: peak {row['peak_rss_mb']} MB "
+                                f"> baseline {base['peak_rss_mb']} MB")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 10, 120])
+    parser.add_argument("--media-dir", default=None, help="Where synthetic videos are generated and reused")
+    parser.add_argument("--chunk-seconds", type=float, default=60.0, help="Separation window length")
+    parser.add_argument("--separation-rtf", type=float, default=0.1,
+                        help="Fake separation seconds per second of audio, per model")
+    parser.add_argument("--asr-rtf", type=float, default=0.05,
+                        help="Fake transcription seconds per second of audio")
+    parser.add_argument("--tts-latency", type=float, default=0.8, help="Fake seconds per TTS request")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--report", default=None, help="Write all results to this JSON file")
+    parser.add_argument("--run-one", type=float, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--report-path", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    media_dir = args.media_dir or os.path.join(tempfile.gettempdir(), "dub_bench_media")
+    os.makedirs(media_dir, exist_ok=True)
+
+    if args.run_one is not None:
+        report = run_one(args.run_one, media_dir, args)
+        with open(args.report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return
+
+    if shutil.which("ffmpeg") is None:
+        print("ffmpeg not found on PATH")
+        sys.exit(1)
+
+    reports = [run_isolated(minutes, media_dir, args) for minutes in args.minutes]
+    for report in reports:
+        print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({f"{report['minutes']:g}": report for report in reports}, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nFAIL: no baseline at {args.baseline}; run with --update-baseline to record one.")
+        sys.exit(1)
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    failures = check_regressions(reports, baseline, args.tolerance)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Cold-start cost of the app: time to import `main` (GPU setup + web UI
+module) in a fresh interpreter, before anything is loaded on first use.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --max-seconds 1.0 --target src.web_ui
+
+Exits non-zero if the median import time exceeds --max-seconds, or if
+importing the target drags in any of the heavy subsystems (torch,
+whisperx, gradio, audio-separator, ...) that should load lazily, so it can
+run as a start-up regression check. The slowest imports of the last run
+are listed from `python -X importtime`.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Must not be imported until a request needs them
+HEAVY_MODULES = [
+    "torch", "whisperx", "gradio", "audio_separator", "onnxruntime",
+    "pydub", "requests", "edge_tts"
+]
+
+PROBE_SCRIPT = (
+    "import sys, time, json; start = time.perf_counter(); import {target}; "
+    "elapsed = time.perf_counter() - start; "
+    "print(json.dumps([elapsed, [m for m in {heavy!r} if m in sys.modules]]))"
+)
+
+
+def time_import(target):
+    script = PROBE_SCRIPT.format(target=target, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", script],
+                            capture_output=True, text=True, check=True)
+    elapsed, loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return elapsed, loaded, result.stderr
+
+
+def slowest_imports(importtime_log, top):
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="main", help="Module to import")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=1.5,
+                        help="Fail if the median import time is above this")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.runs):
+        elapsed, loaded, log = time_import(args.target)
+        timings.append(elapsed)
+
+    median = statistics.median(timings)
+    print(f"import {args.target}: median {median * 1000:.1f} ms, "
+          f"min {min(timings) * 1000:.1f} ms, max {max(timings) * 1000:.1f} ms ({args.runs} runs)")
+    print("Slowest imports (cumulative):")
+    for micros, name in slowest_imports(log, args.top):
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: heavy modules imported at start-up: {', '.join(loaded)}")
+        failed = True
+    if median > args.max_seconds:
+        print(f"FAIL: median import time {median:.2f}s exceeds {args.max_seconds:.2f}s")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
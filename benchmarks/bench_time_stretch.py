@@ -0,0 +1,55 @@
+"""
+Measures time-fitting throughput (clips/sec) of the batched NumPy WSOLA on
+synthetic speech-length clips, against fitting the same clips one at a time.
+
+    python -m benchmarks.bench_time_stretch
+    python -m benchmarks.bench_time_stretch --clips 2000 --batch 64
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.time_stretch import wsola_batch
+
+
+def make_clips(n_clips, sample_rate, seed=0):
+    # Harmonic tones with a little noise; 1-5 s like typical TTS lines
+    rng = np.random.default_rng(seed)
+    clips = []
+    for _ in range(n_clips):
+        n = int(rng.uniform(1.0, 5.0) * sample_rate)
+        t = np.arange(n) / sample_rate
+        f0 = rng.uniform(90, 250)
+        clip = sum(np.sin(2 * np.pi * f0 * h * t) / h for h in range(1, 6))
+        clips.append((0.2 * clip + 0.01 * rng.standard_normal(n)).astype(np.float32))
+    rates = rng.uniform(1.05, 1.35, n_clips)
+    return clips, rates
+
+
+def bench(clips, rates, sample_rate, batch):
+    start = time.perf_counter()
+    for i in range(0, len(clips), batch):
+        wsola_batch(clips[i:i + batch], rates[i:i + batch], sample_rate)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=32, help="Clips per wsola_batch call")
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    args = parser.parse_args()
+
+    clips, rates = make_clips(args.clips, args.sample_rate)
+    audio_seconds = sum(len(c) for c in clips) / args.sample_rate
+    print(f"{args.clips} clips, {audio_seconds:.0f}s of audio at {args.sample_rate} Hz")
+
+    for batch in sorted({1, args.batch}):
+        elapsed = bench(clips, rates, args.sample_rate, batch)
+        print(f"batch={batch:<4d} {elapsed:.2f}s  {args.clips / elapsed:.1f} clips/sec  "
+              f"{audio_seconds / elapsed:.0f}x realtime")
+
+
+if __name__ == "__main__":
+    main()
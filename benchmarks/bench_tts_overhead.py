@@ -0,0 +1,94 @@
+"""
+Per-line TTS overhead: one subprocess + temp file + decode per line (the
+CLI path) against in-process synthesis streamed into memory.
+
+    python -m benchmarks.bench_tts_overhead
+    python -m benchmarks.bench_tts_overhead --real --lines 20
+
+By default both paths use FakeTTSBackend, so the difference is pure
+overhead (interpreter start-up, imports, temp file, re-decode) with no
+network. --real times the actual edge-tts CLI against EdgeTTSBackend
+(needs network access, edge-tts and ffmpeg for MP3 decoding).
+"""
+import argparse
+import io
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from src.mixer import load_audio_array
+from src.tts_backend import EdgeTTSBackend, EdgeTTSCLIBackend, FakeTTSBackend
+
+VOICE = "en-US-AriaNeural"
+
+# What a per-line CLI call costs with the fake backend: a fresh interpreter
+# that imports the backend and writes the clip to disk
+CLI_SCRIPT = (
+    "import sys; from src.tts_backend import FakeTTSBackend; "
+    "FakeTTSBackend().synthesize(sys.argv[1], sys.argv[2], sys.argv[3])"
+)
+
+
+def make_lines(n):
+    return [f"Line number {i}, a short piece of dialogue to dub." for i in range(n)]
+
+
+def time_cli(lines, work_dir, real):
+    backend = EdgeTTSCLIBackend()
+    timings = []
+    for i, text in enumerate(lines):
+        path = os.path.join(work_dir, f"line_{i}.mp3" if real else f"line_{i}.wav")
+        start = time.perf_counter()
+        if real:
+            backend.synthesize(text, VOICE, path)
+        else:
+            subprocess.run([sys.executable, "-c", CLI_SCRIPT, text, VOICE, path], check=True)
+        load_audio_array(path)
+        os.remove(path)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def time_in_process(lines, real):
+    backend = EdgeTTSBackend() if real else FakeTTSBackend()
+    timings = []
+    for text in lines:
+        start = time.perf_counter()
+        data = backend.synthesize_bytes(text, VOICE)
+        load_audio_array(io.BytesIO(data), format=backend.extension)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name, timings):
+    print(f"{name:<12} mean {statistics.mean(timings) * 1000:8.1f} ms/line   "
+          f"median {statistics.median(timings) * 1000:8.1f} ms/line   total {sum(timings):.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--real", action="store_true", help="Use edge-tts over the network")
+    args = parser.parse_args()
+
+    lines = make_lines(args.lines)
+    work_dir = tempfile.mkdtemp(prefix="bench_tts_")
+    try:
+        cli = time_cli(lines, work_dir, args.real)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    in_process = time_in_process(lines, args.real)
+
+    print(f"{args.lines} lines ({'edge-tts' if args.real else 'fake backend'})")
+    report("CLI", cli)
+    report("in-process", in_process)
+    print(f"Per-line overhead saved: {(statistics.mean(cli) - statistics.mean(in_process)) * 1000:.1f} ms "
+          f"({statistics.mean(cli) / statistics.mean(in_process):.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,21 @@
+import os
+import argparse
+
 from src import gpu_setup
 gpu_setup.setup_gpu_environment()
 
 from src.web_ui import create_ui
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Movie Dub Maker")
+    parser.add_argument("--warm-up", action="store_true",
+                        help="Load WhisperX (and diarization, if HF_TOKEN is set) before serving")
+    args = parser.parse_args()
+
+    if args.warm_up:
+        from src.transcriber import Transcriber
+        Transcriber(device="cuda", compute_type="int8", hf_token=os.environ.get("HF_TOKEN")).warm_up()
+
     print("Launching AI Movie Dub Maker...")
     app = create_ui()
     app.launch(inbrowser=True, share=True)
@@ -0,0 +1,253 @@
+import os
+import math
+import wave
+import subprocess
+import numpy as np
+from src.chunked_separation import WavReader
+
+# WhisperX expects 16 kHz mono float32
+WHISPER_SAMPLE_RATE = 16000
+INGEST_BLOCK_SECONDS = 10
+
+
+class Resampler:
+    """
+    Streaming polyphase resampler (Kaiser-windowed sinc) for float32
+    (frames, channels) blocks. Feed blocks with process() and finish with
+    flush(); the output is the same as resampling the whole signal at once.
+    """
+    def __init__(self, in_rate, out_rate, half_taps=32, cutoff=0.95, beta=8.0):
+        g = math.gcd(int(in_rate), int(out_rate))
+        self.up = int(out_rate) // g
+        self.down = int(in_rate) // g
+        self.half = half_taps
+        self.offsets = np.arange(-half_taps + 1, half_taps + 1)
+
+        # One filter per output phase; output n sits at input position n * down / up
+        fc = cutoff * min(1.0, self.up / float(self.down))
+        distance = self.offsets[None, :] - np.arange(self.up)[:, None] / float(self.up)
+        taper = np.clip(1.0 - (distance / half_taps) ** 2, 0.0, None)
+        table = np.sinc(fc * distance) * np.i0(beta * np.sqrt(taper)) / np.i0(beta)
+        self.table = (table / table.sum(axis=1, keepdims=True)).astype(np.float32)
+
+        self._buffer = None
+        self._buffer_start = -half_taps
+        self._next_out = 0
+        self._n_in = 0
+
+    def _produce(self, n_stop):
+        n = np.arange(self._next_out, n_stop)
+        if len(n) == 0:
+            return np.zeros((0, self._buffer.shape[1]), dtype=np.float32)
+        base = (n * self.down) // self.up
+        phase = (n * self.down) % self.up
+        taps = self._buffer[base[:, None] + self.offsets[None, :] - self._buffer_start]
+        out = np.einsum("ntc,nt->nc", taps, self.table[phase])
+        self._next_out = n_stop
+        # Keep only what the next output still needs
+        keep_from = (n_stop * self.down) // self.up - self.half + 1 - self._buffer_start
+        if keep_from > 0:
+            self._buffer = self._buffer[keep_from:]
+            self._buffer_start += keep_from
+        return out
+
+    def process(self, block):
+        block = np.asarray(block, dtype=np.float32)
+        if self._buffer is None:
+            self._buffer = np.zeros((self.half, block.shape[1]), dtype=np.float32)
+        self._buffer = np.concatenate([self._buffer, block])
+        self._n_in += len(block)
+        end = self._buffer_start + len(self._buffer)
+        if end - self.half <= 0:
+            return np.zeros((0, block.shape[1]), dtype=np.float32)
+        # Outputs whose rightmost tap is already buffered
+        n_stop = ((end - self.half) * self.up + self.down - 1) // self.down
+        return self._produce(n_stop)
+
+    def flush(self):
+        if self._buffer is None:
+            return np.zeros((0, 1), dtype=np.float32)
+        channels = self._buffer.shape[1]
+        self._buffer = np.concatenate([self._buffer, np.zeros((self.half, channels), dtype=np.float32)])
+        n_total = (self._n_in * self.up + self.down - 1) // self.down
+        return self._produce(max(n_total, self._next_out))
+
+
+def _remix(block, channels):
+    if block.shape[1] == channels:
+        return block
+    if channels == 1:
+        return block.mean(axis=1, keepdims=True)
+    raise ValueError(f"Cannot remix {block.shape[1]} channels to {channels}")
+
+
+def _derived_path(path, sample_rate, channels):
+    return f"{os.path.splitext(path)[0]}.{sample_rate}x{channels}.f32"
+
+
+class AudioBuffer:
+    """
+    Decoded audio shared by every stage that needs it.
+
+    Wraps a (frames, channels) int16 or float32 array, usually a read-only
+    memory map over a WAV file, so views cost nothing and only the frames
+    touched are paged in. resample() produces each consumer's format (e.g.
+    16 kHz mono for WhisperX) once and caches it, next to the WAV as a raw
+    float32 sidecar when file-backed, so later stages and re-runs skip the
+    decode too.
+    Also usable as a separation source (n_frames / sample_rate / channels /
+    read()).
+    """
+    def __init__(self, samples, sample_rate, path=None):
+        self.samples = samples
+        self.sample_rate = int(sample_rate)
+        self.path = path
+        self._derived = {}
+
+    @classmethod
+    def from_wav(cls, path):
+        reader = WavReader(path)
+        return cls(reader.samples, reader.sample_rate, path)
+
+    @property
+    def channels(self):
+        return self.samples.shape[1]
+
+    @property
+    def n_frames(self):
+        return self.samples.shape[0]
+
+    @property
+    def duration(self):
+        return self.n_frames / float(self.sample_rate)
+
+    def view(self, start=0, end=None):
+        """
+        Zero-copy slice of the stored samples (int16 or float32).
+        """
+        return self.samples[start:end]
+
+    def read(self, start, end):
+        """
+        Frames [start, end) as float32 in [-1, 1].
+        """
+        block = self.samples[start:end]
+        if block.dtype == np.int16:
+            return block.astype(np.float32) * np.float32(1.0 / 32768.0)
+        return np.asarray(block, dtype=np.float32)
+
+    def resample(self, sample_rate, channels=None, block_seconds=INGEST_BLOCK_SECONDS):
+        """
+        Returns this audio as float32 at sample_rate/channels, computing it at
+        most once per format.
+        """
+        channels = channels or self.channels
+        if sample_rate == self.sample_rate and channels == self.channels:
+            return self
+        key = (int(sample_rate), int(channels))
+        if key in self._derived:
+            return self._derived[key]
+
+        shape = ((self.n_frames * sample_rate + self.sample_rate - 1) // self.sample_rate, channels)
+        sidecar = _derived_path(self.path, *key) if self.path else None
+        if sidecar and _sidecar_valid(sidecar, self.path, shape[0] * channels * 4):
+            samples = np.memmap(sidecar, dtype="<f4", mode="r", shape=shape)
+        elif sidecar:
+            # Each block goes straight to disk; the track is never whole in RAM
+            tmp_path = f"{sidecar}.part"
+            out = np.memmap(tmp_path, dtype="<f4", mode="w+", shape=shape) if shape[0] else None
+            try:
+                self._resample_into(out, sample_rate, channels, block_seconds)
+                if out is not None:
+                    out.flush()
+                del out
+                if not shape[0]:
+                    open(tmp_path, "wb").close()
+                os.replace(tmp_path, sidecar)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            samples = np.memmap(sidecar, dtype="<f4", mode="r", shape=shape) if shape[0] else \
+                np.zeros(shape, dtype=np.float32)
+        else:
+            samples = np.empty(shape, dtype=np.float32)
+            self._resample_into(samples, sample_rate, channels, block_seconds)
+        self._derived[key] = AudioBuffer(samples, sample_rate)
+        return self._derived[key]
+
+    def _resample_into(self, out, sample_rate, channels, block_seconds):
+        resampler = Resampler(self.sample_rate, sample_rate)
+        block = int(block_seconds * self.sample_rate)
+        written = 0
+        for start in range(0, self.n_frames, block):
+            produced = resampler.process(_remix(self.read(start, start + block), channels))
+            out[written:written + len(produced)] = produced
+            written += len(produced)
+        produced = resampler.flush()
+        if len(produced):
+            out[written:written + len(produced)] = produced
+
+    def as_whisper_audio(self):
+        """
+        16 kHz mono float32 1-D array, as whisperx.load_audio would return.
+        """
+        return self.resample(WHISPER_SAMPLE_RATE, 1).samples[:, 0]
+
+
+def _sidecar_valid(sidecar, source_path, expected_bytes):
+    try:
+        return (os.path.getsize(sidecar) == expected_bytes
+                and os.path.getmtime(sidecar) >= os.path.getmtime(source_path))
+    except OSError:
+        return False
+
+
+def ingest_media(media_path, wav_path, sample_rate=44100, channels=2, block_seconds=INGEST_BLOCK_SECONDS):
+    """
+    Decodes media_path with a single ffmpeg process streaming PCM over a pipe.
+    The PCM is written block by block straight to wav_path (the
+    memory-mapped backing store for separation and checkpoints).
+    Returns an AudioBuffer over wav_path.
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-v", "error",
+        "-i", media_path,
+        "-vn",
+        "-f", "s16le",
+        "-acodec", "pcm_s16le",
+        "-ar", str(sample_rate),
+        "-ac", str(channels),
+        "pipe:1"
+    ]
+    frame_bytes = 2 * channels
+    block_bytes = int(block_seconds * sample_rate) * frame_bytes
+    tmp_wav = f"{wav_path}.part"
+
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    try:
+        with wave.open(tmp_wav, "wb") as wav:
+            wav.setnchannels(channels)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            carry = b""
+            while True:
+                data = proc.stdout.read(block_bytes)
+                if not data:
+                    break
+                data = carry + data
+                usable = len(data) - len(data) % frame_bytes
+                data, carry = data[:usable], data[usable:]
+                wav.writeframes(data)
+        returncode = proc.wait()
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, cmd)
+        os.replace(tmp_wav, wav_path)
+    finally:
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        if os.path.exists(tmp_wav):
+            os.remove(tmp_wav)
+
+    return AudioBuffer.from_wav(wav_path)
@@ -0,0 +1,219 @@
+"""
+Headless batch runner for overnight backlogs.
+
+    python -m src.batch videos/ --translate --hf-token hf_...
+
+Separation and transcription (CPU/GPU heavy) run one job at a time; extraction,
+TTS and mixing of other jobs overlap with them. Every job writes a status.json
+into its job directory and the run ends with a throughput report.
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.job_store import JobStore, write_json_atomic
+from src.pipeline import DubbingPipeline
+from src.chunked_separation import WavReader
+
+MEDIA_EXTENSIONS = (".mp4", ".mkv", ".avi", ".mov", ".webm", ".wav", ".mp3", ".flac", ".m4a")
+
+
+def find_inputs(paths):
+    """
+    Expands directories into the media files they contain (sorted, non-recursive).
+    """
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                full_path = os.path.join(path, name)
+                if os.path.isfile(full_path) and name.lower().endswith(MEDIA_EXTENSIONS):
+                    inputs.append(full_path)
+        elif os.path.isfile(path):
+            inputs.append(path)
+        else:
+            print(f"Skipping missing input: {path}")
+    return inputs
+
+
+class JobStatus:
+    """
+    Per-job progress, mirrored to <job dir>/status.json after every change.
+    """
+    def __init__(self, input_path):
+        self.data = {
+            "input": input_path,
+            "state": "queued",
+            "stage": None,
+            "stages": {},
+            "error": None,
+            "output": None,
+            "media_seconds": None
+        }
+        self.path = None
+
+    def attach(self, job):
+        self.data["job_id"] = job.job_id
+        self.path = job.path("status.json")
+        self.save()
+
+    def update(self, **fields):
+        self.data.update(fields)
+        self.save()
+
+    def stage_done(self, name, elapsed, cached):
+        self.data["stages"][name] = {"elapsed": round(elapsed, 3), "cached": cached}
+        self.save()
+
+    def save(self):
+        if self.path:
+            write_json_atomic(self.path, self.data)
+
+
+class BatchScheduler:
+    """
+    Runs many pipeline jobs with up to `max_parallel` in flight.
+    A single heavy-stage lock serializes separation and transcription across
+    jobs (they saturate the CPU/GPU and hold large models), while extraction,
+    TTS and mixing, which mostly wait on ffmpeg and the network, overlap freely.
+    A job holds the lock through both of its heavy stages, so another job's
+    separation never slips in between them. On CUDA, transcription frees the
+    separation models' VRAM (see DubbingPipeline.transcribe), so every job
+    still reloads them once; on CPU they stay resident across jobs.
+    """
+    def __init__(self, pipeline, max_parallel=2, task="transcribe", num_speakers=None):
+        self.pipeline = pipeline
+        self.max_parallel = max(1, int(max_parallel))
+        self.task = task
+        self.num_speakers = num_speakers
+        self.heavy_lock = threading.Lock()
+
+    def _timed(self, status, name, fn, *args, **kwargs):
+        status.update(stage=name)
+        start = time.perf_counter()
+        key, result, cached = fn(*args, **kwargs)
+        status.stage_done(name, time.perf_counter() - start, cached)
+        return key, result
+
+    def run_job(self, input_path, status):
+        job_start = time.perf_counter()
+        try:
+            status.update(state="running", stage="hash")
+            job = self.pipeline.open_job(input_path)
+            status.attach(job)
+
+            extract_key, audio_path = self._timed(status, "extract", self.pipeline.extract, job)
+            reader = WavReader(audio_path)
+            status.update(media_seconds=reader.n_frames / float(reader.sample_rate))
+            reader.close()
+
+            with self.heavy_lock:
+                separate_key, (vocals_path, inst_path) = self._timed(
+                    status, "separate", self.pipeline.separate, job, extract_key, audio_path
+                )
+                transcribe_key, segments = self._timed(
+                    status, "transcribe", self.pipeline.transcribe, job, separate_key, vocals_path,
+                    task=self.task, num_speakers=self.num_speakers
+                )
+            status.update(segments=len(segments))
+
+            _, final_output_path = self._timed(status, "dub", self.pipeline.dub, job, transcribe_key, segments, inst_path)
+            status.update(state="done", stage=None, output=final_output_path)
+            print(f"[{job.job_id}] Done: {final_output_path}")
+        except Exception as e:
+            print(f"Job failed for {input_path}: {e}")
+            status.update(state="failed", error=str(e))
+        status.update(wall_seconds=round(time.perf_counter() - job_start, 3))
+        return status.data
+
+    def run(self, inputs):
+        statuses = [JobStatus(path) for path in inputs]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix="job") as executor:
+            results = list(executor.map(self.run_job, inputs, statuses))
+        return build_report(results, time.perf_counter() - start)
+
+
+def build_report(results, wall_seconds):
+    done = [r for r in results if r["state"] == "done"]
+    media_seconds = sum(r.get("media_seconds") or 0.0 for r in done)
+    stage_totals = {}
+    for r in results:
+        for name, stage in r["stages"].items():
+            stage_totals[name] = round(stage_totals.get(name, 0.0) + stage["elapsed"], 3)
+    return {
+        "jobs": len(results),
+        "succeeded": len(done),
+        "failed": len(results) - len(done),
+        "wall_seconds": round(wall_seconds, 3),
+        "media_seconds": round(media_seconds, 3),
+        # Seconds of media dubbed per second of wall time
+        "realtime_factor": round(media_seconds / wall_seconds, 3) if wall_seconds else 0.0,
+        "jobs_per_hour": round(len(done) * 3600.0 / wall_seconds, 2) if wall_seconds else 0.0,
+        "stage_seconds": stage_totals,
+        "results": results
+    }
+
+
+def print_report(report):
+    print("\nBatch summary")
+    print(f"  Jobs: {report['succeeded']}/{report['jobs']} succeeded, {report['failed']} failed")
+    print(f"  Wall time: {report['wall_seconds']:.1f}s for {report['media_seconds']:.1f}s of media "
+          f"({report['realtime_factor']:.2f}x realtime, {report['jobs_per_hour']:.1f} jobs/hour)")
+    for name, seconds in report["stage_seconds"].items():
+        print(f"  {name}: {seconds:.1f}s total")
+    for r in report["results"]:
+        line = f"  [{r['state']}] {r['input']}"
+        if r["error"]:
+            line += f" - {r['error']}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dub a batch of videos without the web UI.")
+    parser.add_argument("inputs", nargs="+", help="Video files or directories containing them")
+    parser.add_argument("--jobs-root", default="jobs", help="Where job directories are created")
+    parser.add_argument("--hf-token", default=os.environ.get("HF_TOKEN"), help="Hugging Face token (for diarization)")
+    parser.add_argument("--translate", action="store_true", help="Translate to English (WhisperX task=translate)")
+    parser.add_argument("--num-speakers", type=int, default=None)
+    parser.add_argument("--parallel", type=int, default=2, help="Jobs in flight at once")
+    parser.add_argument("--device", default="cuda")
+    parser.add_argument("--chunk-seconds", type=float, default=None, help="Chunked separation window length")
+    parser.add_argument("--transcribe-workers", type=int, default=None,
+                        help="CPU only: transcribe long audio as this many parallel shards")
+    parser.add_argument("--report", default=None, help="Summary JSON path (default: <jobs-root>/batch_report.json)")
+    args = parser.parse_args(argv)
+
+    inputs = find_inputs(args.inputs)
+    if not inputs:
+        print("No input files found.")
+        return 1
+    print(f"Queued {len(inputs)} jobs (parallel={args.parallel})")
+
+    store = JobStore(args.jobs_root)
+    pipeline = DubbingPipeline(
+        job_store=store,
+        hf_token=args.hf_token,
+        device=args.device,
+        chunk_seconds=args.chunk_seconds,
+        transcribe_workers=args.transcribe_workers
+    )
+    scheduler = BatchScheduler(
+        pipeline,
+        max_parallel=args.parallel,
+        task="translate" if args.translate else "transcribe",
+        num_speakers=args.num_speakers
+    )
+    report = scheduler.run(inputs)
+
+    report_path = args.report or store.path("batch_report.json")
+    write_json_atomic(report_path, report)
+    print_report(report)
+    print(f"Report written to {report_path}")
+    return 0 if report["failed"] == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,484 @@
+import os
+import wave
+import shutil
+import struct
+import tempfile
+import time
+import numpy as np
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavReader:
+    """
+    Memory-mapped reader for PCM16 / float32 WAV files.
+    Only the frames asked for are paged in, so reading a window of a
+    multi-hour file costs the size of the window, not the file.
+    """
+    def __init__(self, path):
+        self.path = path
+        fmt, channels, sample_rate, bits, data_offset, data_size = self._parse_header(path)
+        if fmt == WAVE_FORMAT_PCM and bits == 16:
+            dtype, self._scale = np.int16, 1.0 / 32768.0
+        elif fmt == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+            dtype, self._scale = np.float32, 1.0
+        else:
+            raise ValueError(f"Unsupported WAV encoding in {path} (format={fmt}, bits={bits})")
+
+        self.channels = channels
+        self.sample_rate = sample_rate
+        frame_bytes = channels * bits // 8
+        self.n_frames = data_size // frame_bytes
+        self._data = np.memmap(path, dtype=dtype, mode="r", offset=data_offset,
+                               shape=(self.n_frames, channels))
+
+    @staticmethod
+    def _parse_header(path):
+        with open(path, "rb") as f:
+            riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+            if riff != b"RIFF" or wave_id != b"WAVE":
+                raise ValueError(f"Not a WAV file: {path}")
+            fmt_info = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    raise ValueError(f"No data chunk in {path}")
+                chunk_id, chunk_size = struct.unpack("<4sI", header)
+                if chunk_id == b"fmt ":
+                    body = f.read(chunk_size)
+                    fmt, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+                    if fmt == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                        fmt = struct.unpack("<H", body[24:26])[0]
+                    fmt_info = (fmt, channels, sample_rate, bits)
+                    if chunk_size % 2:
+                        f.seek(1, os.SEEK_CUR)
+                elif chunk_id == b"data":
+                    if fmt_info is None:
+                        raise ValueError(f"data chunk before fmt chunk in {path}")
+                    data_offset = f.tell()
+                    # ffmpeg writes 0xFFFFFFFF sizes when streaming; trust the file size then
+                    remaining = os.path.getsize(path) - data_offset
+                    return fmt_info + (data_offset, min(chunk_size, remaining))
+                else:
+                    f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+
+    @property
+    def samples(self):
+        """
+        Zero-copy (frames, channels) view of the stored int16 / float32 samples.
+        """
+        return self._data
+
+    def read(self, start, end):
+        """
+        Returns frames [start, end) as a float32 (frames, channels) array.
+        """
+        return self._data[start:end].astype(np.float32) * np.float32(self._scale)
+
+    def close(self):
+        # Drops the mapping so the file can be removed (required on Windows)
+        self._data = None
+
+
+class WavStreamWriter:
+    """
+    Appends float32 (frames, channels) blocks to a PCM16 WAV file.
+    """
+    def __init__(self, path, sample_rate, channels):
+        self.path = path
+        self._wav = wave.open(path, "wb")
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, block):
+        pcm = (np.clip(block, -1.0, 1.0) * 32767.0).astype("<i2")
+        self._wav.writeframes(pcm.tobytes())
+
+    def close(self):
+        self._wav.close()
+
+
+class AudioWindow:
+    """
+    One window of the input, shared by every model that separates it.
+    Samples are decoded at most once, on first access. as_wav() writes a
+    temp WAV at most once, or reuses the source file when the window covers
+    all of it.
+    """
+    def __init__(self, source, start, end):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.sample_rate = source.sample_rate
+        self.channels = source.channels
+        self._samples = None
+        self._path = None
+        self._tmp_dir = None
+
+    @classmethod
+    def from_array(cls, samples, sample_rate):
+        window = cls(_ArraySource(samples, sample_rate), 0, len(samples))
+        window._samples = samples
+        return window
+
+    @property
+    def n_frames(self):
+        return self.end - self.start
+
+    @property
+    def samples(self):
+        if self._samples is None:
+            self._samples = self.source.read(self.start, self.end)
+        return self._samples
+
+    def as_wav(self, work_dir):
+        if self._path is None:
+            source_path = getattr(self.source, "path", None)
+            if source_path and self.start == 0 and self.end == self.source.n_frames:
+                self._path = source_path
+            else:
+                os.makedirs(work_dir, exist_ok=True)
+                self._tmp_dir = tempfile.mkdtemp(dir=work_dir)
+                self._path = os.path.join(self._tmp_dir, "chunk.wav")
+                writer = WavStreamWriter(self._path, self.sample_rate, self.channels)
+                writer.write(self.samples)
+                writer.close()
+        return self._path
+
+    def cleanup(self):
+        self._samples = None
+        if self._tmp_dir:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+            self._path = None
+
+
+class _ArraySource:
+    def __init__(self, samples, sample_rate):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.channels = samples.shape[1]
+        self.n_frames = len(samples)
+
+    def read(self, start, end):
+        return self.samples[start:end]
+
+
+class StemModel:
+    """
+    A separation model that works on one window of audio at a time.
+    separate() takes a float32 (frames, channels) window and returns
+    {stem_name: float32 (frames, channels)} for the same frames.
+    Models that work from files set needs_samples = False and override
+    separate_window() so a window is never decoded just for them.
+    """
+    stems = ()
+    needs_samples = True
+
+    @property
+    def name(self):
+        return type(self).__name__
+
+    def separate(self, chunk, sample_rate):
+        raise NotImplementedError
+
+    def separate_window(self, window):
+        return self.separate(window.samples, window.sample_rate)
+
+    def separate_window_to_files(self, window, output_paths):
+        """
+        Separates a window that is the whole input straight into
+        {stem_name: wav_path} files.
+        """
+        stems = self.separate_window(window)
+        for stem, path in output_paths.items():
+            if stem not in stems:
+                raise Exception(f"{self.name} produced no {stem} stem")
+            writer = WavStreamWriter(path, window.sample_rate, window.channels)
+            writer.write(stems[stem])
+            writer.close()
+
+
+class OnnxStemModel(StemModel):
+    """
+    Runs an ONNX session directly on waveform windows.
+
+    The session takes one float32 input of shape (1, channels, frames) and
+    produces one output per entry in `stems`, each (1, channels, frames).
+    If `residual_stem` is set, it is computed as input minus the first stem
+    (how MDX-style models derive the secondary stem).
+    Tiny stand-in models with this signature make the chunking path testable
+    on CPU without the real networks.
+    """
+    def __init__(self, model_path, stems=("Vocals",), residual_stem="Instrumental", providers=None):
+        import onnxruntime as ort
+        self.session = ort.InferenceSession(
+            model_path, providers=providers or ["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        self.model_path = model_path
+        self.model_stems = tuple(stems)
+        self.residual_stem = residual_stem
+        self.stems = self.model_stems + ((residual_stem,) if residual_stem else ())
+
+    @property
+    def name(self):
+        return os.path.basename(self.model_path)
+
+    def separate(self, chunk, sample_rate):
+        feed = {self.input_name: np.ascontiguousarray(chunk.T[None, :, :], dtype=np.float32)}
+        outputs = self.session.run(None, feed)
+        result = {}
+        for name, output in zip(self.model_stems, outputs):
+            result[name] = np.asarray(output[0], dtype=np.float32).T
+        if self.residual_stem:
+            result[self.residual_stem] = chunk - result[self.model_stems[0]]
+        return result
+
+
+class SeparatorStemModel(StemModel):
+    """
+    Adapts an audio-separator Separator (with a model already loaded) to
+    window-at-a-time use. Each window is handed to the separator as a small
+    temp WAV, so only one window is ever resident.
+    """
+    stems = ("Vocals", "Instrumental")
+    needs_samples = False
+
+    def __init__(self, separator, work_dir=None, name=None):
+        self.separator = separator
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix="sep_chunks_")
+        self._name = name
+        os.makedirs(self.work_dir, exist_ok=True)
+
+    @property
+    def name(self):
+        return self._name or type(self).__name__
+
+    def separate(self, chunk, sample_rate):
+        window = AudioWindow.from_array(chunk, sample_rate)
+        try:
+            return self.separate_window(window)
+        finally:
+            window.cleanup()
+
+    def _run_separator(self, chunk_path, out_dir):
+        """
+        Runs the separator into out_dir; returns {stem_name: wav_path}.
+        """
+        # Separator writes into its own output_dir; point it at a scratch dir
+        previous_dir = self.separator.output_dir
+        self.separator.output_dir = out_dir
+        if getattr(self.separator, "model_instance", None) is not None:
+            self.separator.model_instance.output_dir = out_dir
+        try:
+            output_files = self.separator.separate(chunk_path)
+        finally:
+            self.separator.output_dir = previous_dir
+            if getattr(self.separator, "model_instance", None) is not None:
+                self.separator.model_instance.output_dir = previous_dir
+
+        stem_files = {}
+        for f in output_files:
+            for stem in self.stems:
+                if f"({stem})" in f:
+                    stem_files[stem] = os.path.join(out_dir, os.path.basename(f))
+        return stem_files
+
+    def separate_window(self, window):
+        chunk_path = window.as_wav(self.work_dir)
+        out_dir = tempfile.mkdtemp(dir=self.work_dir)
+        try:
+            result = {}
+            for stem, path in self._run_separator(chunk_path, out_dir).items():
+                stem_reader = WavReader(path)
+                result[stem] = _fit_length(stem_reader.read(0, stem_reader.n_frames), window.n_frames)
+                stem_reader.close()
+            return result
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    def separate_window_to_files(self, window, output_paths):
+        # The separator's own files are the stems: move them, don't decode and rewrite
+        out_dir = tempfile.mkdtemp(dir=self.work_dir)
+        try:
+            stem_files = self._run_separator(window.as_wav(self.work_dir), out_dir)
+            for stem, path in output_paths.items():
+                if stem not in stem_files:
+                    raise Exception(f"{self.name} produced no {stem} stem")
+                if os.path.exists(path):
+                    os.remove(path)
+                shutil.move(stem_files[stem], path)
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def make_stand_in_model(path, gain=0.5):
+    """
+    Writes a tiny ONNX model with the OnnxStemModel signature that returns
+    `gain * input` as its stem. Requires the `onnx` package.
+    """
+    import onnx
+    from onnx import helper, TensorProto
+
+    node = helper.make_node("Mul", ["mix", "gain"], ["stem"])
+    graph = helper.make_graph(
+        [node], "stand_in_separator",
+        [helper.make_tensor_value_info("mix", TensorProto.FLOAT, [1, None, None])],
+        [helper.make_tensor_value_info("stem", TensorProto.FLOAT, [1, None, None])],
+        [helper.make_tensor("gain", TensorProto.FLOAT, [], [gain])]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, path)
+    return path
+
+
+def _fit_length(block, n_frames):
+    # Models may pad/trim a few frames; keep windows aligned with the input
+    if len(block) == n_frames:
+        return block
+    if len(block) > n_frames:
+        return block[:n_frames]
+    pad = np.zeros((n_frames - len(block), block.shape[1]), dtype=block.dtype)
+    return np.concatenate([block, pad])
+
+
+def iter_windows(n_frames, window, overlap):
+    """
+    Yields (start, end) frame windows of length `window` that overlap the
+    previous one by `overlap` frames. The last window may be shorter.
+    """
+    if window <= overlap:
+        raise ValueError("window must be longer than overlap")
+    start = 0
+    while True:
+        end = min(n_frames, start + window)
+        yield start, end
+        if end >= n_frames:
+            return
+        start = end - overlap
+
+
+def separate_in_windows(source, plan, chunk_seconds=60, overlap_seconds=2,
+                        progress=None, timings=None):
+    """
+    Runs one or more StemModels over the same windows of `source`.
+
+    plan: list of (model, {stem_name: wav_path}) pairs. Each window is read
+    (and, for file-based models, written to a temp WAV) once and then shared by
+    every model. Consecutive windows overlap by `overlap_seconds`; the overlap
+    is recombined with a linear crossfade and everything before it is written
+    straight to the output stems. chunk_seconds=None processes the whole input
+    as a single window, which each model writes to its stem files directly
+    (see StemModel.separate_window_to_files).
+    timings, if given, is a dict that accumulates seconds per phase
+    ("decode", "separate:<model>", "write").
+    """
+    if isinstance(source, str):
+        source = WavReader(source)
+    if timings is None:
+        timings = {}
+    if chunk_seconds:
+        window = int(chunk_seconds * source.sample_rate)
+        overlap = int(overlap_seconds * source.sample_rate)
+    else:
+        window, overlap = max(1, source.n_frames), 0
+    windows = list(iter_windows(source.n_frames, window, overlap))
+    if len(windows) == 1:
+        return _separate_whole(source, plan, progress, timings)
+
+    fade_in = np.linspace(0.0, 1.0, overlap + 2, dtype=np.float32)[1:-1, None]
+    fade_out = 1.0 - fade_in
+    decode_needed = any(model.needs_samples for model, _ in plan)
+
+    writers = {}
+    for i, (model, output_paths) in enumerate(plan):
+        for stem, path in output_paths.items():
+            writers[(i, stem)] = WavStreamWriter(path, source.sample_rate, source.channels)
+    pending = {} # (model index, stem) -> tail of the previous window awaiting crossfade
+    try:
+        for w, (start, end) in enumerate(windows):
+            audio_window = AudioWindow(source, start, end)
+            if decode_needed:
+                t0 = time.perf_counter()
+                audio_window.samples
+                timings["decode"] = timings.get("decode", 0.0) + time.perf_counter() - t0
+
+            is_last = end >= source.n_frames
+            try:
+                for i, (model, output_paths) in enumerate(plan):
+                    t0 = time.perf_counter()
+                    stems = model.separate_window(audio_window)
+                    phase = f"separate:{model.name}"
+                    timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - t0
+
+                    t0 = time.perf_counter()
+                    for stem in output_paths:
+                        if stem not in stems:
+                            raise Exception(f"{model.name} produced no {stem} stem")
+                        key = (i, stem)
+                        block = stems[stem]
+                        if key in pending:
+                            tail = pending.pop(key)
+                            n = len(tail)
+                            block = block.copy()
+                            block[:n] = tail * fade_out[:n] + block[:n] * fade_in[:n]
+                        if is_last or not overlap:
+                            writers[key].write(block)
+                        else:
+                            writers[key].write(block[:-overlap])
+                            pending[key] = block[-overlap:]
+                    timings["write"] = timings.get("write", 0.0) + time.perf_counter() - t0
+            finally:
+                audio_window.cleanup()
+            if progress:
+                progress(w + 1, len(windows))
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return timings
+
+
+def _separate_whole(source, plan, progress, timings):
+    audio_window = AudioWindow(source, 0, source.n_frames)
+    try:
+        for model, output_paths in plan:
+            t0 = time.perf_counter()
+            model.separate_window_to_files(audio_window, output_paths)
+            phase = f"separate:{model.name}"
+            timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - t0
+    finally:
+        audio_window.cleanup()
+    if progress:
+        progress(1, 1)
+    return timings
+
+
+class ChunkedSeparator:
+    """
+    Streams a long input through a single StemModel in overlapping windows.
+    Peak memory is a couple of windows no matter how long the input is.
+    """
+    def __init__(self, model, chunk_seconds=60, overlap_seconds=2):
+        self.model = model
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
+
+    def separate(self, source, output_paths, progress=None):
+        """
+        source: WavReader (or anything with n_frames/sample_rate/channels/read()),
+                or a path to a WAV file.
+        output_paths: {stem_name: wav_path} for the stems to keep.
+        Returns output_paths.
+        """
+        separate_in_windows(
+            source, [(self.model, output_paths)],
+            chunk_seconds=self.chunk_seconds,
+            overlap_seconds=self.overlap_seconds,
+            progress=progress
+        )
+        return output_paths
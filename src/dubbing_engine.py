@@ -1,10 +1,32 @@
 import os
-from pydub import AudioSegment
-import requests
-import json
+import shutil
+import tempfile
+import numpy as np
+from src.tts_backend import default_backend
+from src.synthesis_pool import SynthesisJob, SynthesisPool
+from src.tts_cache import TTSCache
+from src.metrics import Metrics
+from src.mixer import DuckingEnvelope, TimelineMixer, array_to_segment, load_audio_array
+from src.time_stretch import TimeFitter
+from src.audio_ingest import AudioBuffer
+from src.segment_planner import SegmentPlanner
+from src.progressive import ProgressiveOutput
+from src.segment_table import SegmentTable
+
+# Clips decoded and time-fitted together; bounds memory during the mix
+FIT_BATCH_CLIPS = 32
+# A progressive window is final once no line starts within this long after it
+PROGRESSIVE_LOOKAHEAD_SECONDS = 1.0
+
+
+class DubCancelled(Exception):
+    pass
+
 
 class DubbingEngine:
-    def __init__(self):
+    def __init__(self, tts_backend=None, max_concurrency=8, tts_retries=2, tts_timeout=60,
+                 cache_dir=None, cache_max_bytes=2 * 1024 ** 3,
+                 time_fit=True, max_speedup=1.35, min_speed=1.0, segment_planner=None):
         # Voice mapping: Speaker ID -> Edge-TTS Voice
         self.voice_map = {
             "SPEAKER_00": "en-US-ChristopherNeural", # Male
@@ -14,38 +36,199 @@ class DubbingEngine:
         }
         self.default_voice = "en-US-AriaNeural"
 
+        # TTS backend is pluggable so a local fake can stand in for tests/benchmarks
+        self.tts_backend = tts_backend or default_backend()
+        # Re-runs of the same transcript reuse clips from the on-disk cache
+        self.tts_cache = TTSCache(cache_dir, max_bytes=cache_max_bytes) if cache_dir else None
+        self.synthesis_pool = SynthesisPool(
+            self.tts_backend,
+            max_workers=max_concurrency,
+            retries=tts_retries,
+            timeout=tts_timeout,
+            cache=self.tts_cache
+        )
+        # Clips are sped up (at most max_speedup) to fit their source segment;
+        # min_speed < 1.0 also lets short clips be slowed down to fill it
+        self.time_fit = time_fit
+        self.max_speedup = max_speedup
+        self.min_speed = min_speed
+        # Adjacent same-speaker lines are synthesized as one request, then split back
+        self.segment_planner = segment_planner or SegmentPlanner()
+
+    def time_fit_settings(self):
+        return {"time_fit": self.time_fit, "max_speedup": self.max_speedup, "min_speed": self.min_speed}
+
     def get_voice(self, speaker_name):
         return self.voice_map.get(speaker_name, self.default_voice)
 
     def generate_speech(self, text, speaker_name, output_path):
         """
-        Generates audio using Edge-TTS via CLI.
+        Generates audio for a single line using the configured TTS backend.
         """
         voice = self.get_voice(speaker_name)
         print(f"Generating speech for {speaker_name} ({voice}): '{text[:30]}...'")
         
-        # Cleanup text for CLI (remove quotes etc)
-        safe_text = text.replace('"', '').replace("'", "")
-        
-        import subprocess
         try:
-            # edge-tts --text "Hello" --write-media out.mp3 --voice en-US-AriaNeural
-            cmd = [
-                "edge-tts",
-                "--text", safe_text,
-                "--write-media", output_path,
-                "--voice", voice
-            ]
-            subprocess.run(cmd, check=True, capture_output=True)
-            return output_path
+            return self.tts_backend.synthesize(text, voice, output_path, timeout=self.synthesis_pool.timeout)
         except Exception as e:
             print(f"TTS Error: {e}")
             return None
 
-    def stitch_and_mix(self, segments, background_path, output_path):
+    def _make_jobs(self, segments, work_dir):
+        jobs = []
+        dubbed_segments = []
+        for seg in segments:
+            text = seg.get('text', '').strip()
+            if not text:
+                continue
+            start_ms = int(seg['start'] * 1000)
+            speaker = seg.get('speaker', 'Unknown')
+            index = len(jobs)
+            # Index keeps temp names unique even if two segments share a start time
+            temp_tts_path = os.path.join(work_dir, f"temp_tts_{index}_{start_ms}.{self.tts_backend.extension}")
+            jobs.append(SynthesisJob(index, text, self.get_voice(speaker), temp_tts_path))
+            dubbed_segments.append(seg)
+        return jobs, dubbed_segments
+
+    def synthesize_segments(self, segments, work_dir):
+        """
+        Generates speech for every non-empty segment (or planned unit) concurrently.
+        Temp clips from file-based backends go to work_dir, which must be private
+        to this run; streaming backends keep clips in memory or in the TTS cache.
+        Returns (segment, SynthesisResult) pairs in timeline order. Cached clips
+        stay pinned until synthesis_pool.release() is called for the results.
+        """
+        jobs, dubbed_segments = self._make_jobs(segments, work_dir)
+        print(f"Synthesizing {len(jobs)} segments (concurrency={self.synthesis_pool.max_workers})...")
+        results = self.synthesis_pool.run(jobs)
+        self._print_cache_stats()
+        return list(zip(dubbed_segments, results))
+
+    def _print_cache_stats(self):
+        if self.tts_cache:
+            stats = self.tts_cache.stats()
+            print(f"TTS cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions")
+
+    @staticmethod
+    def _load_background(background):
+        if background.lower().endswith(".wav"):
+            try:
+                return AudioBuffer.from_wav(background)
+            except ValueError as e:
+                print(f"Falling back to pydub decode: {e}")
+        from pydub import AudioSegment
+        segment = AudioSegment.from_file(background).set_sample_width(2)
+        samples = np.frombuffer(segment.raw_data, dtype=np.int16).reshape(-1, segment.channels)
+        return AudioBuffer(samples, segment.frame_rate)
+
+    def _prepare_background(self, segments, background_path):
+        """
+        Returns (background, sample_rate, total_frames), with the background
+        looped or trimmed to cover the last segment end plus a 2s buffer.
+        """
+        last_seg_end_ms = int(segments[-1]['end'] * 1000) + 2000
+        
+        # Load background to get true duration if possible.
+        # Decoded at most once; everything below works on NumPy views of its samples.
+        background_buffer = self._load_background(background_path)
+        sample_rate = background_buffer.sample_rate
+        background = background_buffer.view()
+        total_frames = max(len(background), int(last_seg_end_ms * sample_rate / 1000))
+        
+        # Trim or Loop background to match
+        if len(background) < total_frames:
+             background = np.resize(background, (total_frames, background.shape[1]))
+        return background[:total_frames], sample_rate, total_frames
+
+    @staticmethod
+    def _record_result(stage, latency, result):
+        if result.cached:
+            stage.count("cache_hits")
+        elif result.ok:
+            latency.observe(result.elapsed)
+            stage.count("synthesized")
+        else:
+            stage.count("failed")
+
+    @staticmethod
+    def _has_audio(result):
+        """
+        False for lines whose synthesis failed. A clip that was synthesized
+        but is gone from disk is an error, not a silently missing line.
+        """
+        if not result.ok:
+            return False
+        if result.data is None and not os.path.exists(result.path):
+            raise RuntimeError(f"TTS clip for segment {result.job.index} is missing: {result.path}")
+        return True
+
+    def _piece_starts(self, units):
+        # Clips may run up to the next dubbed piece's start
+        starts = np.sort([piece['start'] for unit in units for piece in self.segment_planner.pieces(unit)])
+        return np.append(starts, np.inf)
+
+    def _place(self, placed, mixer, fitter, piece_starts, stage):
+        """
+        Decodes, splits, time-fits and adds the (unit, result) clips to the
+        mixer. Returns the (start, end) frames written, for ducking.
+        """
+        planner = self.segment_planner
+        sample_rate = mixer.sample_rate
+        intervals = []
+        for batch_start in range(0, len(placed), FIT_BATCH_CLIPS):
+            pieces, clips = [], []
+            for unit, result in placed[batch_start:batch_start + FIT_BATCH_CLIPS]:
+                # Load generated audio (in memory, in the TTS cache or in the temp dir)
+                clip = load_audio_array(
+                    result.open(), sample_rate=sample_rate, channels=1, format=result.extension
+                )[:, 0]
+                # Merged units are cut back into one clip per source segment
+                pieces.extend(planner.pieces(unit))
+                clips.extend(planner.split_clip(clip, unit, sample_rate, words=result.words))
+            if self.time_fit:
+                # Stretch/compress each clip to its source segment's window
+                starts = [seg['start'] for seg in pieces]
+                clips, rates, unresolved = fitter.fit(
+                    clips,
+                    starts,
+                    [seg['end'] for seg in pieces],
+                    piece_starts[np.searchsorted(piece_starts, starts, side="right")]
+                )
+                stage.count("time_fitted", int((rates != 1.0).sum()))
+                stage.count("overlaps", int(unresolved.sum()))
+
+            for seg, speech_samples in zip(pieces, clips):
+                start_ms = int(seg['start'] * 1000)
+                # Place at timestamp and record actual speech extent for ducking
+                intervals.append(mixer.add(speech_samples, mixer.ms_to_frames(start_ms)))
+        stage.count("clips", len(intervals))
+        return intervals
+
+    def _render(self, mixer, background, ducking_mask, start=0, end=None):
+        # Background sits 3dB lower overall and ducks a further 10dB under speech,
+        # with attack/release ramps built per sample from the ducking mask.
+        envelope = DuckingEnvelope(ducking_mask, mixer.n_frames, mixer.sample_rate, duck_db=-10.0)
+        return mixer.render(background, background_gain_db=-3.0, background_envelope=envelope, start=start, end=end)
+
+    @staticmethod
+    def _segment_records(segments):
+        # Only times, text and speaker are used here; word dicts are never built
+        if isinstance(segments, SegmentTable):
+            return segments.to_whisperx(words=False)
+        return segments
+
+    def stitch_and_mix(self, segments, background_path, output_path, metrics=None):
         """
         Stitches generated speech segments and mixes with background music (with ducking).
+        WAV backgrounds are memory-mapped rather than decoded.
+        TTS, clip placement and the final render are recorded as "dub.tts",
+        "dub.mix" and "dub.render" stages on `metrics`, along with a
+        per-request TTS latency histogram.
+        Segments are merged into fewer TTS requests by segment_planner first.
+        segments: WhisperX segment dicts or a SegmentTable.
         """
+        metrics = metrics or Metrics(profile=())
+        segments = self._segment_records(segments)
         print("Stitching audio segments...")
         
         # 1. Determine total duration (roughly last segment end + buffer)
@@ -53,69 +236,137 @@ class DubbingEngine:
             print("No segments to dub.")
             return None
             
-        last_seg_end_ms = int(segments[-1]['end'] * 1000) + 2000
+        background, sample_rate, total_frames = self._prepare_background(segments, background_path)
         
-        # Load background to get true duration if possible
-        background = AudioSegment.from_file(background_path)
-        total_duration_ms = max(len(background), last_seg_end_ms)
+        # 2. Create the speech track (preallocated, clips are added in place)
+        mixer = TimelineMixer(total_frames, sample_rate=sample_rate)
+        ducking_mask = [] # (start_frame, end_frame) of speech
         
-        # Trim or Loop background to match
-        if len(background) < total_duration_ms:
-             background = background * (int(total_duration_ms / len(background)) + 1)
-        background = background[:total_duration_ms]
-        
-        # 2. Create the speech track
-        speech_track = AudioSegment.silent(duration=total_duration_ms)
-        ducking_mask = [] # (start_ms, end_ms) of speech
+        # Generate TTS for all segments up front, then mix in timeline order
+        # so the result is identical no matter which request finished first.
+        # Temp clips live in a private dir so concurrent jobs never collide.
+        work_dir = tempfile.mkdtemp(prefix="dub_tts_")
+        synthesized = []
+        try:
+            with metrics.stage("dub.tts") as stage:
+                units = self.segment_planner.plan(segments)
+                synthesized = self.synthesize_segments(units, work_dir)
+                latency = metrics.histogram("tts_latency_seconds")
+                for _, result in synthesized:
+                    self._record_result(stage, latency, result)
+                stage.count("segments", sum(len(unit['parts']) for unit in units))
+                stage.count("requests", len(synthesized))
+
+            with metrics.stage("dub.mix") as stage:
+                fitter = TimeFitter(sample_rate, max_speedup=self.max_speedup, min_speed=self.min_speed)
+                placed = [(unit, result) for unit, result in synthesized if self._has_audio(result)]
+                ducking_mask.extend(self._place(placed, mixer, fitter, self._piece_starts(units), stage))
+        finally:
+            # Clips are decoded now; the cache may evict them again
+            self.synthesis_pool.release([result for _, result in synthesized])
+            shutil.rmtree(work_dir, ignore_errors=True)
         
-        for seg in segments:
-            start_ms = int(seg['start'] * 1000)
-            end_ms = int(seg['end'] * 1000)
-            text = seg.get('text', '').strip()
-            speaker = seg.get('speaker', 'Unknown')
+        # 3. Apply Ducking
+        with metrics.stage("dub.render"):
+            final_mix = array_to_segment(self._render(mixer, background, ducking_mask), sample_rate)
             
-            if not text:
-                continue
+            final_mix.export(output_path, format="mp3")
+        print(f"Dubbing complete: {output_path}")
+        return output_path
 
-            # Generate TTS
-            temp_tts_path = f"temp_tts_{start_ms}.mp3"
-            if self.generate_speech(text, speaker, temp_tts_path):
-                # Load generated audio
-                if os.path.exists(temp_tts_path):
-                    speech_segment = AudioSegment.from_file(temp_tts_path)
-                    
-                    # Place at timestamp
-                    # Note: We rely on the original timestamp. 
-                    # Ideally we should speed up/slow down audio to fit the gap, 
-                    # but for basic dubbing, overlaying at start is a good first step.
-                    speech_track = speech_track.overlay(speech_segment, position=start_ms)
-                    
-                    # Record actual speech duration for ducking
-                    actual_duration = len(speech_segment)
-                    ducking_mask.append((start_ms, start_ms + actual_duration))
-                    
-                    # Cleanup
-                    os.remove(temp_tts_path)
-        
-        # 3. Apply Simple Ducking (Global reduction for now is safer/cleaner for Phase 1)
-        # Or better: Reduce background volume globally by 6dB?
-        # Let's do the dynamic ducking we planned.
-        
-        final_bg = background - 3 # Reduce BG slightly overall always
-        
-        # Create ducked version (-10dB more)
-        bg_ducked = final_bg - 10
-        
-        # We will build the background track by splicing
-        # This is complex to get perfect. 
-        # Simpler approach for reliability:
-        # Just create the mix. If user wants ducking, we can add logic later.
-        # Actually, let's just do global volume reduction of music so voice pops.
-        
-        final_bg = final_bg - 5 # -8dB total
-        
-        final_mix = final_bg.overlay(speech_track)
-        
-        final_mix.export(output_path, format="mp3")
+    def stitch_and_mix_progressive(self, segments, background_path, output_path, chunk_dir,
+                                   window_seconds=60, on_chunk=None, metrics=None, cancel=None):
+        """
+        Progressive stitch_and_mix: the timeline is finalized in fixed windows.
+        Results arrive in timeline order; once every line that can reach into
+        a window has been synthesized and placed, the window is rendered and
+        published to chunk_dir (chunk files, playlist.m3u8 and a growing
+        progressive.wav, see ProgressiveOutput), and on_chunk(info) is called.
+        The mix written to output_path is the same as stitch_and_mix's.
+        Setting the `cancel` event (threading.Event) stops synthesis after
+        the line in flight and raises DubCancelled.
+        Recorded as a single "dub.progressive" stage.
+        """
+        metrics = metrics or Metrics(profile=())
+        segments = self._segment_records(segments)
+        if not segments:
+            print("No segments to dub.")
+            return None
+
+        background, sample_rate, total_frames = self._prepare_background(segments, background_path)
+        mixer = TimelineMixer(total_frames, sample_rate=sample_rate)
+        fitter = TimeFitter(sample_rate, max_speedup=self.max_speedup, min_speed=self.min_speed)
+        ducking_mask = []
+        window = max(1, int(window_seconds * sample_rate))
+        # Ducking attack and hold reach back this far from a line's start
+        lookahead = int(PROGRESSIVE_LOOKAHEAD_SECONDS * sample_rate)
+        output = ProgressiveOutput(chunk_dir, sample_rate, background.shape[1])
+        rendered = 0
+
+        def publish(limit):
+            # Renders every window that ends at or before frame `limit`
+            nonlocal rendered
+            while rendered < total_frames and min(rendered + window, total_frames) <= limit:
+                end = min(rendered + window, total_frames)
+                chunk_path = output.append(self._render(mixer, background, ducking_mask, rendered, end))
+                if on_chunk:
+                    on_chunk({
+                        "index": len(output.chunks) - 1,
+                        "start": rendered / float(sample_rate),
+                        "end": end / float(sample_rate),
+                        "total": total_frames / float(sample_rate),
+                        "chunk": chunk_path,
+                        "growing": output.growing_path,
+                        "playlist": output.playlist_path
+                    })
+                rendered = end
+
+        work_dir = tempfile.mkdtemp(prefix="dub_tts_")
+        received = []
+        results = None
+        try:
+            with metrics.stage("dub.progressive") as stage:
+                units = self.segment_planner.plan(segments)
+                piece_starts = self._piece_starts(units)
+                jobs, dubbed_units = self._make_jobs(units, work_dir)
+                # Earliest start among the units still to come, per position
+                later_starts = np.minimum.accumulate(
+                    np.append([unit['start'] for unit in dubbed_units], np.inf)[::-1]
+                )[::-1][1:]
+                latency = metrics.histogram("tts_latency_seconds")
+                print(f"Synthesizing {len(jobs)} segments progressively ({window_seconds}s windows)...")
+
+                pending = []
+                results = self.synthesis_pool.iter_run(jobs)
+                for unit, result, later_start in zip(dubbed_units, results, later_starts):
+                    received.append(result)
+                    if cancel is not None and cancel.is_set():
+                        raise DubCancelled("Dub cancelled")
+                    self._record_result(stage, latency, result)
+                    if self._has_audio(result):
+                        pending.append((unit, result))
+                    limit = total_frames if np.isinf(later_start) else int(later_start * sample_rate) - lookahead
+                    if min(rendered + window, total_frames) <= limit:
+                        ducking_mask.extend(self._place(pending, mixer, fitter, piece_starts, stage))
+                        self.synthesis_pool.release([result for _, result in pending])
+                        pending = []
+                        publish(limit)
+                ducking_mask.extend(self._place(pending, mixer, fitter, piece_starts, stage))
+                publish(total_frames)
+                self._print_cache_stats()
+                stage.count("segments", sum(len(unit['parts']) for unit in units))
+                stage.count("requests", len(jobs))
+                stage.count("windows", len(output.chunks))
+        finally:
+            if results is not None:
+                # Cancels the queued TTS requests and waits for the running ones
+                results.close()
+            self.synthesis_pool.release(received)
+            shutil.rmtree(work_dir, ignore_errors=True)
+            output.close()
+
+        # The chunks already hold the whole mix; encode it once more as one file
+        from pydub import AudioSegment
+        AudioSegment.from_wav(output.growing_path).export(output_path, format="mp3")
         print(f"Dubbing complete: {output_path}")
         return output_path
@@ -3,7 +3,21 @@ import sys
 import ctypes
 import importlib.util
 
+def gpu_setup_needed():
+    """
+    DLL registration and preloading are only needed for CUDA on Windows:
+    other platforms resolve the libraries through the loader, and CPU-only
+    runs (CUDA_VISIBLE_DEVICES empty or -1) need none of them.
+    """
+    if os.name != 'nt':
+        return False
+    return os.environ.get("CUDA_VISIBLE_DEVICES") not in ("", "-1")
+
 def setup_gpu_environment():
+    if not gpu_setup_needed():
+        print(f"Skipping GPU environment setup (platform: {sys.platform}).")
+        return
+
     print(f"DEBUG: Setting up GPU environment...")
     print(f"DEBUG: Python: {sys.version}")
     print(f"DEBUG: Platform: {sys.platform}")
@@ -39,8 +53,11 @@ def setup_gpu_environment():
         cublas_dir = register_package_dlls("nvidia.cublas")
         
         # 2. Register Torch Lib as well (Crucial for zlibwapi, cudart, nvrtc)
-        import torch
-        torch_lib_path = os.path.join(os.path.dirname(os.path.abspath(torch.__file__)), "lib")
+        # Located without importing torch; whoever needs it imports it later
+        torch_spec = importlib.util.find_spec("torch")
+        if torch_spec is None or not torch_spec.origin:
+            raise ImportError("torch not installed")
+        torch_lib_path = os.path.join(os.path.dirname(os.path.abspath(torch_spec.origin)), "lib")
         if os.path.exists(torch_lib_path):
              os.add_dll_directory(torch_lib_path)
              print(f"DEBUG: Added Torch Lib to DLL search: {torch_lib_path}")
@@ -0,0 +1,204 @@
+import os
+import re
+import time
+import heapq
+import shutil
+import threading
+from collections import deque
+
+WORKSPACE_MARKER = ".last_used"
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _workspace_name(session_id):
+    return re.sub(r"[^A-Za-z0-9_-]", "_", str(session_id))
+
+
+class Ticket:
+    """
+    A job's place in the JobQueue. wait() blocks until it may run.
+    """
+    def __init__(self, session_id, seq):
+        self.session_id = session_id
+        self.seq = seq
+        self.enqueued_at = time.time()
+        self.started_at = None
+        self._admitted = threading.Event()
+
+    @property
+    def admitted(self):
+        return self._admitted.is_set()
+
+    def wait(self, timeout=None):
+        return self._admitted.wait(timeout)
+
+
+class JobQueue:
+    """
+    Server-side admission control for the web UI.
+
+    At most max_concurrent pipelines run at once; up to max_waiting more
+    wait in FIFO order and enter() raises QueueFull beyond that (or if the
+    session already has a job). The ETA is estimated from a moving average
+    of recent job durations.
+    Every session works in its own directory under workspace_root; idle
+    workspaces are deleted once they are older than ttl_seconds.
+    """
+    def __init__(self, workspace_root, max_concurrent=1, max_waiting=8, ttl_seconds=6 * 3600,
+                 default_job_seconds=300.0):
+        self.workspace_root = workspace_root
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_waiting = max(0, int(max_waiting))
+        self.ttl_seconds = ttl_seconds
+        self.avg_job_seconds = float(default_job_seconds)
+        self._waiting = deque()
+        self._running = {}
+        self._sessions = set()
+        self._seq = 0
+        self._lock = threading.Lock()
+        os.makedirs(workspace_root, exist_ok=True)
+
+    def enter(self, session_id):
+        """
+        Queues a job for session_id and returns its Ticket (already admitted
+        if a slot is free).
+        """
+        self.cleanup_expired()
+        with self._lock:
+            if session_id in self._sessions:
+                raise QueueFull("This session already has a job in progress.")
+            if len(self._running) >= self.max_concurrent and len(self._waiting) >= self.max_waiting:
+                raise QueueFull(f"Server busy: {len(self._waiting)} jobs already waiting, try again later.")
+            self._seq += 1
+            ticket = Ticket(session_id, self._seq)
+            self._sessions.add(session_id)
+            self._waiting.append(ticket)
+            self._admit()
+        return ticket
+
+    def _admit(self):
+        while self._waiting and len(self._running) < self.max_concurrent:
+            ticket = self._waiting.popleft()
+            ticket.started_at = time.time()
+            self._running[ticket.seq] = ticket
+            ticket._admitted.set()
+
+    def leave(self, ticket, completed=True):
+        """
+        Releases the ticket's slot (or place in line) and admits the next job.
+        Durations of completed jobs feed the ETA estimate.
+        """
+        with self._lock:
+            if ticket.seq in self._running:
+                del self._running[ticket.seq]
+                if completed:
+                    elapsed = time.time() - ticket.started_at
+                    self.avg_job_seconds = 0.7 * self.avg_job_seconds + 0.3 * elapsed
+            elif ticket in self._waiting:
+                self._waiting.remove(ticket)
+            self._sessions.discard(ticket.session_id)
+            self._admit()
+        self.touch(ticket.session_id)
+
+    def position(self, ticket):
+        """
+        1-based place in line, or 0 once running.
+        """
+        with self._lock:
+            if ticket.admitted:
+                return 0
+            try:
+                return self._waiting.index(ticket) + 1
+            except ValueError:
+                return 0
+
+    def eta_seconds(self, ticket):
+        """
+        Estimated seconds until the ticket starts: running jobs finish after
+        the average duration, then each job ahead takes a free slot in turn.
+        """
+        with self._lock:
+            if ticket.admitted:
+                return 0.0
+            now = time.time()
+            slots = [max(0.0, t.started_at + self.avg_job_seconds - now) for t in self._running.values()]
+            slots += [0.0] * (self.max_concurrent - len(slots))
+            heapq.heapify(slots)
+            for waiting in self._waiting:
+                start = heapq.heappop(slots)
+                if waiting is ticket:
+                    return start
+                heapq.heappush(slots, start + self.avg_job_seconds)
+            return 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": len(self._running),
+                "waiting": len(self._waiting),
+                "max_concurrent": self.max_concurrent,
+                "max_waiting": self.max_waiting,
+                "avg_job_seconds": round(self.avg_job_seconds, 1)
+            }
+
+    def workspace(self, session_id):
+        """
+        Private directory for a session's jobs.
+        """
+        path = os.path.join(self.workspace_root, _workspace_name(session_id))
+        os.makedirs(path, exist_ok=True)
+        self.touch(session_id)
+        return path
+
+    def touch(self, session_id):
+        path = os.path.join(self.workspace_root, _workspace_name(session_id))
+        if os.path.isdir(path):
+            with open(os.path.join(path, WORKSPACE_MARKER), "w") as f:
+                f.write(str(time.time()))
+
+    def cleanup_expired(self, now=None):
+        """
+        Deletes workspaces idle for longer than ttl_seconds whose session has
+        no queued or running job. Returns the removed paths.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            active = {_workspace_name(s) for s in self._sessions}
+        removed = []
+        for name in os.listdir(self.workspace_root):
+            path = os.path.join(self.workspace_root, name)
+            if name in active or not os.path.isdir(path):
+                continue
+            marker = os.path.join(path, WORKSPACE_MARKER)
+            last_used = os.path.getmtime(marker if os.path.exists(marker) else path)
+            if now - last_used > self.ttl_seconds:
+                shutil.rmtree(path, ignore_errors=True)
+                removed.append(path)
+        if removed:
+            print(f"Removed {len(removed)} expired workspaces")
+        return removed
+
+
+_default_queue = None
+_default_lock = threading.Lock()
+
+
+def get_job_queue(workspace_root=os.path.join("jobs", "sessions")):
+    """
+    Process-wide queue shared by every web UI request. Limits come from
+    DUB_MAX_CONCURRENT_JOBS (default 1), DUB_MAX_QUEUED_JOBS (default 8) and
+    DUB_WORKSPACE_TTL_HOURS (default 6).
+    """
+    global _default_queue
+    with _default_lock:
+        if _default_queue is None:
+            _default_queue = JobQueue(
+                workspace_root,
+                max_concurrent=int(os.environ.get("DUB_MAX_CONCURRENT_JOBS", "1")),
+                max_waiting=int(os.environ.get("DUB_MAX_QUEUED_JOBS", "8")),
+                ttl_seconds=float(os.environ.get("DUB_WORKSPACE_TTL_HOURS", "6")) * 3600
+            )
+        return _default_queue
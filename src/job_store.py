@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from src.metrics import Metrics
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """
+    SHA-256 of a file's contents, read in chunks so large videos stay cheap on RAM.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_values(*values):
+    """
+    Stable hash of JSON-serializable values (settings, upstream stage keys, ...).
+    """
+    payload = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def to_builtin(value):
+    # json.dump fallback for NumPy scalars that WhisperX leaves in segments
+    if hasattr(value, "item"):
+        return value.item()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def write_json_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False, default=to_builtin)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class Job:
+    """
+    Working directory for one input file.
+
+    Every stage records its artifacts in manifest.json under a key derived
+    from the stage's inputs (upstream stage key + settings). A stage whose key
+    is already in the manifest, and whose artifacts still exist, is skipped.
+    Several variants of a stage can coexist, so toggling a setting back and
+    forth reuses both results.
+    Downstream stages are keyed on the key run_stage() returns, which is
+    fresh whenever a stage actually runs: if an artifact was deleted and its
+    stage recomputed, everything after it is recomputed too.
+    """
+    def __init__(self, job_dir, job_id, input_path, input_hash, settings):
+        self.dir = job_dir
+        self.job_id = job_id
+        os.makedirs(job_dir, exist_ok=True)
+        self.manifest_path = os.path.join(job_dir, "manifest.json")
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {
+                "job_id": job_id,
+                "input_hash": input_hash,
+                "settings": settings,
+                "stages": {}
+            }
+        self.manifest["input"] = input_path
+        self.input_path = input_path
+        self.input_hash = input_hash
+        # Per-run instrumentation, exported next to the manifest
+        self.metrics = Metrics(profile_dir=self.path("profile"))
+
+    def path(self, *parts):
+        return os.path.join(self.dir, *parts)
+
+    def stage_key(self, name, *inputs):
+        return hash_values(name, *inputs)[:16]
+
+    def stage_dir(self, name, key):
+        stage_dir = self.path(name, key)
+        os.makedirs(stage_dir, exist_ok=True)
+        return stage_dir
+
+    def _get_record(self, name, key):
+        record = self.manifest["stages"].get(name, {}).get(key)
+        if not record:
+            return None
+        for artifact in record["artifacts"].values():
+            if isinstance(artifact, str) and not os.path.exists(artifact):
+                return None
+        return record
+
+    def get_stage(self, name, key):
+        """
+        Returns the recorded artifacts for (name, key) if every artifact
+        path still exists, else None.
+        """
+        record = self._get_record(name, key)
+        return record["artifacts"] if record else None
+
+    def record_stage(self, name, key, artifacts, elapsed):
+        """
+        Records a completed run and returns its output key (see run_stage).
+        """
+        output = hash_values(name, key, time.time_ns(), os.getpid())[:16]
+        self.manifest["stages"].setdefault(name, {})[key] = {
+            "artifacts": artifacts,
+            "output": output,
+            "elapsed": round(elapsed, 3),
+            "completed_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        write_json_atomic(self.manifest_path, self.manifest)
+        return output
+
+    def run_stage(self, name, inputs, fn):
+        """
+        Runs fn(stage_dir) -> artifacts dict unless a matching checkpoint exists.
+        Returns (output_key, artifacts, cached); pass output_key to the
+        stages that consume these artifacts.
+        """
+        key = self.stage_key(name, *inputs)
+        record = self._get_record(name, key)
+        if record is not None:
+            print(f"[{self.job_id}] {name}: reusing checkpoint {key}")
+            # Records from before output keys: the input key stood in for it
+            return record.get("output", key), record["artifacts"], True
+
+        start = time.perf_counter()
+        artifacts = fn(self.stage_dir(name, key))
+        output = self.record_stage(name, key, artifacts, time.perf_counter() - start)
+        return output, artifacts, False
+
+
+class JobStore:
+    """
+    Maps input files to job directories under `root`, keyed by a content
+    hash of the input and the job-level settings.
+    """
+    def __init__(self, root="jobs"):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._hash_memo = {}
+
+    def _input_hash(self, input_path):
+        # Hashing a feature film takes a while; reuse it while the file is unchanged
+        stat = os.stat(input_path)
+        memo_key = (os.path.abspath(input_path), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in self._hash_memo:
+            self._hash_memo[memo_key] = hash_file(input_path)
+        return self._hash_memo[memo_key]
+
+    def open_job(self, input_path, settings=None):
+        settings = settings or {}
+        input_hash = self._input_hash(input_path)
+        job_id = hash_values(input_hash, settings)[:16]
+        return Job(os.path.join(self.root, job_id), job_id, input_path, input_hash, settings)
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
@@ -0,0 +1,341 @@
+import os
+import io
+import re
+import json
+import time
+import pstats
+import threading
+from contextlib import contextmanager
+
+DEFAULT_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+# cProfile can't nest; tracks whether this thread already has one attached
+_profiling = threading.local()
+# tracemalloc is process-wide, so stages on different threads share it:
+# it runs while any of them needs it and is only stopped if we started it
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_started = False
+
+
+def _label(value):
+    # Prometheus label values escape backslash, double quote and newline
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_:]", "_", name)
+
+
+def _acquire_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_started
+    import tracemalloc
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0:
+            _tracemalloc_started = not tracemalloc.is_tracing()
+            if _tracemalloc_started:
+                tracemalloc.start()
+            # Overlapping stages share the peak from the first one's start
+            tracemalloc.reset_peak()
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc():
+    """
+    Snapshot and peak for the stage that's ending; stops tracing after the last user.
+    """
+    global _tracemalloc_users
+    import tracemalloc
+    with _tracemalloc_lock:
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_started:
+            tracemalloc.stop()
+    return snapshot, peak
+
+
+def read_rss_bytes():
+    """
+    Current resident set size of this process, or None if unavailable.
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def read_io_bytes():
+    """
+    (bytes read, bytes written) to storage by this process so far, or (None, None).
+    """
+    try:
+        with open("/proc/self/io", "r") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["read_bytes"]), int(fields["write_bytes"])
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import psutil
+        counters = psutil.Process().io_counters()
+        return counters.read_bytes, counters.write_bytes
+    except (ImportError, AttributeError, OSError):
+        return None, None
+
+
+def cpu_seconds():
+    # Includes finished child processes (ffmpeg, edge-tts) where the OS reports them
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+class _PeakRSSSampler:
+    """
+    Polls RSS in a background thread to find the peak within one stage
+    (ru_maxrss only gives the peak over the whole process lifetime).
+    """
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = read_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = read_rss_bytes()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def start(self):
+        if self.peak is not None:
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        rss = read_rss_bytes()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+        return self.peak
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus style.
+    """
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "buckets": {str(b): c for b, c in zip(self.buckets, self.counts)},
+                "count": self.count,
+                "sum": round(self.sum, 6),
+                "mean": round(self.sum / self.count, 6) if self.count else 0.0
+            }
+
+
+class StageRecord:
+    def __init__(self, name):
+        self.name = name
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_bytes = None
+        self.read_bytes = None
+        self.written_bytes = None
+        self.counts = {}
+        self.profile = {}
+        self.error = None
+
+    def count(self, key, n=1):
+        self.counts[key] = self.counts.get(key, 0) + n
+
+    def to_dict(self):
+        return {
+            "stage": self.name,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "cpu_seconds": round(self.cpu_seconds, 6),
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "read_bytes": self.read_bytes,
+            "written_bytes": self.written_bytes,
+            "counts": dict(self.counts),
+            "profile": dict(self.profile),
+            "error": self.error
+        }
+
+
+class Metrics:
+    """
+    Structured per-stage instrumentation for one pipeline job.
+
+        with metrics.stage("separate") as stage:
+            ...
+            stage.count("segments", len(segments))
+
+    Each stage records wall time, CPU time (incl. child processes), peak RSS,
+    storage bytes read/written and arbitrary counts. CPU, RSS and I/O are
+    process-wide counters, so stages overlapping in batch mode share them.
+    Histograms (e.g. TTS latency) are kept by name. Export with to_json() /
+    to_prometheus().
+
+    `profile` opts into heavy per-stage profilers: "cprofile" and/or
+    "tracemalloc" (default: comma-separated DUB_PROFILE env var). They only
+    attach to the outermost stage on a thread; nested stages are timed but
+    not profiled. cProfile output is written to profile_dir as <stage>.prof.
+    """
+    def __init__(self, profile=None, profile_dir=None):
+        if profile is None:
+            profile = [p for p in os.environ.get("DUB_PROFILE", "").split(",") if p]
+        self.profile = set(profile)
+        self.profile_dir = profile_dir
+        self.stages = []
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, buckets=DEFAULT_LATENCY_BUCKETS):
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram(buckets)
+            return self.histograms[name]
+
+    @contextmanager
+    def stage(self, name):
+        record = StageRecord(name)
+        profiler = self._start_profilers()
+        sampler = _PeakRSSSampler().start()
+        read_before, written_before = read_io_bytes()
+        cpu_before = cpu_seconds()
+        wall_before = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record.error = str(e)
+            raise
+        finally:
+            record.wall_seconds = time.perf_counter() - wall_before
+            record.cpu_seconds = cpu_seconds() - cpu_before
+            read_after, written_after = read_io_bytes()
+            if read_before is not None and read_after is not None:
+                record.read_bytes = read_after - read_before
+                record.written_bytes = written_after - written_before
+            record.peak_rss_bytes = sampler.stop()
+            self._stop_profilers(profiler, record)
+            with self._lock:
+                self.stages.append(record)
+
+    def _start_profilers(self):
+        state = {}
+        if not self.profile or getattr(_profiling, "active", False):
+            return state
+        _profiling.active = True
+        state["owner"] = True
+        if "tracemalloc" in self.profile:
+            _acquire_tracemalloc()
+            state["tracemalloc"] = True
+        if "cprofile" in self.profile:
+            import cProfile
+            state["cprofile"] = cProfile.Profile()
+            state["cprofile"].enable()
+        return state
+
+    def _stop_profilers(self, state, record):
+        if "cprofile" in state:
+            profiler = state["cprofile"]
+            profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(15)
+            record.profile["cprofile_top"] = out.getvalue()
+            if self.profile_dir:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                path = os.path.join(self.profile_dir, f"{record.name}.prof")
+                profiler.dump_stats(path)
+                record.profile["cprofile_path"] = path
+        if "tracemalloc" in state:
+            snapshot, peak = _release_tracemalloc()
+            record.profile["tracemalloc_peak_bytes"] = peak
+            record.profile["tracemalloc_top"] = [
+                str(stat) for stat in snapshot.statistics("lineno")[:10]
+            ]
+        if state.get("owner"):
+            _profiling.active = False
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "stages": [record.to_dict() for record in self.stages],
+                "histograms": {name: h.to_dict() for name, h in self.histograms.items()}
+            }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self, prefix="dub"):
+        """
+        Prometheus text exposition snapshot of every stage and histogram.
+        """
+        data = self.to_dict()
+        lines = []
+        gauges = [
+            ("stage_wall_seconds", "wall_seconds", "Wall-clock time per stage"),
+            ("stage_cpu_seconds", "cpu_seconds", "CPU time per stage (incl. children)"),
+            ("stage_peak_rss_bytes", "peak_rss_bytes", "Peak resident memory during the stage"),
+            ("stage_read_bytes", "read_bytes", "Bytes read from storage during the stage"),
+            ("stage_written_bytes", "written_bytes", "Bytes written to storage during the stage")
+        ]
+        for metric, field, help_text in gauges:
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} gauge")
+            for stage in data["stages"]:
+                if stage[field] is not None:
+                    lines.append(f'{prefix}_{metric}{{stage="{_label(stage["stage"])}"}} {stage[field]}')
+
+        lines.append(f"# HELP {prefix}_stage_items Items processed per stage")
+        lines.append(f"# TYPE {prefix}_stage_items gauge")
+        for stage in data["stages"]:
+            for key, value in stage["counts"].items():
+                lines.append(f'{prefix}_stage_items{{stage="{_label(stage["stage"])}",kind="{_label(key)}"}} {value}')
+
+        for name, histogram in data["histograms"].items():
+            metric = _metric_name(f"{prefix}_{name}")
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, count in histogram["buckets"].items():
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram["count"]}')
+            lines.append(f"{metric}_sum {histogram['sum']}")
+            lines.append(f"{metric}_count {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory, basename="metrics"):
+        """
+        Writes <basename>.json and <basename>.prom into directory.
+        """
+        os.makedirs(directory, exist_ok=True)
+        json_path = os.path.join(directory, f"{basename}.json")
+        prom_path = os.path.join(directory, f"{basename}.prom")
+        for path, text in ((json_path, self.to_json()), (prom_path, self.to_prometheus())):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        return json_path, prom_path
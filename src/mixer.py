@@ -0,0 +1,226 @@
+import numpy as np
+
+# Frames rendered per block; bounds the float32 temporaries during the final mix
+RENDER_BLOCK_FRAMES = 44100 * 30
+
+
+def db_to_gain(db):
+    return np.float32(10.0 ** (db / 20.0))
+
+
+def segment_to_array(segment, sample_rate=None, channels=None):
+    """
+    Converts a pydub AudioSegment to a float32 array of shape (frames, channels)
+    in [-1, 1]. Resamples/remixes first if sample_rate or channels are given.
+    """
+    if sample_rate and segment.frame_rate != sample_rate:
+        segment = segment.set_frame_rate(sample_rate)
+    if channels and segment.channels != channels:
+        segment = segment.set_channels(channels)
+    if segment.sample_width != 2:
+        segment = segment.set_sample_width(2)
+    samples = np.frombuffer(segment.raw_data, dtype=np.int16).reshape(-1, segment.channels)
+    return samples.astype(np.float32) / 32768.0
+
+
+def load_audio_array(path, sample_rate=None, channels=None, format=None):
+    """
+    Decodes an audio file (path or file-like object) once into a float32
+    (frames, channels) array.
+    """
+    from pydub import AudioSegment
+    return segment_to_array(AudioSegment.from_file(path, format=format), sample_rate, channels)
+
+
+def array_to_segment(samples, sample_rate):
+    """
+    Converts a float32 or int16 (frames, channels) array back to an AudioSegment.
+    """
+    if samples.dtype != np.int16:
+        samples = float_to_int16(samples)
+    from pydub import AudioSegment
+    return AudioSegment(
+        data=np.ascontiguousarray(samples).tobytes(),
+        sample_width=2,
+        frame_rate=sample_rate,
+        channels=samples.shape[1]
+    )
+
+
+def float_to_int16(samples):
+    return (np.clip(samples, -1.0, 1.0) * 32767.0).astype(np.int16)
+
+
+def soft_limit(samples, threshold=0.9):
+    """
+    Vectorized soft-knee limiter: leaves samples below threshold untouched and
+    squashes everything above it smoothly towards full scale with tanh.
+    Works in place on float32 arrays and returns them.
+    """
+    headroom = 1.0 - threshold
+    magnitude = np.abs(samples)
+    over = magnitude > threshold
+    if np.any(over):
+        squashed = threshold + headroom * np.tanh((magnitude[over] - threshold) / headroom)
+        samples[over] = np.copysign(squashed, samples[over])
+    return samples
+
+
+def merge_intervals(intervals, gap=0):
+    """
+    Sorts (start, end) frame intervals and merges those that overlap or are
+    separated by at most `gap` frames. Returns an (n, 2) int64 array.
+    """
+    if len(intervals) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    arr = np.asarray(intervals, dtype=np.int64).reshape(-1, 2)
+    arr = arr[arr[:, 1] > arr[:, 0]]
+    if len(arr) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    arr = arr[np.argsort(arr[:, 0], kind="stable")]
+
+    # A new group starts wherever the start is past every earlier end (+ gap)
+    running_end = np.maximum.accumulate(arr[:, 1])
+    new_group = np.empty(len(arr), dtype=bool)
+    new_group[0] = True
+    new_group[1:] = arr[1:, 0] > running_end[:-1] + gap
+    group_starts = np.flatnonzero(new_group)
+    group_ends = np.append(group_starts[1:], len(arr)) - 1
+    return np.stack([arr[group_starts, 0], running_end[group_ends]], axis=1)
+
+
+class DuckingEnvelope:
+    """
+    Per-frame background gain driven by speech intervals (sidechain ducking).
+
+    Outside speech the gain is 1.0; inside a (merged) interval it is
+    `duck_db`. The gain ramps down linearly in dB over `attack` frames ending
+    at the interval start, and back up over `release` frames starting at the
+    interval end:
+
+        frame start - attack   -> 1.0 (ramp begins)
+        frame start .. end - 1 -> fully ducked
+        frame end + release    -> 1.0 (ramp finished)
+
+    Gains are generated lazily per block, so a full-length film never needs a
+    whole-track envelope in memory; slicing (`env[a:b]`) returns that block.
+    Total work is linear in frames plus intervals.
+    """
+    def __init__(self, intervals, n_frames, sample_rate, duck_db=-10.0,
+                 attack_ms=80, release_ms=300, hold_ms=200):
+        self.n_frames = int(n_frames)
+        self.duck_gain = db_to_gain(duck_db)
+        self.attack = int(round(attack_ms * sample_rate / 1000.0))
+        self.release = int(round(release_ms * sample_rate / 1000.0))
+        # Close lines are merged so the music doesn't pump between them
+        hold = int(round(hold_ms * sample_rate / 1000.0))
+        self.intervals = merge_intervals(intervals, gap=hold)
+
+        # Ramps are precomputed once; every interval reuses them
+        self.attack_curve = db_to_gain(duck_db * (np.arange(self.attack, dtype=np.float32) / max(1, self.attack)))
+        self.release_curve = db_to_gain(duck_db * (1.0 - np.arange(1, self.release + 1, dtype=np.float32) / max(1, self.release)))
+
+    def __len__(self):
+        return self.n_frames
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("DuckingEnvelope only supports contiguous slices")
+        start, end, _ = key.indices(self.n_frames)
+        return self.block(start, max(start, end))
+
+    def block(self, start, end):
+        gain = np.ones(end - start, dtype=np.float32)
+        if len(self.intervals) == 0:
+            return gain
+
+        # Only intervals whose ramps reach into [start, end) matter
+        first = np.searchsorted(self.intervals[:, 1] + self.release, start, side="right")
+        last = np.searchsorted(self.intervals[:, 0] - self.attack, end, side="left")
+        for s, e in self.intervals[first:last]:
+            self._apply(gain, start, s - self.attack, self.attack_curve)
+            lo, hi = max(s, start), min(e, end)
+            if hi > lo:
+                gain[lo - start:hi - start] = self.duck_gain
+            self._apply(gain, start, e, self.release_curve)
+        return gain
+
+    @staticmethod
+    def _apply(gain, block_start, curve_start, curve):
+        # Overlapping ramps keep the deeper duck (gain is monotonic in duck amount)
+        lo = max(curve_start, block_start)
+        hi = min(curve_start + len(curve), block_start + len(gain))
+        if hi <= lo:
+            return
+        target = gain[lo - block_start:hi - block_start]
+        np.minimum(target, curve[lo - curve_start:hi - curve_start], out=target)
+
+    def to_array(self):
+        return self.block(0, self.n_frames)
+
+
+class TimelineMixer:
+    """
+    Mixes speech clips into a preallocated float32 buffer at sample offsets.
+
+    Each clip is added in place, so building the speech track is
+    O(total clip length) instead of pydub's O(segments x track length).
+    The speech bus is mono (TTS output is mono) and is broadcast onto the
+    background's channels when rendering.
+    """
+    def __init__(self, n_frames, sample_rate=44100):
+        self.sample_rate = sample_rate
+        self.n_frames = int(n_frames)
+        self.speech = np.zeros(self.n_frames, dtype=np.float32)
+
+    def ms_to_frames(self, ms):
+        return int(round(ms * self.sample_rate / 1000.0))
+
+    def add(self, samples, offset_frames, gain_db=0.0):
+        """
+        Adds a float32 clip (frames,) or (frames, channels) at offset_frames.
+        Returns the (start, end) frame range actually written.
+        """
+        if samples.ndim == 2:
+            samples = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+        start = max(0, int(offset_frames))
+        end = min(self.n_frames, int(offset_frames) + len(samples))
+        if end <= start:
+            return start, start
+        clip = samples[start - int(offset_frames):end - int(offset_frames)]
+        if gain_db:
+            self.speech[start:end] += clip * db_to_gain(gain_db)
+        else:
+            self.speech[start:end] += clip
+        return start, end
+
+    def render(self, background, background_gain_db=-8.0, speech_gain_db=0.0,
+               background_envelope=None, limiter_threshold=0.9, start=0, end=None):
+        """
+        Mixes the speech bus over `background` (int16 or float32, (frames, channels))
+        and returns an int16 array of the same shape.
+        background_envelope, if given, is a per-frame gain (array or
+        DuckingEnvelope) applied to the background on top of background_gain_db.
+        start/end render only frames [start, end) of the timeline.
+        Works in fixed-size blocks so peak memory stays close to the output size.
+        """
+        n_frames = min(self.n_frames, len(background))
+        if end is not None:
+            n_frames = min(n_frames, end)
+        start = min(start, n_frames)
+        channels = background.shape[1]
+        out = np.empty((n_frames - start, channels), dtype=np.int16)
+        bg_gain = db_to_gain(background_gain_db)
+        sp_gain = db_to_gain(speech_gain_db)
+        scale = np.float32(1.0 / 32768.0) if background.dtype == np.int16 else np.float32(1.0)
+
+        for block_start in range(start, n_frames, RENDER_BLOCK_FRAMES):
+            block_end = min(n_frames, block_start + RENDER_BLOCK_FRAMES)
+            block = background[block_start:block_end].astype(np.float32) * (scale * bg_gain)
+            if background_envelope is not None:
+                block *= background_envelope[block_start:block_end][:, None]
+            block += (self.speech[block_start:block_end] * sp_gain)[:, None]
+            if limiter_threshold:
+                soft_limit(block, limiter_threshold)
+            out[block_start - start:block_end - start] = float_to_int16(block)
+        return out
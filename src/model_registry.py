@@ -0,0 +1,145 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+
+class _Entry:
+    def __init__(self, model, size_bytes, unloader):
+        self.model = model
+        self.size_bytes = size_bytes
+        self.unloader = unloader
+        self.loaded_at = time.time()
+
+
+class ModelRegistry:
+    """
+    Keeps loaded models resident across requests.
+
+    Models are loaded lazily on first get() and evicted least-recently-used
+    when the estimated total size would exceed memory_budget_bytes
+    (None = unlimited). Loads are serialized, so two requests never load the
+    same model twice. `on_evict` runs after every eviction (e.g. to empty the
+    CUDA cache).
+    """
+    def __init__(self, memory_budget_bytes=None, on_evict=None):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.on_evict = on_evict
+        self._entries = OrderedDict()
+        self._declared = {}
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def register(self, key, loader, size_bytes=0, unloader=None):
+        """
+        Declares how to load `key` without loading it (see warm_up()).
+        """
+        with self._lock:
+            self._declared[key] = (loader, size_bytes, unloader)
+
+    def get(self, key, loader=None, size_bytes=None, unloader=None):
+        """
+        Returns the model for key, loading it with `loader()` (or the
+        registered loader) on first use.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.model
+
+            declared = self._declared.get(key, (None, 0, None))
+            loader = loader or declared[0]
+            if loader is None:
+                raise KeyError(f"No loader registered for model {key!r}")
+            size_bytes = declared[1] if size_bytes is None else size_bytes
+            unloader = unloader or declared[2]
+
+            self._make_room(size_bytes)
+            start = time.perf_counter()
+            model = loader()
+            print(f"Loaded model {key} in {time.perf_counter() - start:.1f}s")
+            self._entries[key] = _Entry(model, size_bytes, unloader)
+            self.loads += 1
+            return model
+
+    def _make_room(self, size_bytes):
+        if self.memory_budget_bytes is None:
+            return
+        while self._entries and self.used_bytes() + size_bytes > self.memory_budget_bytes:
+            oldest = next(iter(self._entries))
+            self.evict(oldest)
+
+    def evict(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return False
+            self.evictions += 1
+            print(f"Evicting model {key}")
+            if entry.unloader:
+                entry.unloader(entry.model)
+            del entry
+            if self.on_evict:
+                self.on_evict()
+            return True
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self.evict(key)
+
+    def warm_up(self, keys=None):
+        """
+        Loads the given (or all registered) models ahead of the first request.
+        """
+        keys = list(self._declared) if keys is None else keys
+        for key in keys:
+            self.get(key)
+
+    def is_loaded(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def loaded(self):
+        with self._lock:
+            return list(self._entries)
+
+    def used_bytes(self):
+        with self._lock:
+            return sum(entry.size_bytes for entry in self._entries.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": [str(key) for key in self._entries],
+                "used_bytes": self.used_bytes(),
+                "budget_bytes": self.memory_budget_bytes,
+                "loads": self.loads,
+                "hits": self.hits,
+                "evictions": self.evictions
+            }
+
+
+_default_registry = None
+_default_lock = threading.Lock()
+
+
+def get_model_registry():
+    """
+    Process-wide registry shared by every Transcriber.
+    Budget comes from DUB_MODEL_BUDGET_MB (default 4096 MB, sized for 6GB cards).
+    """
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            from src.utils import clear_gpu_memory
+            budget_mb = float(os.environ.get("DUB_MODEL_BUDGET_MB", "4096"))
+            _default_registry = ModelRegistry(
+                memory_budget_bytes=int(budget_mb * 1024 * 1024),
+                on_evict=clear_gpu_memory
+            )
+        return _default_registry
@@ -0,0 +1,141 @@
+import os
+from src.audio_processor import AudioProcessor
+from src.dubbing_engine import DubbingEngine
+from src.job_store import JobStore
+from src.segment_table import SegmentTable
+from src.separation_service import get_separation_service
+
+SEPARATION_MODELS = ["Kim_Vocal_2.onnx", "UVR-MDX-NET-Inst_HQ_2.onnx"]
+ASR_MODEL = "large-v2"
+# Part of the transcribe stage key: checkpoints in an older artifact format just re-run
+SEGMENTS_FORMAT = "segment_table"
+
+
+class DubbingPipeline:
+    """
+    The four pipeline stages (extract, separate, transcribe, dub) run inside a
+    per-input job directory. Every stage is checkpointed, so a retry after a
+    failure, or a re-run with only later settings changed, skips straight to
+    the first stage whose inputs differ.
+    Each stage method returns (stage_key, result, cached). Stage metrics are
+    recorded on job.metrics and exported to metrics.json / metrics.prom in
+    the job dir after every stage.
+    With window_seconds set, the dub stage publishes the mix window by
+    window (see DubbingEngine.stitch_and_mix_progressive) while it runs.
+    """
+    def __init__(self, job_store=None, hf_token=None, device="cuda", compute_type="int8",
+                 dubbing=None, chunk_seconds=None, model_dir=None, window_seconds=None,
+                 transcribe_workers=None, transcript_cache_dir=None):
+        self.store = job_store or JobStore()
+        self.hf_token = hf_token
+        self.device = device
+        self.compute_type = compute_type
+        self.chunk_seconds = chunk_seconds
+        self.window_seconds = window_seconds
+        # CPU only: parallel sharded transcription (see Transcriber)
+        self.transcribe_workers = transcribe_workers
+        # ASR / alignment / diarization results, reused across tasks and jobs
+        self.transcript_cache_dir = transcript_cache_dir or self.store.path("transcript_cache")
+        # Separation models; pass a shared dir when stores are per session
+        self.model_dir = model_dir or self.store.path("models")
+        # TTS clips live in one content-addressed cache shared by all jobs
+        self.dubbing = dubbing or DubbingEngine(cache_dir=self.store.path("tts_cache"))
+        self._transcriber = None
+
+    @property
+    def transcriber(self):
+        if self._transcriber is None:
+            from src.transcriber import Transcriber
+            self._transcriber = Transcriber(device=self.device, compute_type=self.compute_type, hf_token=self.hf_token,
+                                            shard_workers=self.transcribe_workers,
+                                            cache_dir=self.transcript_cache_dir)
+        return self._transcriber
+
+    def open_job(self, input_path):
+        return self.store.open_job(input_path, {"sample_rate": 44100, "channels": 2})
+
+    def _run_stage(self, job, name, inputs, fn, count=None):
+        """
+        job.run_stage wrapped in a metrics stage. count(artifacts) may return
+        {kind: n} items to record on the stage.
+        """
+        try:
+            with job.metrics.stage(name) as stage:
+                key, artifacts, cached = job.run_stage(name, inputs, fn)
+                stage.count("cached", int(cached))
+                for kind, n in (count(artifacts) if count else {}).items():
+                    stage.count(kind, n)
+        finally:
+            job.metrics.write(job.dir)
+        return key, artifacts, cached
+
+    def extract(self, job):
+        def run(stage_dir):
+            processor = AudioProcessor(output_dir=stage_dir, model_dir=self.model_dir)
+            return {"audio": processor.extract_audio(job.input_path)}
+
+        key, artifacts, cached = self._run_stage(job, "extract", [job.input_hash, job.manifest["settings"]], run)
+        return key, artifacts["audio"], cached
+
+    def separate(self, job, extract_key, audio_path):
+        def run(stage_dir):
+            processor = AudioProcessor(output_dir=stage_dir, model_dir=self.model_dir)
+            vocals_path, inst_path = processor.separate_audio(audio_path, chunk_seconds=self.chunk_seconds)
+            return {"vocals": vocals_path, "instrumental": inst_path}
+
+        inputs = [extract_key, SEPARATION_MODELS, self.chunk_seconds]
+        key, artifacts, cached = self._run_stage(job, "separate", inputs, run)
+        return key, (artifacts["vocals"], artifacts["instrumental"]), cached
+
+    def transcribe(self, job, separate_key, vocals_path, task="transcribe", num_speakers=None):
+        def run(stage_dir):
+            if self.transcriber.device == "cuda":
+                # The separation sessions aren't in the WhisperX memory budget; free their VRAM first
+                get_separation_service(self.model_dir).unload_all()
+            segments = self.transcriber.transcribe_and_diarize(vocals_path, num_speakers=num_speakers, task=task)
+            table_path = segments.save(os.path.join(stage_dir, "segments"))
+            return {"segment_table": table_path, "segment_count": len(segments)}
+
+        def count(artifacts):
+            return {"segments": artifacts.get("segment_count", 0)}
+
+        inputs = [separate_key, ASR_MODEL, SEGMENTS_FORMAT, task, num_speakers, bool(self.hf_token)]
+        if self.transcribe_workers and self.device == "cpu":
+            # Shard cuts change segment boundaries slightly
+            inputs.append({"transcribe_workers": self.transcribe_workers})
+        key, artifacts, cached = self._run_stage(job, "transcribe", inputs, run, count)
+        return key, SegmentTable.load(artifacts["segment_table"]), cached
+
+    def dub(self, job, transcribe_key, segments, inst_path, on_chunk=None, cancel=None):
+        """
+        on_chunk(info) is called per finished window when window_seconds is
+        set. It is not called when the stage is reused from a checkpoint.
+        Setting `cancel` stops a progressive dub (raises DubCancelled).
+        """
+        def run(stage_dir):
+            final_output_path = os.path.join(stage_dir, "final_dubbed_audio.mp3")
+            artifacts = {"mix": final_output_path}
+            if self.window_seconds:
+                chunk_dir = os.path.join(stage_dir, "progressive")
+                self.dubbing.stitch_and_mix_progressive(
+                    segments, inst_path, final_output_path, chunk_dir,
+                    window_seconds=self.window_seconds, on_chunk=on_chunk, metrics=job.metrics,
+                    cancel=cancel
+                )
+                artifacts["progressive"] = chunk_dir
+            else:
+                self.dubbing.stitch_and_mix(segments, inst_path, final_output_path, metrics=job.metrics)
+            if self.dubbing.tts_cache:
+                artifacts["tts_cache"] = self.dubbing.tts_cache.cache_dir
+            return artifacts
+
+        inputs = [
+            transcribe_key,
+            self.dubbing.voice_map,
+            self.dubbing.default_voice,
+            self.dubbing.tts_backend.settings(),
+            self.dubbing.time_fit_settings(),
+            self.dubbing.segment_planner.settings()
+        ]
+        key, artifacts, cached = self._run_stage(job, "dub", inputs, run)
+        return key, artifacts["mix"], cached
@@ -0,0 +1,71 @@
+import os
+import wave
+import numpy as np
+from src.mixer import array_to_segment
+
+PLAYLIST_NAME = "playlist.m3u8"
+GROWING_NAME = "progressive.wav"
+
+
+class ProgressiveOutput:
+    """
+    Publishes a mix window by window while the rest is still being dubbed.
+
+    Each append() writes the window as its own chunk file, appends it to a
+    growing WAV (its header is patched after every write, so the file is
+    playable at any point) and rewrites an HLS-style event playlist listing
+    the chunks so far. close() ends the playlist.
+    """
+    def __init__(self, out_dir, sample_rate, channels, chunk_format="mp3"):
+        self.out_dir = out_dir
+        self.sample_rate = sample_rate
+        self.chunk_format = chunk_format
+        self.chunks = []
+        os.makedirs(out_dir, exist_ok=True)
+        self.growing_path = os.path.join(out_dir, GROWING_NAME)
+        self.playlist_path = os.path.join(out_dir, PLAYLIST_NAME)
+        self._wav = wave.open(self.growing_path, "wb")
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+        self._write_playlist(ended=False)
+
+    @property
+    def seconds(self):
+        return sum(duration for _, duration in self.chunks)
+
+    def append(self, samples):
+        """
+        Publishes one int16 (frames, channels) window; returns the chunk path.
+        """
+        chunk_path = os.path.join(self.out_dir, f"chunk_{len(self.chunks):05d}.{self.chunk_format}")
+        tmp_path = f"{chunk_path}.part"
+        array_to_segment(samples, self.sample_rate).export(tmp_path, format=self.chunk_format)
+        os.replace(tmp_path, chunk_path)
+        self._wav.writeframes(np.ascontiguousarray(samples, dtype="<i2").tobytes())
+        self.chunks.append((os.path.basename(chunk_path), len(samples) / float(self.sample_rate)))
+        self._write_playlist(ended=False)
+        return chunk_path
+
+    def close(self):
+        self._wav.close()
+        self._write_playlist(ended=True)
+
+    def _write_playlist(self, ended):
+        target = max([duration for _, duration in self.chunks] or [1.0])
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{int(np.ceil(target))}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:EVENT"
+        ]
+        for name, duration in self.chunks:
+            lines.append(f"#EXTINF:{duration:.3f},")
+            lines.append(name)
+        if ended:
+            lines.append("#EXT-X-ENDLIST")
+        tmp_path = f"{self.playlist_path}.part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.playlist_path)
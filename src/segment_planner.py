@@ -0,0 +1,137 @@
+import numpy as np
+
+
+class SegmentPlanner:
+    """
+    Merges adjacent same-speaker segments into fewer TTS requests.
+
+    Segments are merged while the speaker stays the same, the silence
+    between them is at most max_gap seconds and the merged unit stays within
+    max_chars / max_duration. Each unit keeps its source segments in
+    unit["parts"], so the synthesized clip can be split back and each piece
+    placed at its own segment's start (split=True), or placed as a single
+    clip spanning the whole unit (split=False). merge=False gives one unit
+    per segment.
+    """
+    def __init__(self, max_gap=0.6, max_chars=300, max_duration=15.0, split=True, merge=True, search_ms=150):
+        self.merge = merge
+        self.max_gap = max_gap
+        self.max_chars = max_chars
+        self.max_duration = max_duration
+        self.split = split
+        self.search_ms = search_ms
+
+    def settings(self):
+        return {
+            "merge": self.merge,
+            "max_gap": self.max_gap,
+            "max_chars": self.max_chars,
+            "max_duration": self.max_duration,
+            "split": self.split
+        }
+
+    def plan(self, segments):
+        """
+        Returns synthesis units (segment-like dicts with start, end, text,
+        speaker and parts) in timeline order. Empty segments are dropped.
+        """
+        units = []
+        for seg in segments:
+            text = seg.get('text', '').strip()
+            if not text:
+                continue
+            speaker = seg.get('speaker', 'Unknown')
+            last = units[-1] if units else None
+            if (self.merge
+                    and last is not None
+                    and last['speaker'] == speaker
+                    and seg['start'] - last['end'] <= self.max_gap
+                    and len(last['text']) + 1 + len(text) <= self.max_chars
+                    and seg['end'] - last['start'] <= self.max_duration):
+                last['text'] = f"{last['text']} {text}"
+                last['end'] = max(last['end'], seg['end'])
+                last['parts'].append(seg)
+            else:
+                units.append({
+                    'start': seg['start'],
+                    'end': seg['end'],
+                    'text': text,
+                    'speaker': speaker,
+                    'parts': [seg]
+                })
+        return units
+
+    def pieces(self, unit):
+        """
+        The segments a unit's clip is placed as: its parts when splitting,
+        otherwise the unit itself.
+        """
+        if self.split and len(unit['parts']) > 1:
+            return unit['parts']
+        return [unit]
+
+    def split_clip(self, clip, unit, sample_rate, words=None):
+        """
+        Splits a unit's mono clip into one clip per piece.
+        With the TTS word timings (`words`, {"word", "start", "end"} dicts),
+        each cut goes halfway between the last word of a part and the first
+        word of the next. Without them, or if they don't line up with the
+        text, cut points start proportional to each part's share of the
+        text and are moved to the quietest 10 ms within +/- search_ms.
+        """
+        parts = self.pieces(unit)
+        if len(parts) == 1:
+            return [clip]
+        cuts = self._word_cuts(parts, words, len(clip), sample_rate) if words else None
+        if cuts is None:
+            cuts = self._energy_cuts(parts, clip, sample_rate)
+        return np.split(clip, cuts)
+
+    @staticmethod
+    def _word_cuts(parts, words, n_frames, sample_rate):
+        # Character offset of every spoken word in the unit's text
+        text = " ".join(p.get('text', '').strip() for p in parts)
+        offsets = []
+        cursor = 0
+        for word in words:
+            found = text.find(word['word'], cursor)
+            if found < 0:
+                return None
+            offsets.append(found)
+            cursor = found + len(word['word'])
+        offsets = np.array(offsets)
+
+        cuts = []
+        previous = 0
+        part_start = 0
+        for part in parts[:-1]:
+            part_start += len(part.get('text', '').strip()) + 1
+            # First word of the next part; the one before it ends this part
+            first = int(np.searchsorted(offsets, part_start))
+            if first == 0 or first == len(words):
+                return None
+            cut_seconds = (words[first - 1]['end'] + words[first]['start']) / 2.0
+            cut = int(np.clip(round(cut_seconds * sample_rate), previous, n_frames))
+            cuts.append(cut)
+            previous = cut
+        return cuts
+
+    def _energy_cuts(self, parts, clip, sample_rate):
+        lengths = np.array([len(p.get('text', '').strip()) + 1 for p in parts], dtype=np.float64)
+        targets = (np.cumsum(lengths)[:-1] / lengths.sum() * len(clip)).astype(np.int64)
+
+        hop = max(1, sample_rate // 100)
+        n_hops = len(clip) // hop
+        energy = np.square(clip[:n_hops * hop].reshape(n_hops, hop)).mean(axis=1) if n_hops else np.zeros(0)
+        radius = int(self.search_ms * sample_rate / 1000) // hop
+        cuts = []
+        previous = 0
+        for target in targets:
+            center = target // hop
+            lo = max(previous // hop + 1, center - radius)
+            hi = min(n_hops, center + radius + 1)
+            cut = (lo + int(np.argmin(energy[lo:hi]))) * hop if lo < hi else int(target)
+            cut = int(np.clip(cut, previous, len(clip)))
+            cuts.append(cut)
+            previous = cut
+        return cuts
@@ -0,0 +1,218 @@
+import os
+import json
+import shutil
+import numpy as np
+
+# Arrays written by SegmentTable.save(), one .npy file each
+COLUMNS = [
+    "start", "end", "speaker_id", "text_offsets", "text_data",
+    "word_offsets", "word_start", "word_end", "word_score", "word_speaker_id",
+    "word_text_offsets", "word_text_data"
+]
+SPEAKERS_NAME = "speakers.json"
+
+
+def _pack_strings(strings):
+    """
+    One UTF-8 byte buffer plus (n + 1) int64 offsets into it.
+    """
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _take_strings(data, offsets, indices):
+    """
+    Buffer and offsets holding only the strings at `indices`.
+    """
+    lengths = offsets[indices + 1] - offsets[indices]
+    new_offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    chunks = [data[offsets[i]:offsets[i + 1]] for i in indices]
+    return new_offsets, np.concatenate(chunks).astype(np.uint8) if chunks else np.empty(0, dtype=np.uint8)
+
+
+def _float_or_nan(value):
+    return np.nan if value is None else float(value)
+
+
+class SegmentTable:
+    """
+    Transcript segments as columns instead of WhisperX's list of dicts.
+
+    Per segment: float64 start/end, an int32 speaker id into `speakers`
+    (-1 = no speaker) and its text as a slice of one UTF-8 buffer. Words
+    are stored the same way, grouped per segment through word_offsets
+    (segment i owns words word_offsets[i]:word_offsets[i + 1]); missing
+    word timestamps and scores are NaN. Segments are kept sorted by start.
+
+    Rows read back as WhisperX-shaped dicts (iteration, indexing,
+    to_whisperx), so code written against the dict form keeps working.
+    Keys other than start/end/text/speaker/words (and word/start/end/
+    score/speaker on words) are not kept.
+    save()/load() use one .npy file per column, memory-mapped on load.
+    """
+    def __init__(self, columns, speakers):
+        self.columns = columns
+        self.speakers = list(speakers)
+        for name in COLUMNS:
+            setattr(self, name, columns[name])
+        # Running max of ends: lets overlapping() skip segments that ended early
+        self._max_end = np.maximum.accumulate(self.end) if len(self.end) else self.end
+
+    @classmethod
+    def from_whisperx(cls, segments):
+        """
+        Builds a table from WhisperX segment dicts (aligned or not).
+        """
+        segments = sorted(segments, key=lambda seg: seg.get("start", 0.0))
+        speakers = {}
+
+        def speaker_id(name):
+            if name is None:
+                return -1
+            return speakers.setdefault(name, len(speakers))
+
+        words = [word for seg in segments for word in seg.get("words", ())]
+        word_counts = [len(seg.get("words", ())) for seg in segments]
+        columns = {
+            "start": np.array([float(seg.get("start", 0.0)) for seg in segments], dtype=np.float64),
+            "end": np.array([float(seg.get("end", seg.get("start", 0.0))) for seg in segments], dtype=np.float64),
+            "speaker_id": np.array([speaker_id(seg.get("speaker")) for seg in segments], dtype=np.int32),
+            "word_offsets": np.concatenate([[0], np.cumsum(word_counts, dtype=np.int64)]).astype(np.int64),
+            "word_start": np.array([_float_or_nan(word.get("start")) for word in words], dtype=np.float64),
+            "word_end": np.array([_float_or_nan(word.get("end")) for word in words], dtype=np.float64),
+            "word_score": np.array([_float_or_nan(word.get("score")) for word in words], dtype=np.float32),
+            "word_speaker_id": np.array([speaker_id(word.get("speaker")) for word in words], dtype=np.int32)
+        }
+        columns["text_offsets"], columns["text_data"] = _pack_strings([seg.get("text", "") for seg in segments])
+        columns["word_text_offsets"], columns["word_text_data"] = _pack_strings([word.get("word", "") for word in words])
+        return cls(columns, sorted(speakers, key=speakers.get))
+
+    def __len__(self):
+        return len(self.start)
+
+    @property
+    def n_words(self):
+        return len(self.word_start)
+
+    @staticmethod
+    def _string(data, offsets, i):
+        return bytes(data[offsets[i]:offsets[i + 1]]).decode("utf-8")
+
+    def text(self, i):
+        return self._string(self.text_data, self.text_offsets, i)
+
+    def speaker(self, i):
+        speaker_id = int(self.speaker_id[i])
+        return self.speakers[speaker_id] if speaker_id >= 0 else None
+
+    def words(self, i):
+        words = []
+        for w in range(int(self.word_offsets[i]), int(self.word_offsets[i + 1])):
+            word = {"word": self._string(self.word_text_data, self.word_text_offsets, w)}
+            for key, column in (("start", self.word_start), ("end", self.word_end), ("score", self.word_score)):
+                if not np.isnan(column[w]):
+                    word[key] = round(float(column[w]), 3)
+            if self.word_speaker_id[w] >= 0:
+                word["speaker"] = self.speakers[self.word_speaker_id[w]]
+            words.append(word)
+        return words
+
+    def row(self, i, words=True):
+        """
+        Segment i as a WhisperX dict.
+        """
+        seg = {"start": float(self.start[i]), "end": float(self.end[i]), "text": self.text(i)}
+        speaker = self.speaker(i)
+        if speaker is not None:
+            seg["speaker"] = speaker
+        if words and self.word_offsets[i + 1] > self.word_offsets[i]:
+            seg["words"] = self.words(i)
+        return seg
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.take(np.arange(len(self))[key])
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("segment index out of range")
+        return self.row(key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def to_whisperx(self, words=True):
+        """
+        List of WhisperX segment dicts; words=False drops the per-word dicts.
+        """
+        return [self.row(i, words=words) for i in range(len(self))]
+
+    def take(self, indices):
+        """
+        New table with the given segments, kept in start order.
+        """
+        indices = np.unique(np.asarray(indices, dtype=np.int64))
+        word_counts = self.word_offsets[indices + 1] - self.word_offsets[indices]
+        words = np.concatenate([np.arange(self.word_offsets[i], self.word_offsets[i + 1]) for i in indices] or
+                               [np.empty(0, dtype=np.int64)]).astype(np.int64)
+        columns = {
+            "start": self.start[indices],
+            "end": self.end[indices],
+            "speaker_id": self.speaker_id[indices],
+            "word_offsets": np.concatenate([[0], np.cumsum(word_counts)]).astype(np.int64),
+            "word_start": self.word_start[words],
+            "word_end": self.word_end[words],
+            "word_score": self.word_score[words],
+            "word_speaker_id": self.word_speaker_id[words]
+        }
+        columns["text_offsets"], columns["text_data"] = _take_strings(self.text_data, self.text_offsets, indices)
+        columns["word_text_offsets"], columns["word_text_data"] = _take_strings(
+            self.word_text_data, self.word_text_offsets, words
+        )
+        return SegmentTable(columns, self.speakers)
+
+    def overlapping(self, start, end=None):
+        """
+        Indices of segments overlapping time `start` (end=None) or the
+        interval [start, end), in start order.
+        """
+        end = start if end is None else end
+        # Segments from `first` on may still be running; none after `last` has begun
+        first = np.searchsorted(self._max_end, start, side="right")
+        last = np.searchsorted(self.start, end, side="right" if end == start else "left")
+        candidates = np.arange(first, last)
+        return candidates[self.end[first:last] > start]
+
+    def save(self, path):
+        """
+        Writes the table to directory `path` (replaced atomically).
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in COLUMNS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(self.columns[name]))
+        with open(os.path.join(tmp_path, SPEAKERS_NAME), "w", encoding="utf-8") as f:
+            json.dump(self.speakers, f, ensure_ascii=False)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Opens a table written by save(); columns are memory-mapped unless mmap=False.
+        """
+        mode = "r" if mmap else None
+        columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in COLUMNS}
+        with open(os.path.join(path, SPEAKERS_NAME), "r", encoding="utf-8") as f:
+            speakers = json.load(f)
+        return cls(columns, speakers)
+
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
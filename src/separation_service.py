@@ -0,0 +1,138 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from src.utils import clear_gpu_memory
+from src.chunked_separation import SeparatorStemModel, WavReader, separate_in_windows
+
+
+class SeparationResult:
+    def __init__(self, paths, timings):
+        self.paths = paths     # {(model_filename, stem): wav_path}
+        self.timings = timings # {phase: seconds}
+
+    def path(self, model_filename, stem):
+        return self.paths[(model_filename, stem)]
+
+    def format_timings(self):
+        return ", ".join(f"{phase}={seconds:.2f}s" for phase, seconds in self.timings.items())
+
+
+class SeparationService:
+    """
+    Long-lived separation front end.
+
+    Loaded models stay resident across jobs in an LRU of up to `max_models`
+    entries. On CPU only the first job pays the model load; on CUDA the
+    pipeline unloads them before transcription to make room for WhisperX
+    (see DubbingPipeline.transcribe), so every GPU job loads them again.
+    Each job cuts the input into the same windows for every requested model.
+    Models that take samples (OnnxStemModel) share one decode of each window;
+    audio-separator models (SeparatorStemModel) read the window's file
+    themselves, so the input is decoded once per such model.
+    `model_factory(model_filename)` returns a StemModel; the default builds
+    an audio-separator Separator per model.
+    """
+    def __init__(self, model_file_dir, max_models=2, model_factory=None):
+        self.model_file_dir = model_file_dir
+        self.max_models = max(1, int(max_models))
+        self.model_factory = model_factory or self._load_separator_model
+        self._models = OrderedDict()
+        # One job at a time: the resident sessions are not safe to share
+        self._lock = threading.Lock()
+
+    def _load_separator_model(self, model_filename):
+        from audio_separator.separator import Separator
+
+        work_dir = os.path.join(self.model_file_dir, "chunks")
+        separator = Separator(
+            log_level=logging.INFO,
+            output_dir=work_dir,
+            output_format="wav",
+            model_file_dir=self.model_file_dir
+        )
+        separator.load_model(model_filename=model_filename)
+        return SeparatorStemModel(separator, work_dir=work_dir, name=os.path.splitext(model_filename)[0])
+
+    def get_model(self, model_filename, timings=None):
+        """
+        Returns a resident model, loading it (and evicting the least recently
+        used one) if needed.
+        """
+        model = self._models.get(model_filename)
+        if model is not None:
+            self._models.move_to_end(model_filename)
+            return model
+
+        while len(self._models) >= self.max_models:
+            evicted_name, _ = self._models.popitem(last=False)
+            print(f"Unloading separation model {evicted_name}")
+            clear_gpu_memory()
+
+        print(f"Loading separation model {model_filename}...")
+        t0 = time.perf_counter()
+        model = self.model_factory(model_filename)
+        if timings is not None:
+            timings[f"load:{model_filename}"] = time.perf_counter() - t0
+        self._models[model_filename] = model
+        return model
+
+    def loaded_models(self):
+        return list(self._models)
+
+    def unload_all(self):
+        """
+        Drops every resident model (e.g. to hand VRAM to WhisperX on small GPUs).
+        """
+        with self._lock:
+            self._models.clear()
+        clear_gpu_memory()
+
+    def separate(self, audio_path, output_dir, requests, chunk_seconds=None, overlap_seconds=2):
+        """
+        requests: list of (model_filename, stem) to produce from audio_path.
+        Returns a SeparationResult with stem paths and per-phase timings.
+        """
+        with self._lock:
+            timings = OrderedDict()
+            job_start = time.perf_counter()
+            source = WavReader(audio_path)
+            base_name = os.path.splitext(os.path.basename(source.path))[0]
+
+            plan = OrderedDict()
+            paths = {}
+            for model_filename, stem in requests:
+                model = self.get_model(model_filename, timings)
+                model_name = os.path.splitext(model_filename)[0]
+                # Same naming scheme audio-separator uses for whole-file runs
+                stem_path = os.path.join(output_dir, f"{base_name}_({stem})_{model_name}.wav")
+                plan.setdefault(model_filename, (model, {}))[1][stem] = stem_path
+                paths[(model_filename, stem)] = stem_path
+
+            def report(done, total):
+                if total > 1:
+                    print(f"Separation: window {done}/{total}")
+
+            separate_in_windows(
+                source, list(plan.values()),
+                chunk_seconds=chunk_seconds,
+                overlap_seconds=overlap_seconds,
+                progress=report,
+                timings=timings
+            )
+            timings["total"] = time.perf_counter() - job_start
+            return SeparationResult(paths, timings)
+
+
+_default_service = None
+
+
+def get_separation_service(model_file_dir):
+    """
+    Process-wide service so every request reuses the same resident models.
+    """
+    global _default_service
+    if _default_service is None or _default_service.model_file_dir != model_file_dir:
+        _default_service = SeparationService(model_file_dir)
+    return _default_service
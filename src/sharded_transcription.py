@@ -0,0 +1,238 @@
+import os
+import queue
+import threading
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+SAMPLE_RATE = 16000
+# Shards shorter than this don't pay back a worker's batching overhead
+MIN_SHARD_SECONDS = 120
+# Read by the math libraries when their thread pools start
+THREAD_ENV_VARS = ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS"]
+
+
+def frame_energy_db(audio, sample_rate=SAMPLE_RATE, frame_ms=30):
+    """
+    Mean power per frame_ms frame in dB. Returns (energy, frame_samples).
+    """
+    frame = max(1, int(sample_rate * frame_ms / 1000))
+    n_frames = len(audio) // frame
+    frames = np.asarray(audio[:n_frames * frame], dtype=np.float32).reshape(n_frames, frame)
+    return 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10), frame
+
+
+def find_split_points(audio, n_shards, sample_rate=SAMPLE_RATE, frame_ms=30, search_seconds=30.0, pause_ms=300):
+    """
+    Sample offsets that cut audio into n_shards roughly equal shards:
+    [0, cut_1, ..., len(audio)]. Each cut is moved from its equal-length
+    position to the middle of the quietest pause_ms stretch within
+    search_seconds of it, so cuts fall between words.
+    """
+    energy, frame = frame_energy_db(audio, sample_rate, frame_ms)
+    pause = max(1, int(round(pause_ms / float(frame_ms))))
+    if n_shards <= 1 or len(energy) < pause * n_shards:
+        return [0, len(audio)]
+
+    # Mean energy of every pause-long run of frames, indexed by its first frame
+    csum = np.concatenate([[0.0], np.cumsum(energy)])
+    runs = (csum[pause:] - csum[:-pause]) / pause
+    radius = int(search_seconds * 1000 / frame_ms)
+    cuts = [0]
+    last = 0
+    for k in range(1, n_shards):
+        target = k * len(energy) // n_shards
+        lo, hi = max(last + 1, target - radius), min(len(runs), target + radius)
+        if hi <= lo:
+            best = target
+        else:
+            # Among equally quiet runs, the one closest to the target wins
+            index = np.arange(lo, hi)
+            best = lo + int(np.argmin(runs[lo:hi] + 1e-3 * np.abs(index - target)))
+        last = best
+        cuts.append(min(len(audio), (best + pause // 2) * frame))
+    cuts.append(len(audio))
+    return cuts
+
+
+def shard_count(n_samples, workers, sample_rate=SAMPLE_RATE, min_shard_seconds=MIN_SHARD_SECONDS):
+    return max(1, min(int(workers), int(n_samples / float(sample_rate) // min_shard_seconds)))
+
+
+def _shift(item, offset):
+    item = dict(item)
+    for key in ("start", "end"):
+        if item.get(key) is not None:
+            item[key] = round(item[key] + offset, 3)
+    return item
+
+
+def shift_segments(segments, offset):
+    """
+    Copies of WhisperX segments (and their words) moved by offset seconds.
+    """
+    shifted = []
+    for seg in segments:
+        seg = _shift(seg, offset)
+        if "words" in seg:
+            seg["words"] = [_shift(word, offset) for word in seg["words"]]
+        shifted.append(seg)
+    return shifted
+
+
+def merge_shard_results(results, offsets):
+    """
+    Stitches per-shard WhisperX transcribe() results back into one, shifting
+    each shard's timestamps by its start offset (seconds). The language is
+    the one most shards detected; ties go to the earliest shard.
+    """
+    segments = []
+    for result, offset in zip(results, offsets):
+        segments.extend(shift_segments(result.get("segments", []), offset))
+    languages = [result.get("language") for result in results if result.get("language")]
+    language = Counter(languages).most_common(1)[0][0] if languages else None
+    return {"segments": segments, "language": language}
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def core_sets(workers, threads):
+    """
+    Disjoint core lists, one per worker, or None if there are too few cores
+    to give every worker its own (the OS then schedules freely).
+    """
+    cores = available_cores()
+    if len(cores) < workers * threads:
+        return None
+    return [cores[i * threads:(i + 1) * threads] for i in range(workers)]
+
+
+def load_whisperx_model(threads, model_name="large-v2", device="cpu", compute_type="int8"):
+    import torch
+    import whisperx
+    torch.set_num_threads(threads)
+    return whisperx.load_model(model_name, device, compute_type=compute_type, threads=threads)
+
+
+class FakeWhisperModel:
+    """
+    Deterministic stand-in for a WhisperX model: one segment (with one word)
+    per voiced stretch, found by energy. For checks without the real model.
+    """
+    def __init__(self, threshold_db=-40.0, frame_ms=30):
+        self.threshold_db = threshold_db
+        self.frame_ms = frame_ms
+
+    def transcribe(self, audio, batch_size=4, task="transcribe"):
+        energy, frame = frame_energy_db(audio, SAMPLE_RATE, self.frame_ms)
+        voiced = np.concatenate([[False], energy > self.threshold_db, [False]])
+        edges = np.flatnonzero(voiced[1:] != voiced[:-1]).reshape(-1, 2)
+        segments = []
+        for start, end in edges * frame / float(SAMPLE_RATE):
+            start, end = round(float(start), 3), round(float(end), 3)
+            text = f"{task} {end - start:.2f}s"
+            segments.append({"start": start, "end": end, "text": text,
+                             "words": [{"word": text, "start": start, "end": end}]})
+        return {"segments": segments, "language": "en"}
+
+
+def load_fake_model(threads):
+    return FakeWhisperModel()
+
+
+# Per-process state of a shard worker
+_worker = {}
+
+
+def _init_worker(core_queue, threads, load_model):
+    # Pin before anything starts a thread pool, so workers never share cores
+    try:
+        cores = core_queue.get_nowait()
+    except queue.Empty:
+        cores = None
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    _worker.update(threads=threads, load_model=load_model, model=None)
+
+
+def _transcribe_shard(audio, task, batch_size):
+    if _worker["model"] is None:
+        _worker["model"] = _worker["load_model"](_worker["threads"])
+    return _worker["model"].transcribe(audio, batch_size=batch_size, task=task)
+
+
+class ShardedTranscriber:
+    """
+    Transcribes long audio on many cores at once.
+
+    The audio is cut at pauses into up to `workers` shards of at least
+    min_shard_seconds each. Every shard is transcribed in its own process
+    with `threads` math threads pinned to its own cores, and the results
+    are merged with their timestamps shifted back.
+    load_model(threads) runs once per worker process and returns an object
+    with WhisperX's transcribe(audio, batch_size, task); it must be
+    picklable (e.g. a functools.partial of load_whisperx_model). Workers,
+    and the model each one loaded, stay alive between calls until
+    shutdown().
+    """
+    def __init__(self, load_model, workers=None, threads=None, min_shard_seconds=MIN_SHARD_SECONDS, batch_size=4):
+        cpus = len(available_cores())
+        self.load_model = load_model
+        self.workers = max(1, int(workers or max(1, cpus // 4)))
+        self.threads = max(1, int(threads or max(1, cpus // self.workers)))
+        self.min_shard_seconds = min_shard_seconds
+        self.batch_size = batch_size
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def settings(self):
+        return {"workers": self.workers, "min_shard_seconds": self.min_shard_seconds}
+
+    def split(self, audio):
+        """
+        (start, end) sample ranges of the shards audio would be cut into.
+        """
+        n_shards = shard_count(len(audio), self.workers, min_shard_seconds=self.min_shard_seconds)
+        cuts = find_split_points(audio, n_shards)
+        return list(zip(cuts[:-1], cuts[1:]))
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Spawned, not forked: workers start without the parent's
+                # threads, models or CUDA state
+                context = multiprocessing.get_context("spawn")
+                core_queue = context.Queue()
+                for cores in core_sets(self.workers, self.threads) or []:
+                    core_queue.put(cores)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(core_queue, self.threads, self.load_model)
+                )
+            return self._pool
+
+    def transcribe(self, audio, task="transcribe"):
+        """
+        Same result shape as WhisperX's model.transcribe for 16 kHz audio.
+        """
+        shards = self.split(audio)
+        print(f"Transcribing {len(shards)} shards ({self.workers} workers x {self.threads} threads)...")
+        pool = self._get_pool()
+        futures = [pool.submit(_transcribe_shard, audio[start:end], task, self.batch_size) for start, end in shards]
+        results = [future.result() for future in futures]
+        return merge_shard_results(results, [start / float(SAMPLE_RATE) for start, _ in shards])
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
@@ -0,0 +1,147 @@
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SynthesisJob:
+    """
+    One line of dialogue to synthesize. `index` is the position of the job
+    in the timeline and is what results are ordered by.
+    """
+    def __init__(self, index, text, voice, output_path):
+        self.index = index
+        self.text = text
+        self.voice = voice
+        self.output_path = output_path
+
+
+class SynthesisResult:
+    """
+    The clip is either a file at `path` or, for streaming backends without
+    a cache, encoded audio held in memory in `data` (format: `extension`).
+    Clips in the TTS cache are pinned under `cache_key` until
+    SynthesisPool.release() is called for the result.
+    `words` holds the backend's word timings for the clip, if it has them.
+    """
+    def __init__(self, job, path=None, error=None, attempts=0, elapsed=0.0, cached=False,
+                 data=None, extension=None, cache_key=None, words=None):
+        self.job = job
+        self.path = path
+        self.words = words
+        self.cache_key = cache_key
+        self.data = data
+        self.extension = extension or os.path.splitext(path or "")[1].lstrip(".") or None
+        self.error = error
+        self.attempts = attempts
+        self.elapsed = elapsed
+        self.cached = cached
+
+    @property
+    def ok(self):
+        return self.path is not None or self.data is not None
+
+    def open(self):
+        """
+        The clip as something AudioSegment.from_file() can read.
+        """
+        return io.BytesIO(self.data) if self.data is not None else self.path
+
+
+class SynthesisPool:
+    """
+    Runs TTS jobs concurrently on a bounded thread pool.
+    Each job is retried with exponential backoff, and `timeout` is passed to
+    the backend as a per-attempt limit. Results always come back in job order,
+    regardless of which job finished first.
+    If a TTSCache is given, cached clips are returned without calling the backend.
+    Streaming backends are kept off the disk: their bytes go straight into
+    the cache, or stay in memory on the result when there is no cache.
+    Cached clips stay pinned in the cache until release(results), so call
+    it once the clips have been read.
+    """
+    def __init__(self, backend, max_workers=8, retries=2, backoff=0.5, timeout=60, cache=None):
+        self.backend = backend
+        self.cache = cache
+        self.max_workers = max(1, int(max_workers))
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.timeout = timeout
+
+    def _run_job(self, job):
+        start = time.perf_counter()
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(job.text, job.voice, self.backend.settings())
+            cached_path = self.cache.get(cache_key, pin=True)
+            if cached_path:
+                return SynthesisResult(job, path=cached_path, elapsed=time.perf_counter() - start, cached=True,
+                                       cache_key=cache_key, words=self.cache.words(cached_path))
+
+        error = None
+        for attempt in range(1, self.retries + 2):
+            try:
+                words = None
+                if self.backend.streams:
+                    data, words = self.backend.synthesize_timed(job.text, job.voice, timeout=self.timeout)
+                    if cache_key is None:
+                        return SynthesisResult(job, data=data, extension=self.backend.extension, words=words,
+                                               attempts=attempt, elapsed=time.perf_counter() - start)
+                    path = self.cache.put_bytes(cache_key, data, self.backend.extension, pin=True, words=words)
+                else:
+                    path = self.backend.synthesize(job.text, job.voice, job.output_path, timeout=self.timeout)
+                    if cache_key is not None:
+                        path = self.cache.put(cache_key, path, pin=True)
+                return SynthesisResult(job, path=path, attempts=attempt, elapsed=time.perf_counter() - start,
+                                       cache_key=cache_key, words=words)
+            except Exception as e:
+                error = e
+                if attempt <= self.retries:
+                    time.sleep(self.backoff * (2 ** (attempt - 1)))
+        print(f"TTS Error (segment {job.index}, {attempt} attempts): {error}")
+        return SynthesisResult(job, error=error, attempts=attempt, elapsed=time.perf_counter() - start)
+
+    def release(self, results):
+        """
+        Unpins the cached clips of results that are no longer needed.
+        """
+        keys = [result.cache_key for result in results if result.cache_key is not None]
+        if self.cache is not None and keys:
+            self.cache.unpin(keys)
+        for result in results:
+            result.cache_key = None
+
+    def run(self, jobs):
+        """
+        Synthesizes all jobs and returns a list of SynthesisResult in the
+        same order as `jobs`.
+        """
+        return list(self.iter_run(jobs))
+
+    def iter_run(self, jobs):
+        """
+        Like run(), but yields each result as soon as it and every job before
+        it have finished, so the timeline can be consumed front to back.
+        Closing the generator early cancels the jobs not yet started.
+        """
+        jobs = list(jobs)
+        if not jobs:
+            return
+        workers = min(self.max_workers, len(jobs))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts") as executor:
+            # Yielding in submission order keeps mixing deterministic
+            futures = [executor.submit(self._run_job, job) for job in jobs]
+            yielded = 0
+            try:
+                for future in futures:
+                    result = future.result()
+                    yielded += 1
+                    yield result
+            finally:
+                # Closed early: drop queued jobs and unpin what the running
+                # ones produce, since nobody will read it
+                for future in futures[yielded:]:
+                    future.cancel()
+                for future in futures[yielded:]:
+                    if not future.cancelled() and future.exception() is None:
+                        self.release([future.result()])
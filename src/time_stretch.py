@@ -0,0 +1,148 @@
+import numpy as np
+
+# Clips whose search correlations are computed in one FFT batch; bounds memory
+CORRELATION_BATCH_CLIPS = 256
+
+
+def _next_pow2(n):
+    return 1 << (int(n) - 1).bit_length()
+
+
+def wsola_batch(clips, rates, sample_rate, frame_ms=30.0, tolerance_ms=10.0):
+    """
+    Time-stretches many mono float32 clips at once with WSOLA
+    (waveform-similarity overlap-add). rate > 1 shortens a clip (speeds it
+    up), rate < 1 lengthens it; pitch is preserved.
+
+    WSOLA is sequential within a clip (frame k is aligned to the natural
+    continuation of the frame actually chosen for k - 1), so the loop runs
+    over frame index and every step is vectorized across all clips:
+      1. Output frame k has a nominal input position k * hop * rate.
+      2. The best position within +/- tolerance of it is found with one
+         batched FFT cross-correlation for all clips.
+      3. Chosen frames are Hann-windowed and overlap-added at a fixed hop.
+
+    Returns a list of float32 arrays, one per clip.
+    """
+    frame = int(round(frame_ms * sample_rate / 1000.0))
+    frame += frame % 2
+    hop = frame // 2
+    tolerance = int(round(tolerance_ms * sample_rate / 1000.0))
+    window = (0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(frame) / frame)).astype(np.float32)
+
+    # Lay all clips out in one padded buffer so frames can be gathered in one go
+    clips = [np.asarray(clip, dtype=np.float32) for clip in clips]
+    rates = np.asarray(rates, dtype=np.float64)
+    lengths = np.asarray([len(clip) for clip in clips], dtype=np.int64)
+    out_lengths = np.maximum(1, np.round(lengths / rates)).astype(np.int64)
+    n_frames = np.ceil(np.maximum(0, out_lengths - frame) / hop).astype(np.int64) + 1
+    pad = tolerance + frame + hop
+    pieces = []
+    for clip in clips:
+        pieces.append(np.zeros(pad, dtype=np.float32))
+        pieces.append(clip)
+    pieces.append(np.zeros(pad + frame, dtype=np.float32))
+    signal = np.concatenate(pieces)
+    clip_starts = np.cumsum(pad + np.concatenate(([0], lengths[:-1])))
+    # Furthest start that keeps a frame inside its clip
+    last_start = clip_starts + np.maximum(0, lengths - frame)
+
+    # (clip, frame index) matrices; frames past a clip's end are masked out
+    k = np.arange(n_frames.max())
+    valid = k[None, :] < n_frames[:, None]
+    nominal = clip_starts[:, None] + np.round(k[None, :] * hop * rates[:, None]).astype(np.int64)
+    nominal = np.minimum(nominal, last_start[:, None])
+    positions = nominal.copy()
+
+    ramp = np.arange(frame)
+    region_ramp = np.arange(frame + 2 * tolerance)
+    n_fft = _next_pow2(frame + 2 * tolerance + frame)
+    for step in range(1, len(k)):
+        active = np.flatnonzero(valid[:, step])
+        for start in range(0, len(active), CORRELATION_BATCH_CLIPS):
+            rows = active[start:start + CORRELATION_BATCH_CLIPS]
+            ref = signal[(positions[rows, step - 1] + hop)[:, None] + ramp]
+            region = signal[(nominal[rows, step] - tolerance)[:, None] + region_ramp]
+            spectrum = np.fft.rfft(region, n_fft) * np.conj(np.fft.rfft(ref, n_fft))
+            corr = np.fft.irfft(spectrum, n_fft)[:, :2 * tolerance + 1]
+            best = nominal[rows, step] - tolerance + np.argmax(corr, axis=1)
+            # Never step outside the clip (padding would read silence)
+            positions[rows, step] = np.clip(best, clip_starts[rows], last_start[rows])
+
+    # Overlap-add: with a 50% hop each output row of `hop` samples receives
+    # the first half of frame k and the second half of frame k - 1
+    clip_index, frame_index = np.nonzero(valid)
+    frames = signal[positions[clip_index, frame_index][:, None] + ramp] * window
+    out_rows = np.concatenate(([0], np.cumsum(n_frames + 1)[:-1]))
+    rows = out_rows[clip_index] + frame_index
+    total_rows = int(np.sum(n_frames + 1))
+    out = np.zeros((total_rows, hop), dtype=np.float32)
+    norm = np.zeros((total_rows, hop), dtype=np.float32)
+    out[rows] += frames[:, :hop]
+    out[rows + 1] += frames[:, hop:]
+    norm[rows] += window[:hop]
+    norm[rows + 1] += window[hop:]
+    # Edges only see one window; normalizing there avoids a fade-in/out
+    out /= np.maximum(norm, 1e-3)
+
+    flat = out.reshape(-1)
+    return [flat[row * hop:row * hop + n].copy() for row, n in zip(out_rows, out_lengths)]
+
+
+class TimeFitter:
+    """
+    Fits TTS clips to the source segment timing.
+
+    Each clip is stretched/compressed towards its segment's window
+    (seg end - seg start), and compressed further if it would still run into
+    the next segment. The playback rate is clamped to
+    [min_speed, max_speedup]; min_speed=1.0 means clips are never slowed
+    down. Rates within `tolerance` of 1.0 are left untouched.
+    """
+    def __init__(self, sample_rate, max_speedup=1.35, min_speed=1.0, gap_ms=50, tolerance=0.02,
+                 frame_ms=30.0, search_ms=10.0):
+        self.sample_rate = sample_rate
+        self.max_speedup = max_speedup
+        self.min_speed = min_speed
+        self.gap_ms = gap_ms
+        self.tolerance = tolerance
+        self.frame_ms = frame_ms
+        self.search_ms = search_ms
+
+    def plan(self, starts, ends, clip_lengths, next_starts=None):
+        """
+        Vectorized rate planning. starts/ends/next_starts are in seconds
+        (next_starts defaults to the following entry's start), clip_lengths
+        in samples. Returns (rates, unresolved) where unresolved flags clips
+        that still overlap the next segment at max_speedup.
+        """
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        clip_seconds = np.asarray(clip_lengths, dtype=np.float64) / self.sample_rate
+        if next_starts is None:
+            next_starts = np.append(starts[1:], np.inf)
+        next_starts = np.asarray(next_starts, dtype=np.float64)
+
+        slot = np.maximum(ends - starts, 1e-3)
+        available = np.maximum(next_starts - starts - self.gap_ms / 1000.0, 1e-3)
+        rates = np.maximum(clip_seconds / slot, clip_seconds / available)
+        rates = np.clip(rates, self.min_speed, self.max_speedup)
+        rates[np.abs(rates - 1.0) <= self.tolerance] = 1.0
+        unresolved = clip_seconds / rates > available + 1e-6
+        return rates, unresolved
+
+    def fit(self, clips, starts, ends, next_starts=None):
+        """
+        Returns (fitted clips, rates, unresolved overlap flags).
+        """
+        rates, unresolved = self.plan(starts, ends, [len(c) for c in clips], next_starts)
+        fitted = list(clips)
+        todo = [i for i, rate in enumerate(rates) if rate != 1.0 and len(clips[i]) > 0]
+        if todo:
+            stretched = wsola_batch(
+                [clips[i] for i in todo], [rates[i] for i in todo], self.sample_rate,
+                frame_ms=self.frame_ms, tolerance_ms=self.search_ms
+            )
+            for i, clip in zip(todo, stretched):
+                fitted[i] = clip
+        return fitted, rates, unresolved
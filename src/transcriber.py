@@ -1,75 +1,213 @@
-import whisperx
-import torch
 import gc
+import hashlib
+from functools import partial
 from src.utils import clear_gpu_memory
+from src.model_registry import get_model_registry
+from src.audio_ingest import AudioBuffer
+from src.sharded_transcription import ShardedTranscriber, load_whisperx_model
+from src.segment_table import SegmentTable
+from src.transcript_cache import TranscriptCache, audio_hash, diarization_to_records, records_to_diarization
+
+ASR_MODEL = "large-v2"
+
+# Rough resident sizes used for the registry's memory budget
+MODEL_SIZES = {
+    "asr_int8": 1600 * 1024 ** 2,
+    "asr": 3 * 1024 ** 3,
+    "align": 1200 * 1024 ** 2,
+    "diarize": 300 * 1024 ** 2
+}
 
 class Transcriber:
-    def __init__(self, device="cuda", compute_type="int8", hf_token=None):
+    """
+    shard_workers: on CPU, transcribe long audio as that many pause-split
+    shards in parallel worker processes (see ShardedTranscriber). Ignored
+    on GPU, where every worker would need its own copy of the model in VRAM.
+    cache_dir: persist ASR, alignment and diarization results separately
+    (see TranscriptCache), so a re-run only recomputes what changed.
+    """
+    def __init__(self, device="cuda", compute_type="int8", hf_token=None, registry=None, shard_workers=None,
+                 cache_dir=None):
         self.device = device
         self.compute_type = compute_type
         self.hf_token = hf_token
         self.model = None
-        
+        # Models stay loaded across requests; shared by every Transcriber by default
+        self.registry = registry or get_model_registry()
+        self.shard_workers = shard_workers
+        self._sharded = None
+        self.cache = TranscriptCache(cache_dir) if cache_dir else None
+
+    def _load_asr(self):
+        """
+        Returns the resident WhisperX model, loading it on first use.
+        """
+        def load():
+            import whisperx
+            return whisperx.load_model(ASR_MODEL, self.device, compute_type=self.compute_type)
+
+        key = ("asr", ASR_MODEL, self.device, self.compute_type)
+        try:
+            size = MODEL_SIZES["asr_int8"] if self.compute_type == "int8" else MODEL_SIZES["asr"]
+            return self.registry.get(key, load, size)
+        except Exception as e:
+            print(f"Failed to load WhisperX model: {e}")
+            # Fallback to CPU if CUDA fails
+            if self.device != "cuda":
+                raise
+            print("Falling back to CPU...")
+            self.device = "cpu"
+            self.compute_type = "int8"
+            return self._load_asr()
+
+    def _load_align(self, language_code):
+        def load():
+            import whisperx
+            return whisperx.load_align_model(language_code=language_code, device=self.device)
+
+        return self.registry.get(("align", language_code, self.device), load, MODEL_SIZES["align"])
+
+    @property
+    def token_id(self):
+        """
+        Short hash of hf_token: keeps a diarization model (and its cached
+        turns) private to the token that loaded it, without storing the token.
+        """
+        return hashlib.sha256((self.hf_token or "").encode("utf-8")).hexdigest()[:16]
+
+    def _load_diarize(self):
+        def load():
+            from whisperx.diarize import DiarizationPipeline
+            return DiarizationPipeline(use_auth_token=self.hf_token, device=self.device)
+
+        return self.registry.get(("diarize", self.device, self.token_id), load, MODEL_SIZES["diarize"])
+
+    def warm_up(self, languages=()):
+        """
+        Loads models ahead of the first request (call at server startup).
+        Alignment models are per language, so only the given ones are loaded.
+        """
+        print(f"Warming up WhisperX (Device: {self.device}, Type: {self.compute_type})...")
+        self._load_asr()
+        for language_code in languages:
+            try:
+                self._load_align(language_code)
+            except Exception as e:
+                print(f"Alignment warm-up failed for {language_code}: {e}")
+        if self.hf_token:
+            try:
+                self._load_diarize()
+            except Exception as e:
+                print(f"Diarization warm-up failed: {e}")
+
+    def _sharded_for(self, audio):
+        """
+        The ShardedTranscriber to use for audio, or None for a single pass.
+        """
+        if not self.shard_workers or self.device != "cpu":
+            return None
+        if self._sharded is None:
+            load_model = partial(load_whisperx_model, model_name=ASR_MODEL, device="cpu", compute_type=self.compute_type)
+            self._sharded = ShardedTranscriber(load_model, workers=self.shard_workers)
+        return self._sharded if len(self._sharded.split(audio)) > 1 else None
+
+    def shutdown(self):
+        if self._sharded is not None:
+            self._sharded.shutdown()
+            self._sharded = None
+
+    @staticmethod
+    def load_audio(audio):
+        """
+        16 kHz mono float32 for WhisperX. WAVs are resampled once from their
+        memory map (cached beside the WAV) instead of being decoded again by
+        ffmpeg; other formats fall back to whisperx.load_audio.
+        """
+        if audio.lower().endswith(".wav"):
+            try:
+                return AudioBuffer.from_wav(audio).as_whisper_audio()
+            except ValueError as e:
+                print(f"Falling back to ffmpeg decode: {e}")
+        import whisperx
+        return whisperx.load_audio(audio)
+
     def transcribe_and_diarize(self, audio_path, num_speakers=None, task="transcribe"):
         """
         Transcribes audio and diarizes speakers using WhisperX.
-        Returns a list of segments with speaker labels.
+        Returns the segments, with speaker labels, as a SegmentTable.
+        audio_path: audio file path.
         task: "transcribe" (original lang) or "translate" (to English).
         """
+        # Imported on first use: whisperx pulls in torch and takes seconds to load
+        import whisperx
         print(f"Loading WhisperX model (Device: {self.device}, Type: {self.compute_type})...")
-        
+
         # 1. Transcribe
-        try:
-            self.model = whisperx.load_model(
-                "large-v2", 
-                self.device, 
-                compute_type=self.compute_type
-            )
-        except Exception as e:
-            print(f"Failed to load WhisperX model: {e}")
-            # Fallback to CPU if CUDA fails
-            if self.device == "cuda":
-                print("Falling back to CPU...")
-                self.device = "cpu"
-                self.compute_type = "int8"
-                self.model = whisperx.load_model("large-v2", self.device, compute_type="int8")
-
-        audio = whisperx.load_audio(audio_path)
-        # Reduced batch size for 6GB VRAM safety
-        # Pass task="translate" here to auto-translate to English
-        result = self.model.transcribe(audio, batch_size=4, task=task)
-        
+        audio = self.load_audio(audio_path)
+        sharded = self._sharded_for(audio)
+        cache = self.cache
+        audio_key = audio_hash(audio) if cache else None
+        asr_key = cache.make_key("asr", audio_key, ASR_MODEL, self.compute_type, task,
+                                 sharded.settings() if sharded else None) if cache else None
+        result = cache.get("asr", asr_key) if cache else None
+        if result is not None:
+            print("Reusing cached transcription.")
+        else:
+            if sharded:
+                result = sharded.transcribe(audio, task=task)
+            else:
+                self.model = self._load_asr()
+                # Reduced batch size for 6GB VRAM safety
+                # Pass task="translate" here to auto-translate to English
+                result = self.model.transcribe(audio, batch_size=4, task=task)
+            if cache:
+                cache.put("asr", asr_key, result)
+
         # Align (improves timestamps)
-        try:
-            print("Loading Alignment model...")
-            model_a, metadata = whisperx.load_align_model(language_code=result["language"], device=self.device)
-            result = whisperx.align(result["segments"], model_a, metadata, audio, device=self.device, return_char_alignments=False)
-            del model_a
-            clear_gpu_memory()
-        except Exception as e:
-            print(f"Alignment failed (Security block or network issue): {e}")
-            print("Using original timestamps (Slightly less precise).")
-            # Clear if partially loaded
-            clear_gpu_memory()
+        align_key = cache.make_key("align", asr_key, result["language"]) if cache else None
+        aligned = cache.get("align", align_key) if cache else None
+        if aligned is not None:
+            print("Reusing cached alignment.")
+            result = aligned
+        else:
+            try:
+                print("Loading Alignment model...")
+                model_a, metadata = self._load_align(result["language"])
+                result = whisperx.align(result["segments"], model_a, metadata, audio, device=self.device, return_char_alignments=False)
+                if cache:
+                    cache.put("align", align_key, result)
+            except Exception as e:
+                print(f"Alignment failed (Security block or network issue): {e}")
+                print("Using original timestamps (Slightly less precise).")
+                # Clear if partially loaded
+                clear_gpu_memory()
 
         # 2. Diarize
-        print("Loading Diarization model...")
-        diarize_model = None
-        try:
-            from whisperx.diarize import DiarizationPipeline
-            diarize_model = DiarizationPipeline(use_auth_token=self.hf_token, device=self.device)
-            diar_segments = diarize_model(audio, min_speakers=num_speakers, max_speakers=num_speakers)
-            result = whisperx.assign_word_speakers(diar_segments, result)
-            print("Diarization complete.")
-        except Exception as e:
-            print(f"Diarization failed: {e}")
-            print("Proceeding with transcription only (No Speaker IDs).")
-        
-        # Cleanup
-        del self.model
-        if diarize_model:
-            del diarize_model
+        if not self.hf_token:
+            print("No HF token: skipping diarization.")
+        else:
+            # Speaker turns depend only on the audio, not the task or the transcript
+            # Keyed on the token too: turns are only reused by whoever could compute them
+            diarize_key = cache.make_key("diarize", audio_key, num_speakers, self.token_id) if cache else None
+            turns = cache.get("diarize", diarize_key) if cache else None
+            try:
+                if turns is not None:
+                    print("Reusing cached diarization.")
+                    diar_segments = records_to_diarization(turns)
+                else:
+                    print("Loading Diarization model...")
+                    diarize_model = self._load_diarize()
+                    diar_segments = diarize_model(audio, min_speakers=num_speakers, max_speakers=num_speakers)
+                    if cache:
+                        cache.put("diarize", diarize_key, diarization_to_records(diar_segments))
+                result = whisperx.assign_word_speakers(diar_segments, result)
+                print("Diarization complete.")
+            except Exception as e:
+                print(f"Diarization failed: {e}")
+                print("Proceeding with transcription only (No Speaker IDs).")
+
+        # Models stay resident in the registry; only drop this call's references
         self.model = None
-        clear_gpu_memory()
-        
-        return result["segments"]
+        gc.collect()
+
+        return SegmentTable.from_whisperx(result["segments"])
@@ -0,0 +1,90 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from src.job_store import hash_values, write_json_atomic
+
+STAGES = ("asr", "align", "diarize")
+
+
+def audio_hash(audio):
+    """
+    SHA-256 of the 16 kHz float32 samples WhisperX actually sees, so the
+    same vocals hash the same whether they came from a WAV or an ffmpeg
+    decode.
+    """
+    samples = np.ascontiguousarray(audio, dtype=np.float32)
+    return hashlib.sha256(memoryview(samples).cast("B")).hexdigest()
+
+
+def diarization_to_records(diarization):
+    """
+    Speaker turns of a WhisperX diarization DataFrame as JSON-friendly dicts.
+    """
+    return [
+        {"start": float(start), "end": float(end), "speaker": str(speaker)}
+        for start, end, speaker in zip(diarization["start"], diarization["end"], diarization["speaker"])
+    ]
+
+
+def records_to_diarization(records):
+    """
+    DataFrame in the shape whisperx.assign_word_speakers expects.
+    """
+    import pandas as pd
+    return pd.DataFrame(records, columns=["start", "end", "speaker"])
+
+
+class TranscriptCache:
+    """
+    Persistent cache of the three WhisperX steps, so changing one setting
+    only recomputes the step it affects:
+
+        asr      (audio hash, model, compute type, task, sharding) -> transcribe() result
+        align    (asr key, language)                              -> aligned result
+        diarize  (audio hash, speaker count, HF token hash)       -> speaker turns
+
+    Diarization doesn't depend on the task, so switching between transcribe
+    and translate reuses it; the cached pieces are recombined with
+    whisperx.assign_word_speakers. Entries are JSON files under
+    cache_dir/<stage>/, written atomically.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        for stage in STAGES:
+            os.makedirs(os.path.join(cache_dir, stage), exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = {stage: 0 for stage in STAGES}
+        self.misses = {stage: 0 for stage in STAGES}
+
+    @staticmethod
+    def make_key(stage, *values):
+        return hash_values(stage, *values)
+
+    def _path_for(self, stage, key):
+        return os.path.join(self.cache_dir, stage, f"{key}.json")
+
+    def get(self, stage, key):
+        """
+        Cached value for key, or None.
+        """
+        path = self._path_for(stage, key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses[stage] += 1
+            else:
+                self.hits[stage] += 1
+        return value
+
+    def put(self, stage, key, value):
+        write_json_atomic(self._path_for(stage, key), value)
+
+    def stats(self):
+        with self._lock:
+            return {stage: {"hits": self.hits[stage], "misses": self.misses[stage]} for stage in STAGES}
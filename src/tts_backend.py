@@ -0,0 +1,240 @@
+import io
+import os
+import subprocess
+import threading
+import time
+import wave
+import asyncio
+
+# edge-tts word boundary offsets and durations are in 100 ns ticks
+TICKS_PER_SECOND = 10 ** 7
+
+
+class TTSBackend:
+    """
+    Base class for text-to-speech backends used by the DubbingEngine.
+    A backend turns (text, voice) into an audio file at output_path.
+    Backends with streams = True also implement synthesize_bytes(), which
+    returns the encoded audio in memory without touching the disk.
+    synthesize_timed() also returns when each word is spoken, as WhisperX
+    style {"word", "start", "end"} dicts (seconds), or None if the backend
+    can't tell.
+    """
+    extension = "mp3"
+    streams = False
+
+    def synthesize(self, text, voice, output_path, timeout=None):
+        raise NotImplementedError
+
+    def synthesize_bytes(self, text, voice, timeout=None):
+        raise NotImplementedError
+
+    def synthesize_timed(self, text, voice, timeout=None):
+        """
+        (audio bytes, word timings or None).
+        """
+        return self.synthesize_bytes(text, voice, timeout), None
+
+    def settings(self):
+        """
+        Everything besides text and voice that changes the generated audio.
+        Used as part of the TTS cache key.
+        """
+        return {"backend": type(self).__name__, "extension": self.extension}
+
+
+class EdgeTTSCLIBackend(TTSBackend):
+    """
+    Generates audio by running the edge-tts CLI once per line.
+    rate/pitch/volume use edge-tts syntax, e.g. rate="+10%", pitch="-5Hz".
+    """
+    extension = "mp3"
+
+    def __init__(self, rate="+0%", pitch="+0Hz", volume="+0%"):
+        self.rate = rate
+        self.pitch = pitch
+        self.volume = volume
+
+    def settings(self):
+        settings = super().settings()
+        settings.update(rate=self.rate, pitch=self.pitch, volume=self.volume)
+        return settings
+
+    def synthesize(self, text, voice, output_path, timeout=None):
+        # Cleanup text for CLI (remove quotes etc)
+        safe_text = text.replace('"', '').replace("'", "")
+
+        # edge-tts --text "Hello" --write-media out.mp3 --voice en-US-AriaNeural
+        cmd = [
+            "edge-tts",
+            "--text", safe_text,
+            "--write-media", output_path,
+            "--voice", voice,
+            # "=" form so argparse doesn't read "-10%" as a flag
+            f"--rate={self.rate}",
+            f"--pitch={self.pitch}",
+            f"--volume={self.volume}"
+        ]
+        subprocess.run(cmd, check=True, capture_output=True, timeout=timeout)
+        return output_path
+
+
+def write_atomic(data, output_path):
+    tmp_path = output_path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+class _EventLoopThread:
+    """
+    One asyncio loop on a daemon thread, shared by every in-process
+    backend, so worker threads can run coroutines without starting a loop
+    per line.
+    """
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="tts-loop", daemon=True)
+        self._thread.start()
+
+    def run(self, coro, timeout=None):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop_thread():
+    global _loop_thread
+    with _loop_lock:
+        if _loop_thread is None:
+            _loop_thread = _EventLoopThread()
+        return _loop_thread
+
+
+class EdgeTTSBackend(TTSBackend):
+    """
+    Runs edge-tts in-process: each line is one websocket stream on a shared
+    event loop, and the MP3 bytes are collected in memory. Avoids starting
+    an interpreter per line and writing/reading a temp file.
+    rate/pitch/volume use edge-tts syntax, e.g. rate="+10%", pitch="-5Hz".
+    """
+    extension = "mp3"
+    streams = True
+
+    def __init__(self, rate="+0%", pitch="+0Hz", volume="+0%"):
+        import edge_tts
+        self._edge_tts = edge_tts
+        self.rate = rate
+        self.pitch = pitch
+        self.volume = volume
+
+    def settings(self):
+        settings = super().settings()
+        settings.update(rate=self.rate, pitch=self.pitch, volume=self.volume)
+        return settings
+
+    def _communicate(self, text, voice):
+        try:
+            # edge-tts 7+ reports sentence boundaries unless asked for words
+            return self._edge_tts.Communicate(
+                text, voice, rate=self.rate, pitch=self.pitch, volume=self.volume, boundary="WordBoundary"
+            )
+        except TypeError:
+            return self._edge_tts.Communicate(text, voice, rate=self.rate, pitch=self.pitch, volume=self.volume)
+
+    async def _stream(self, text, voice):
+        audio = bytearray()
+        words = []
+        async for chunk in self._communicate(text, voice).stream():
+            if chunk["type"] == "audio":
+                audio.extend(chunk["data"])
+            elif chunk["type"] == "WordBoundary":
+                start = chunk["offset"] / TICKS_PER_SECOND
+                end = start + chunk["duration"] / TICKS_PER_SECOND
+                words.append({"word": chunk["text"], "start": round(start, 3), "end": round(end, 3)})
+        if not audio:
+            raise RuntimeError("edge-tts returned no audio")
+        return bytes(audio), words or None
+
+    def synthesize_timed(self, text, voice, timeout=None):
+        return get_event_loop_thread().run(self._stream(text, voice), timeout)
+
+    def synthesize_bytes(self, text, voice, timeout=None):
+        return self.synthesize_timed(text, voice, timeout)[0]
+
+    def synthesize(self, text, voice, output_path, timeout=None):
+        return write_atomic(self.synthesize_bytes(text, voice, timeout), output_path)
+
+
+def default_backend():
+    """
+    In-process edge-tts when the package is importable, else the CLI.
+    """
+    try:
+        return EdgeTTSBackend()
+    except ImportError:
+        return EdgeTTSCLIBackend()
+
+
+class FakeTTSBackend(TTSBackend):
+    """
+    Local stand-in for tests and benchmarks. Writes a quiet tone whose length
+    is proportional to the text, after sleeping for `latency` seconds to mimic
+    a network round trip. Each character takes seconds_per_char, which is
+    also what the word timings report. Needs nothing beyond the standard library.
+    """
+    extension = "wav"
+    streams = True
+
+    def __init__(self, latency=0.0, seconds_per_char=0.06, sample_rate=24000):
+        self.latency = latency
+        self.seconds_per_char = seconds_per_char
+        self.sample_rate = sample_rate
+
+    def settings(self):
+        settings = super().settings()
+        settings.update(seconds_per_char=self.seconds_per_char, sample_rate=self.sample_rate)
+        return settings
+
+    def synthesize_bytes(self, text, voice, timeout=None):
+        if self.latency:
+            time.sleep(self.latency)
+
+        n_frames = max(1, int(len(text) * self.seconds_per_char * self.sample_rate))
+        # Voice name picks the pitch so speakers are distinguishable when listening
+        period = 40 + (sum(voice.encode("utf-8")) % 40)
+        half = period // 2
+        cycle = (b"\x00\x08" * half) + (b"\x00\xf8" * (period - half))
+        data = (cycle * (n_frames // period + 1))[:n_frames * 2]
+
+        out = io.BytesIO()
+        with wave.open(out, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(self.sample_rate)
+            wf.writeframes(data)
+        return out.getvalue()
+
+    def synthesize_timed(self, text, voice, timeout=None):
+        words = []
+        offset = 0
+        for word in text.split():
+            offset = text.index(word, offset)
+            words.append({
+                "word": word,
+                "start": round(offset * self.seconds_per_char, 3),
+                "end": round((offset + len(word)) * self.seconds_per_char, 3)
+            })
+            offset += len(word)
+        return self.synthesize_bytes(text, voice, timeout), words or None
+
+    def synthesize(self, text, voice, output_path, timeout=None):
+        return write_atomic(self.synthesize_bytes(text, voice, timeout), output_path)
@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# Word timings of a clip are kept beside it as <key>.words.json
+WORDS_SUFFIX = ".words.json"
+
+
+def normalize_text(text):
+    """
+    Normalizes text for cache lookups: unicode NFKC, collapsed whitespace.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.split())
+
+
+class TTSCache:
+    """
+    Persistent on-disk cache of synthesized clips.
+    Entries are content addressed by a hash of (normalized text, voice, prosody,
+    backend) and evicted least-recently-used once the cache exceeds max_bytes.
+    Writes go to a temp file in the cache dir first and are renamed into place,
+    so a crash never leaves a half-written clip behind.
+    Entries looked up or stored with pin=True are never evicted until
+    unpin() is called for them, so clips a job still has to read stay on
+    disk however full the cache gets meanwhile.
+    A clip's word timings, if stored with it, are written before the clip
+    and evicted along with it (see words()).
+    """
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # key -> (path, size), oldest first
+        self._total_bytes = 0
+        self._pins = {} # key -> number of holders
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_index()
+
+    def _load_index(self):
+        # Rebuild LRU order from file mtimes (touched on every hit)
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith(".part"):
+                    # Leftover from an interrupted write
+                    os.remove(path)
+                    continue
+                if name.endswith(WORDS_SUFFIX):
+                    continue
+                stat = os.stat(path)
+                key = os.path.splitext(name)[0]
+                found.append((stat.st_mtime, key, path, stat.st_size))
+        for _, key, path, size in sorted(found):
+            self._entries[key] = (path, size)
+            self._total_bytes += size
+        # max_bytes may have shrunk since the last run
+        self._evict()
+
+    @staticmethod
+    def make_key(text, voice, settings=None):
+        payload = json.dumps({
+            "text": normalize_text(text),
+            "voice": voice,
+            "settings": settings or {}
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path_for(self, key, extension):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{extension}")
+
+    @staticmethod
+    def _words_path(clip_path):
+        return os.path.splitext(clip_path)[0] + WORDS_SUFFIX
+
+    def _write_words(self, final_path, words):
+        words_path = self._words_path(final_path)
+        if words is None:
+            if os.path.exists(words_path):
+                os.remove(words_path)
+            return
+        tmp_path = f"{words_path}.{threading.get_ident()}.{time.monotonic_ns()}.part"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(words, f, ensure_ascii=False)
+            os.replace(tmp_path, words_path)
+        finally:
+            self._discard(tmp_path)
+
+    def words(self, clip_path):
+        """
+        Word timings stored with a cached clip, or None.
+        """
+        try:
+            with open(self._words_path(clip_path), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key, pin=False):
+        """
+        Returns the cached clip path for key, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not os.path.exists(entry[0]):
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            path = entry[0]
+            if pin:
+                self._pin(key)
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return path
+
+    def put(self, key, source_path, pin=False, words=None):
+        """
+        Moves a freshly synthesized clip into the cache and returns its new path.
+        """
+        extension = os.path.splitext(source_path)[1].lstrip(".") or "bin"
+        final_path = self._path_for(key, extension)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        self._write_words(final_path, words)
+
+        tmp_path = f"{final_path}.{threading.get_ident()}.{time.monotonic_ns()}.part"
+        try:
+            shutil.move(source_path, tmp_path)
+            os.replace(tmp_path, final_path)
+        finally:
+            self._discard(tmp_path)
+        return self._add(key, final_path, pin)
+
+    def put_bytes(self, key, data, extension, pin=False, words=None):
+        """
+        Stores in-memory audio (from a streaming backend) and returns its path.
+        """
+        final_path = self._path_for(key, extension)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        self._write_words(final_path, words)
+
+        tmp_path = f"{final_path}.{threading.get_ident()}.{time.monotonic_ns()}.part"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, final_path)
+        finally:
+            self._discard(tmp_path)
+        return self._add(key, final_path, pin)
+
+    @staticmethod
+    def _discard(tmp_path):
+        # No-op after a successful rename; drops the partial file after a failed write
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    def _add(self, key, final_path, pin=False):
+        size = os.path.getsize(final_path)
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries[key][1]
+            self._entries[key] = (final_path, size)
+            self._entries.move_to_end(key)
+            self._total_bytes += size
+            if pin:
+                self._pin(key)
+            self._evict()
+        return final_path
+
+    def _pin(self, key):
+        self._pins[key] = self._pins.get(key, 0) + 1
+
+    def unpin(self, keys):
+        """
+        Releases one pin on each key, then evicts down to max_bytes again.
+        """
+        with self._lock:
+            for key in keys:
+                count = self._pins.get(key, 0) - 1
+                if count > 0:
+                    self._pins[key] = count
+                else:
+                    self._pins.pop(key, None)
+            self._evict()
+
+    def _drop(self, key):
+        path, size = self._entries.pop(key)
+        self._total_bytes -= size
+        return path
+
+    def _evict(self):
+        # Called with the lock held. Never evicts the entry that was just added,
+        # nor pinned ones (the cache may stay over max_bytes until they are unpinned).
+        candidates = [key for key in list(self._entries)[:-1] if key not in self._pins]
+        for oldest in candidates:
+            if self._total_bytes <= self.max_bytes:
+                break
+            path = self._drop(oldest)
+            self.evictions += 1
+            for stale in (path, self._words_path(path)):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes
+            }
@@ -1,13 +1,16 @@
-import torch
 import gc
 import os
+import sys
 
 def clear_gpu_memory():
     """
     Clears GPU memory by collecting garbage and emptying the CUDA cache.
     This is critical for running multiple large models on a 6GB VRAM GPU.
+    A no-op until something has imported torch: nothing can be cached on the
+    GPU before that, and importing it just to check costs seconds.
     """
-    if torch.cuda.is_available():
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
         gc.collect()
         torch.cuda.empty_cache()
         torch.cuda.ipc_collect()
@@ -1,30 +1,104 @@
-import gradio as gr
-import os
-from src.audio_processor import AudioProcessor
-from src.transcriber import Transcriber
+import threading
+from queue import Queue
+from src.job_store import JobStore
+from src.job_queue import QueueFull, get_job_queue
+from src.pipeline import DubbingPipeline
 from src.dubbing_engine import DubbingEngine
-from src.utils import clear_gpu_memory
 
-def process_video(video_file, hf_token, translate_to_english=False):
+# Seconds between queue position updates while waiting
+QUEUE_POLL_SECONDS = 2.0
+# Length of each progressively published stretch of the dub
+PROGRESSIVE_WINDOW_SECONDS = 60
+
+# Models and the TTS cache are shared by every session; job dirs are not
+SHARED_STORE_DIR = "jobs"
+_shared_store = None
+_store_lock = threading.Lock()
+_shared_dubbing = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_store():
+    """
+    Created on first use, so importing this module never creates ./jobs.
+    """
+    global _shared_store
+    with _store_lock:
+        if _shared_store is None:
+            _shared_store = JobStore(SHARED_STORE_DIR)
+        return _shared_store
+
+
+def get_shared_dubbing():
+    global _shared_dubbing
+    with _shared_lock:
+        if _shared_dubbing is None:
+            _shared_dubbing = DubbingEngine(cache_dir=get_shared_store().path("tts_cache"))
+        return _shared_dubbing
+
+
+def format_eta(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
+
+
+def process_video(video_file, hf_token, translate_to_english=False, session_id="default"):
+    """
+    Queues the job behind any running ones (reporting position and ETA while
+    waiting), then runs the pipeline in the session's own workspace.
+    """
     if video_file is None:
         return None, None, None, None
-    
+
+    queue = get_job_queue()
+    try:
+        ticket = queue.enter(session_id)
+    except QueueFull as e:
+        yield f"{e}\n", None, None, None
+        return
+
+    completed = False
+    try:
+        while not ticket.wait(QUEUE_POLL_SECONDS):
+            yield (f"Queued: position {queue.position(ticket)}, "
+                   f"estimated start in {format_eta(queue.eta_seconds(ticket))}\n"), None, None, None
+        yield from run_pipeline(video_file, hf_token, translate_to_english, queue.workspace(session_id))
+        completed = True
+    finally:
+        # Also runs when the client disconnects and Gradio closes the generator
+        queue.leave(ticket, completed=completed)
+
+
+def run_pipeline(video_file, hf_token, translate_to_english, workspace):
     print(f"Processing video: {video_file} (Type: {type(video_file)})")
     task_mode = "translate" if translate_to_english else "transcribe"
     status_log = f"Starting Process... (Mode: {task_mode})\n"
     yield status_log, None, None, None
     
-    output_dir = "output_temp"
-    processor = AudioProcessor(output_dir=output_dir)
     # Pass the user-provided token to Transcriber
-    transcriber = Transcriber(device="cuda", compute_type="int8", hf_token=hf_token) 
-    dubbing = DubbingEngine() # Add API key here if needed
+    pipeline = DubbingPipeline(
+        job_store=JobStore(workspace),
+        hf_token=hf_token,
+        device="cuda",
+        compute_type="int8",
+        dubbing=get_shared_dubbing(),
+        model_dir=get_shared_store().path("models"),
+        transcript_cache_dir=get_shared_store().path("transcript_cache"),
+        window_seconds=PROGRESSIVE_WINDOW_SECONDS
+    )
+    # Each input gets its own job dir in the session workspace; finished stages are reused on retry
+    job = pipeline.open_job(video_file)
+    status_log += f"Job: {job.job_id}\n"
+
+    def reused(cached):
+        return " (reused checkpoint)" if cached else ""
     
     # 1. Extract Audio
     status_log += "Step 1: Extracting Audio...\n"
     yield status_log, None, None, None
     try:
-        audio_path = processor.extract_audio(video_file)
+        extract_key, audio_path, cached = pipeline.extract(job)
+        status_log += f"Audio ready{reused(cached)}.\n"
     except Exception as e:
         status_log += f"Error: {str(e)}\n"
         yield status_log, None, None, None
@@ -34,7 +108,8 @@ def process_video(video_file, hf_token, translate_to_english=False):
     status_log += "Step 2: Separating Vocals (Kim Vocal 2)....\n"
     yield status_log, None, None, None
     try:
-        vocals_path, inst_path = processor.separate_audio(audio_path)
+        separate_key, (vocals_path, inst_path), cached = pipeline.separate(job, extract_key, audio_path)
+        status_log += f"Separation done{reused(cached)}.\n"
     except Exception as e:
         status_log += f"Error Separation: {str(e)}\n"
         yield status_log, None, None, None
@@ -48,8 +123,8 @@ def process_video(video_file, hf_token, translate_to_english=False):
         if not hf_token:
             status_log += "Warning: No HF Token provided. Skipping Diarization (Speaker ID).\n"
         
-        segments = transcriber.transcribe_and_diarize(vocals_path, task=task_mode)
-        status_log += f"Transcription Complete. Found {len(segments)} segments.\n"
+        transcribe_key, segments, cached = pipeline.transcribe(job, separate_key, vocals_path, task=task_mode)
+        status_log += f"Transcription Complete{reused(cached)}. Found {len(segments)} segments.\n"
         
         # Preview first few segments
         for i, seg in enumerate(segments[:3]):
@@ -66,19 +141,54 @@ def process_video(video_file, hf_token, translate_to_english=False):
     status_log += "Step 4: Generating Dub and Mixing (Edge-TTS)...\n"
     yield status_log, vocals_path, inst_path, None
     
+    # The dub runs in a worker so finished windows can be shown while later
+    # ones are still being synthesized
+    chunks = Queue()
+    outcome = {}
+    cancel = threading.Event()
+
+    def run_dub():
+        try:
+            outcome["result"] = pipeline.dub(job, transcribe_key, segments, inst_path,
+                                             on_chunk=chunks.put, cancel=cancel)
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            chunks.put(None)
+
+    worker = threading.Thread(target=run_dub, name="dub", daemon=True)
+    worker.start()
     try:
-        final_output_path = os.path.join(output_dir, "final_dubbed_audio.mp3")
-        dubbing.stitch_and_mix(segments, inst_path, final_output_path)
-        status_log += f"Process Complete! File saved: {final_output_path}\n"
-    except Exception as e:
-        status_log += f"Error Mixing: {str(e)}\n"
+        while True:
+            info = chunks.get()
+            if info is None:
+                break
+            status_log += f"Dubbed {info['end']:.0f}s / {info['total']:.0f}s (playlist: {info['playlist']})\n"
+            # Only the new window is sent; the whole mix follows once it's done
+            yield status_log, vocals_path, inst_path, info["chunk"]
+    finally:
+        # On disconnect Gradio closes this generator: stop the dub before the
+        # queue slot is released
+        cancel.set()
+        worker.join()
+
+    if "error" in outcome:
+        status_log += f"Error Mixing: {str(outcome['error'])}\n"
         yield status_log, vocals_path, inst_path, None
         return
+    _, final_output_path, cached = outcome["result"]
+    status_log += f"Process Complete{reused(cached)}! File saved: {final_output_path}\n"
 
     status_log += "Pipeline Complete! Audio Dubbed & Mixed.\n"
+    for stage in job.metrics.to_dict()["stages"]:
+        status_log += f"  {stage['stage']}: {stage['wall_seconds']:.1f}s\n"
+    status_log += f"Metrics: {job.path('metrics.json')}\n"
     yield status_log, vocals_path, inst_path, final_output_path
 
 def create_ui():
+    # Gradio is only needed once the UI is built, not by importers of process_video
+    import gradio as gr
+
     with gr.Blocks(title="AI Movie Dub Maker") as app:
         gr.Markdown("# AI Movie Dub Maker")
         
@@ -101,15 +211,19 @@ def create_ui():
                 inst_output = gr.Audio(label="Extracted Background", type="filepath")
                 final_output = gr.Audio(label="Final AI Dubbed Audio", type="filepath")
         
-        def router(video, file, token, translate):
+        def router(video, file, token, translate, request: gr.Request):
             # Prefer file input if provided, otherwise video input
             target_input = file if file else video
-            yield from process_video(target_input, token, translate)
+            session_id = getattr(request, "session_hash", None) or "default"
+            yield from process_video(target_input, token, translate, session_id=session_id)
 
         process_btn.click(
             fn=router,
             inputs=[video_input, file_input, token_input, translate_chk],
-            outputs=[status_output, vocals_output, inst_output, final_output]
+            outputs=[status_output, vocals_output, inst_output, final_output],
+            # Admission and heavy-job limits are enforced by the JobQueue, so
+            # waiting users can still stream their queue position
+            concurrency_limit=None
         )
         
     return app
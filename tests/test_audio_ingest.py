@@ -0,0 +1,111 @@
+import os
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+import pytest
+
+from src.audio_ingest import WHISPER_SAMPLE_RATE, AudioBuffer, Resampler, ingest_media
+
+SR = 44100
+
+
+def make_tone(seconds=3, hz=440.0):
+    t = np.arange(SR * seconds) / SR
+    return np.stack([np.sin(2 * np.pi * hz * t)] * 2, axis=1).astype(np.float32) * 0.5
+
+
+def resample_whole(tone):
+    resampler = Resampler(SR, WHISPER_SAMPLE_RATE)
+    return np.concatenate([resampler.process(tone), resampler.flush()])
+
+
+def test_streaming_resampler_matches_one_shot():
+    tone = make_tone()
+    one_shot = resample_whole(tone)
+    streamed = Resampler(SR, WHISPER_SAMPLE_RATE)
+    parts = [streamed.process(tone[i:i + 12345]) for i in range(0, len(tone), 12345)]
+    parts.append(streamed.flush())
+    streamed_out = np.concatenate(parts)
+    assert len(one_shot) == len(streamed_out) == len(tone) * WHISPER_SAMPLE_RATE // SR
+    assert np.allclose(one_shot, streamed_out, atol=1e-5)
+
+
+def test_resampler_keeps_pitch():
+    one_shot = resample_whole(make_tone())
+    expected = 0.5 * np.sin(2 * np.pi * 440.0 * np.arange(len(one_shot)) / WHISPER_SAMPLE_RATE)
+    assert np.abs(one_shot[100:-100, 0] - expected[100:-100]).max() < 1e-2
+
+
+def test_whisper_audio_is_mono_float32_and_cached():
+    buffer = AudioBuffer((make_tone() * 32767).astype(np.int16), SR)
+    mono = buffer.as_whisper_audio()
+    assert mono.dtype == np.float32 and mono.ndim == 1
+    assert buffer.resample(WHISPER_SAMPLE_RATE, 1) is buffer.resample(WHISPER_SAMPLE_RATE, 1)
+
+
+def write_wav(path, tone):
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(tone.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(SR)
+        wav.writeframes((tone * 32767).astype("<i2").tobytes())
+    return str(path)
+
+
+def test_resample_streams_into_sidecar_and_reuses_it(tmp_path):
+    tone = make_tone()
+    path = write_wav(tmp_path / "input.wav", tone)
+    mono = AudioBuffer.from_wav(path).resample(WHISPER_SAMPLE_RATE, 1, block_seconds=0.5)
+    sidecar = tmp_path / "input.16000x1.f32"
+    assert isinstance(mono.samples, np.memmap) and sidecar.exists()
+    assert not (tmp_path / "input.16000x1.f32.part").exists()
+    expected = resample_whole(tone.mean(axis=1, keepdims=True))
+    assert np.allclose(mono.samples, expected, atol=1e-3)
+
+    # A fresh buffer maps the sidecar instead of resampling again
+    written = os.path.getmtime(sidecar)
+    again = AudioBuffer.from_wav(path).resample(WHISPER_SAMPLE_RATE, 1)
+    assert os.path.getmtime(sidecar) == written
+    assert np.array_equal(again.samples, mono.samples)
+
+
+def test_resample_sidecar_invalidated_by_newer_source(tmp_path):
+    path = write_wav(tmp_path / "input.wav", make_tone())
+    AudioBuffer.from_wav(path).resample(WHISPER_SAMPLE_RATE, 1)
+    sidecar = str(tmp_path / "input.16000x1.f32")
+
+    write_wav(path, make_tone(hz=880.0))
+    stale = os.path.getmtime(path) - 10
+    os.utime(sidecar, (stale, stale))
+    fresh = AudioBuffer.from_wav(path).resample(WHISPER_SAMPLE_RATE, 1)
+    assert os.path.getmtime(sidecar) > stale
+    assert np.allclose(fresh.samples, resample_whole(make_tone(hz=880.0)[:, :1]), atol=1e-3)
+
+    # A truncated sidecar is not trusted either
+    with open(sidecar, "r+b") as f:
+        f.truncate(100)
+    assert AudioBuffer.from_wav(path).resample(WHISPER_SAMPLE_RATE, 1).n_frames == fresh.n_frames
+    assert os.path.getsize(sidecar) == fresh.n_frames * 4
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_ingest_media_decodes_to_wav(tmp_path):
+    source = write_wav(tmp_path / "source.wav", make_tone(seconds=2))
+    wav_path = str(tmp_path / "input_audio.wav")
+    try:
+        buffer = ingest_media(source, wav_path, sample_rate=SR, channels=2, block_seconds=0.25)
+    except subprocess.CalledProcessError:
+        pytest.skip("ffmpeg cannot decode here")
+    assert buffer.path == wav_path and not os.path.exists(f"{wav_path}.part")
+    assert buffer.sample_rate == SR and buffer.channels == 2 and buffer.n_frames == SR * 2
+    assert np.allclose(buffer.read(0, SR), make_tone(seconds=2)[:SR], atol=1e-3)
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_ingest_media_failure_leaves_no_output(tmp_path):
+    wav_path = str(tmp_path / "input_audio.wav")
+    with pytest.raises(subprocess.CalledProcessError):
+        ingest_media(str(tmp_path / "missing.mp4"), wav_path)
+    assert not os.path.exists(wav_path) and not os.path.exists(f"{wav_path}.part")
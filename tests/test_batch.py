@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+import time
+import wave
+
+import pytest
+
+import src.batch as batch
+from src.batch import JobStatus
+from src.job_store import JobStore
+
+
+class StubPipeline:
+    """
+    Stands in for DubbingPipeline: real job dirs and a real extracted WAV,
+    stub heavy stages. Inputs whose name contains "bad" fail to transcribe.
+    """
+    events = []
+
+    def __init__(self, job_store=None, **kwargs):
+        self.store = job_store
+        self._lock = threading.Lock()
+
+    def _log(self, *event):
+        with self._lock:
+            StubPipeline.events.append(event)
+
+    def open_job(self, input_path):
+        return self.store.open_job(input_path, {})
+
+    def extract(self, job):
+        path = job.path("input_audio.wav")
+        with wave.open(path, "wb") as wav:
+            wav.setnchannels(2)
+            wav.setsampwidth(2)
+            wav.setframerate(8000)
+            wav.writeframes(b"\0\0\0\0" * 4000)
+        return "extract", path, False
+
+    def separate(self, job, extract_key, audio_path):
+        self._log("separate", job.input_path)
+        time.sleep(0.02)
+        return "separate", (audio_path, audio_path), False
+
+    def transcribe(self, job, separate_key, vocals_path, task="transcribe", num_speakers=None):
+        self._log("transcribe", job.input_path)
+        if "bad" in os.path.basename(job.input_path):
+            raise RuntimeError("no speech found")
+        return "transcribe", ["line"] * 3, True
+
+    def dub(self, job, transcribe_key, segments, inst_path):
+        return "dub", job.path("final_output.mp4"), False
+
+
+@pytest.fixture
+def stub_pipeline(monkeypatch):
+    StubPipeline.events = []
+    monkeypatch.setattr(batch, "DubbingPipeline", StubPipeline)
+    return StubPipeline
+
+
+def make_inputs(tmp_path, names):
+    folder = tmp_path / "videos"
+    folder.mkdir()
+    for name in names:
+        (folder / name).write_bytes(name.encode())
+    (folder / "notes.txt").write_text("not media")
+    return str(folder)
+
+
+def test_batch_report_and_status_files(tmp_path, stub_pipeline, monkeypatch):
+    transitions = []
+    save = JobStatus.save
+
+    def record(status):
+        transitions.append((os.path.basename(status.data["input"]), status.data["state"], status.data["stage"]))
+        save(status)
+
+    monkeypatch.setattr(JobStatus, "save", record)
+    folder = make_inputs(tmp_path, ["a.mp4", "b.mp4"])
+    jobs_root = str(tmp_path / "jobs")
+    assert batch.main([folder, "--jobs-root", jobs_root, "--parallel", "2"]) == 0
+
+    with open(os.path.join(jobs_root, "batch_report.json")) as f:
+        report = json.load(f)
+    assert (report["jobs"], report["succeeded"], report["failed"]) == (2, 2, 0)
+    assert report["media_seconds"] == 1.0
+    assert set(report["stage_seconds"]) == {"extract", "separate", "transcribe", "dub"}
+    assert [os.path.basename(r["input"]) for r in report["results"]] == ["a.mp4", "b.mp4"]
+
+    for result in report["results"]:
+        with open(os.path.join(jobs_root, result["job_id"], "status.json")) as f:
+            status = json.load(f)
+        assert status["state"] == "done" and status["stage"] is None and status["segments"] == 3
+        assert status["output"].endswith("final_output.mp4")
+        assert status["stages"]["transcribe"]["cached"] is True
+        assert status["stages"]["separate"]["cached"] is False
+
+    steps = [(state, stage) for name, state, stage in transitions if name == "a.mp4"]
+    assert [step for i, step in enumerate(steps) if i == 0 or step != steps[i - 1]] == [
+        ("running", "hash"), ("running", "extract"), ("running", "separate"),
+        ("running", "transcribe"), ("running", "dub"), ("done", None)
+    ]
+
+
+def test_failed_job_makes_a_nonzero_exit(tmp_path, stub_pipeline):
+    folder = make_inputs(tmp_path, ["bad.mp4", "good.mp4"])
+    report_path = str(tmp_path / "report.json")
+    assert batch.main([folder, "--jobs-root", str(tmp_path / "jobs"), "--report", report_path]) == 2
+
+    with open(report_path) as f:
+        report = json.load(f)
+    assert (report["succeeded"], report["failed"]) == (1, 1)
+    failed = report["results"][0]
+    assert failed["state"] == "failed" and failed["error"] == "no speech found"
+    assert failed["stage"] == "transcribe" and "dub" not in failed["stages"]
+    with open(os.path.join(str(tmp_path / "jobs"), failed["job_id"], "status.json")) as f:
+        assert json.load(f)["state"] == "failed"
+
+
+def test_no_inputs_exits_with_an_error(tmp_path, stub_pipeline):
+    assert batch.main([str(tmp_path / "missing"), "--jobs-root", str(tmp_path / "jobs")]) == 1
+
+
+def test_heavy_stages_of_a_job_run_back_to_back(tmp_path, stub_pipeline):
+    folder = make_inputs(tmp_path, [f"{i}.mp4" for i in range(4)])
+    pipeline = StubPipeline(job_store=JobStore(str(tmp_path / "jobs")))
+    batch.BatchScheduler(pipeline, max_parallel=4).run(batch.find_inputs([folder]))
+    events = StubPipeline.events
+    assert len(events) == 8
+    for separate, transcribe in zip(events[::2], events[1::2]):
+        assert separate[0] == "separate" and transcribe == ("transcribe", separate[1])
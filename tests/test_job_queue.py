@@ -0,0 +1,38 @@
+import os
+import time
+
+import pytest
+
+from src.job_queue import JobQueue, QueueFull
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path), max_concurrent=1, max_waiting=2, ttl_seconds=60, default_job_seconds=100)
+
+
+def test_admission_order_and_eta(queue):
+    a, b, c = queue.enter("a"), queue.enter("b"), queue.enter("c")
+    assert a.admitted and not b.admitted and queue.position(c) == 2
+    assert 190 < queue.eta_seconds(c) <= 200
+    queue.leave(a)
+    assert b.admitted and queue.position(c) == 1
+    queue.leave(c)
+    assert queue.stats()["waiting"] == 0
+
+
+def test_full_queue_and_duplicate_sessions_are_rejected(queue):
+    for session in ("a", "b", "c"):
+        queue.enter(session)
+    for session in ("a", "d"):
+        with pytest.raises(QueueFull):
+            queue.enter(session)
+
+
+def test_expired_workspaces_are_cleaned_up(queue, tmp_path):
+    ticket = queue.enter("a")
+    queue.workspace("a")
+    queue.leave(ticket)
+    assert queue.cleanup_expired() == []
+    assert queue.cleanup_expired(now=time.time() + 120) == [os.path.join(str(tmp_path), "a")]
+    assert not os.path.exists(os.path.join(str(tmp_path), "a"))
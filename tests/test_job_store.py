@@ -0,0 +1,108 @@
+import json
+import os
+
+import pytest
+
+import src.job_store as job_store
+from src.job_store import JobStore
+from src.pipeline import DubbingPipeline
+
+STAGES = ["extract", "separate", "transcribe", "dub"]
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    store = JobStore(str(tmp_path / "jobs"))
+    # The stages under test are stubs; nothing touches the dubbing engine
+    return DubbingPipeline(job_store=store, dubbing=object(), device="cpu")
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "input.mp4"
+    path.write_bytes(b"not really a video")
+    return str(path)
+
+
+def run_stages(pipeline, job, ran, settings=None):
+    """
+    Chains stub stages like DubbingPipeline does: each one is keyed on the
+    previous stage's key plus its own setting. Returns {stage: artifacts}.
+    """
+    settings = settings or {}
+    key = job.input_hash
+    outputs = {}
+    for name in STAGES:
+        def run(stage_dir, name=name):
+            ran.append(name)
+            path = os.path.join(stage_dir, f"{name}.txt")
+            with open(path, "w") as f:
+                f.write(name)
+            return {"out": path}
+
+        key, outputs[name], _ = pipeline._run_stage(job, name, [key, settings.get(name)], run)
+    return outputs
+
+
+def test_second_run_reuses_every_stage(pipeline, video):
+    ran = []
+    first = run_stages(pipeline, pipeline.open_job(video), ran)
+    assert ran == STAGES
+
+    ran.clear()
+    job = pipeline.open_job(video)
+    assert run_stages(pipeline, job, ran) == first
+    assert ran == []
+    assert [stage["counts"]["cached"] for stage in job.metrics.to_dict()["stages"]] == [1] * len(STAGES)
+    assert os.path.exists(os.path.join(job.dir, "metrics.json"))
+
+
+def test_deleted_artifact_reruns_that_stage_and_downstream(pipeline, video):
+    ran = []
+    outputs = run_stages(pipeline, pipeline.open_job(video), ran)
+    os.remove(outputs["separate"]["out"])
+
+    ran.clear()
+    run_stages(pipeline, pipeline.open_job(video), ran)
+    assert ran == ["separate", "transcribe", "dub"]
+
+
+def test_changed_setting_reruns_that_stage_and_downstream(pipeline, video):
+    ran = []
+    run_stages(pipeline, pipeline.open_job(video), ran)
+
+    ran.clear()
+    run_stages(pipeline, pipeline.open_job(video), ran, {"transcribe": "translate"})
+    assert ran == ["transcribe", "dub"]
+
+    # Both variants are kept, so switching back reuses the first
+    ran.clear()
+    run_stages(pipeline, pipeline.open_job(video), ran)
+    assert ran == []
+
+
+def test_same_input_and_settings_share_a_job(tmp_path, video):
+    store = JobStore(str(tmp_path / "jobs"))
+    job = store.open_job(video, {"sample_rate": 44100})
+    assert store.open_job(video, {"sample_rate": 44100}).dir == job.dir
+    assert store.open_job(video, {"sample_rate": 16000}).dir != job.dir
+
+
+def test_manifest_write_is_atomic(pipeline, video, monkeypatch):
+    job = pipeline.open_job(video)
+    run_stages(pipeline, job, [])
+    with open(job.manifest_path, "rb") as f:
+        before = f.read()
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(job_store.os, "replace", fail)
+    with pytest.raises(OSError):
+        job.record_stage("dub", "feedface", {"out": "x"}, 1.0)
+    monkeypatch.undo()
+
+    with open(job.manifest_path, "rb") as f:
+        assert f.read() == before
+    assert "feedface" not in json.loads(before)["stages"]["dub"]
+    assert [name for name in os.listdir(job.dir) if name.endswith(".tmp")] == []
@@ -0,0 +1,103 @@
+import json
+import threading
+import tracemalloc
+
+import pytest
+
+from src.metrics import Metrics
+
+
+def test_overlapping_tracemalloc_stages_on_two_threads():
+    first_running, second_running = threading.Event(), threading.Event()
+    errors = []
+
+    def first():
+        try:
+            with Metrics(profile=("tracemalloc",)).stage("first"):
+                first_running.set()
+                second_running.wait(5)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    first_running.wait(5)
+    with Metrics(profile=("tracemalloc",)).stage("second") as record:
+        second_running.set()
+        # The stage that started tracing ends first; tracing must outlive it
+        thread.join()
+        data = [bytearray(1024) for _ in range(100)]
+    assert errors == [] and data
+    assert record.profile["tracemalloc_peak_bytes"] > 0
+    assert not tracemalloc.is_tracing()
+
+
+def test_tracing_started_elsewhere_is_left_running():
+    tracemalloc.start()
+    try:
+        with Metrics(profile=("tracemalloc",)).stage("stage"):
+            pass
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture
+def metrics():
+    metrics = Metrics(profile=())
+    with metrics.stage("dub.tts") as stage:
+        stage.count("requests", 3)
+        stage.count("cached", 1)
+    latency = metrics.histogram("tts_latency_seconds", buckets=(0.5, 0.1, 1.0))
+    for value in (0.05, 0.3, 0.3, 2.0):
+        latency.observe(value)
+    return metrics
+
+
+def test_json_export(metrics, tmp_path):
+    data = json.loads(metrics.to_json())
+    stage = data["stages"][0]
+    assert stage["stage"] == "dub.tts" and stage["error"] is None
+    assert stage["counts"] == {"requests": 3, "cached": 1}
+    assert stage["wall_seconds"] >= 0 and stage["cpu_seconds"] >= 0
+    assert data["histograms"]["tts_latency_seconds"] == {
+        "buckets": {"0.1": 1, "0.5": 3, "1.0": 3}, "count": 4, "sum": 2.65, "mean": 0.6625
+    }
+
+    json_path, prom_path = metrics.write(str(tmp_path))
+    with open(json_path) as f:
+        assert json.load(f) == data
+    with open(prom_path) as f:
+        assert f.read() == metrics.to_prometheus()
+
+
+def test_prometheus_export(metrics):
+    lines = metrics.to_prometheus(prefix="job").splitlines()
+    assert "# TYPE job_stage_wall_seconds gauge" in lines
+    assert any(line.startswith('job_stage_wall_seconds{stage="dub.tts"} ') for line in lines)
+    assert any(line.startswith('job_stage_cpu_seconds{stage="dub.tts"} ') for line in lines)
+    assert 'job_stage_items{stage="dub.tts",kind="requests"} 3' in lines
+    assert 'job_stage_items{stage="dub.tts",kind="cached"} 1' in lines
+
+    start = lines.index("# TYPE job_tts_latency_seconds histogram")
+    assert lines[start + 1:] == [
+        'job_tts_latency_seconds_bucket{le="0.1"} 1',
+        'job_tts_latency_seconds_bucket{le="0.5"} 3',
+        'job_tts_latency_seconds_bucket{le="1.0"} 3',
+        'job_tts_latency_seconds_bucket{le="+Inf"} 4',
+        "job_tts_latency_seconds_sum 2.65",
+        "job_tts_latency_seconds_count 4"
+    ]
+
+
+def test_prometheus_escapes_labels_and_names():
+    metrics = Metrics(profile=())
+    with metrics.stage('say "hi"\\now\nplease') as stage:
+        stage.count('kind "x"')
+    metrics.histogram("tts latency-seconds").observe(0.2)
+    text = metrics.to_prometheus()
+    assert 'dub_stage_wall_seconds{stage="say \\"hi\\"\\\\now\\nplease"} ' in text
+    assert 'kind="kind \\"x\\""} 1' in text
+    assert "dub_tts_latency_seconds_count 1" in text
+    # Every sample stays on its own line
+    assert all(line.startswith(("#", "dub_")) for line in text.splitlines())
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from src.mixer import DuckingEnvelope, TimelineMixer, db_to_gain, merge_intervals
+
+
+def make_envelope():
+    return DuckingEnvelope([(1000, 2000), (1500, 2500)], 5000, sample_rate=1000,
+                           duck_db=-10.0, attack_ms=100, release_ms=200, hold_ms=0)
+
+
+def test_overlapping_intervals_merge():
+    assert make_envelope().intervals.tolist() == [[1000, 2500]]
+
+
+def test_envelope_values_at_interval_boundaries():
+    gains = make_envelope().to_array()
+    duck = db_to_gain(-10.0)
+    assert gains[899] == 1.0 and gains[900] == 1.0   # attack starts at start - attack
+    assert duck < gains[950] < 1.0                   # mid-ramp
+    assert np.isclose(gains[1000], duck)             # fully ducked at start
+    assert np.isclose(gains[2499], duck)             # ... through the last speech frame
+    assert gains[2500] > duck and gains[2698] < 1.0  # release ramp
+    assert np.isclose(gains[2699], 1.0) and gains[2700] == 1.0
+
+
+def test_envelope_slices_match_whole_array():
+    env = make_envelope()
+    assert np.array_equal(env.to_array()[1234:3000], env[1234:3000])
+    with pytest.raises(TypeError):
+        env[::2]
+
+
+def test_hold_merges_close_intervals():
+    env = DuckingEnvelope([(0, 100), (150, 200)], 1000, sample_rate=1000, hold_ms=100)
+    assert env.intervals.tolist() == [[0, 200]]
+    assert merge_intervals([(0, 100), (150, 200)], gap=10).tolist() == [[0, 100], [150, 200]]
+    assert merge_intervals([]).shape == (0, 2)
+
+
+def test_mixer_adds_clips_in_place_and_clips_to_timeline():
+    mixer = TimelineMixer(100, sample_rate=1000)
+    assert mixer.add(np.full(30, 0.25, dtype=np.float32), 10) == (10, 40)
+    assert mixer.add(np.full(30, 0.25, dtype=np.float32), 20) == (20, 50)
+    assert mixer.add(np.ones(30, dtype=np.float32), 90) == (90, 100)
+    assert mixer.add(np.ones(10, dtype=np.float32), -20) == (0, 0)
+    assert np.allclose(mixer.speech[20:40], 0.5) and mixer.speech[9] == 0.0
+
+
+def test_render_range_matches_full_render():
+    rng = np.random.default_rng(0)
+    background = (rng.standard_normal((5000, 2)) * 3000).astype(np.int16)
+    mixer = TimelineMixer(5000, sample_rate=1000)
+    mixer.add(rng.uniform(-0.5, 0.5, 800).astype(np.float32), 1200)
+    env = make_envelope()
+    full = mixer.render(background, background_envelope=env)
+    part = mixer.render(background, background_envelope=env, start=1100, end=2600)
+    assert full.shape == background.shape and full.dtype == np.int16
+    assert np.array_equal(full[1100:2600], part)
@@ -0,0 +1,49 @@
+import pytest
+
+from src.model_registry import ModelRegistry
+
+
+@pytest.fixture
+def calls():
+    return {"loaded": [], "unloaded": []}
+
+
+def stub(name, calls):
+    def load():
+        calls["loaded"].append(name)
+        return f"<{name}>"
+    return load
+
+
+def make_registry(calls, budget=300):
+    registry = ModelRegistry(memory_budget_bytes=budget)
+    registry.register("asr", stub("asr", calls), size_bytes=200, unloader=calls["unloaded"].append)
+    registry.register("align", stub("align", calls), size_bytes=100)
+    registry.register("diarize", stub("diarize", calls), size_bytes=100)
+    return registry
+
+
+def test_models_load_lazily_and_once(calls):
+    registry = make_registry(calls)
+    assert calls["loaded"] == []
+    registry.warm_up(["asr"])
+    assert registry.get("asr") == "<asr>" and calls["loaded"] == ["asr"]
+    assert registry.stats()["loads"] == 1 and registry.stats()["hits"] == 1
+
+
+def test_least_recently_used_model_is_evicted(calls):
+    registry = make_registry(calls)
+    registry.get("asr")
+    registry.get("align")
+    registry.get("asr")                      # asr becomes most recently used
+    registry.get("diarize")                  # over budget: evicts align, not asr
+    assert registry.loaded() == ["asr", "diarize"] and calls["unloaded"] == []
+    registry.get("align")                    # evicts asr
+    assert calls["unloaded"] == ["<asr>"] and registry.used_bytes() == 200
+
+
+def test_unregistered_key_needs_a_loader(calls):
+    registry = make_registry(calls)
+    with pytest.raises(KeyError):
+        registry.get("missing")
+    assert registry.get("adhoc", loader=lambda: "m", size_bytes=0) == "m"
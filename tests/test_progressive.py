@@ -0,0 +1,38 @@
+import wave
+
+import numpy as np
+
+from src.progressive import ProgressiveOutput
+
+
+def read_wav(path):
+    with wave.open(path, "rb") as wf:
+        return np.frombuffer(wf.readframes(wf.getnframes()), dtype="<i2").reshape(-1, 2)
+
+
+def make_output(tmp_path):
+    # WAV chunks avoid needing ffmpeg
+    return ProgressiveOutput(str(tmp_path), 8000, 2, chunk_format="wav")
+
+
+def test_windows_land_in_growing_wav_back_to_back(tmp_path):
+    output = make_output(tmp_path)
+    windows = [np.full((8000 * 2, 2), i, dtype=np.int16) for i in range(3)]
+    for window in windows[:2]:
+        output.append(window)
+        assert len(read_wav(output.growing_path)) == len(output.chunks) * 16000
+    output.append(windows[2][:4000])
+    output.close()
+    expected = np.concatenate([windows[0], windows[1], windows[2][:4000]])
+    assert np.array_equal(read_wav(output.growing_path), expected)
+
+
+def test_playlist_lists_every_chunk_and_ends(tmp_path):
+    output = make_output(tmp_path)
+    output.append(np.zeros((16000, 2), dtype=np.int16))
+    output.append(np.zeros((4000, 2), dtype=np.int16))
+    output.close()
+    with open(output.playlist_path) as f:
+        playlist = f.read()
+    assert playlist.count("#EXTINF") == 2 and "#EXTINF:0.500," in playlist
+    assert playlist.endswith("#EXT-X-ENDLIST\n")
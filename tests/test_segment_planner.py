@@ -0,0 +1,74 @@
+import numpy as np
+
+from src.segment_planner import SegmentPlanner
+
+
+def seg(start, end, text, speaker):
+    return {'start': start, 'end': end, 'text': text, 'speaker': speaker}
+
+
+DIALOGUE = [
+    seg(0.0, 0.8, "Hi.", "SPEAKER_00"),
+    seg(1.0, 2.0, "How are you?", "SPEAKER_00"),
+    seg(2.2, 3.0, "Good.", "SPEAKER_01"),
+    seg(3.1, 3.4, "  ", "SPEAKER_01"),
+    seg(3.5, 4.5, "And you?", "SPEAKER_01"),
+    seg(6.0, 7.0, "Fine.", "SPEAKER_01"),
+]
+MANY = [seg(i * 1.0, i * 1.0 + 0.9, "word " * 10, "SPEAKER_00") for i in range(100)]
+
+
+def test_same_speaker_lines_merge_across_short_gaps():
+    units = SegmentPlanner(max_gap=0.6).plan(DIALOGUE)
+    assert [u['text'] for u in units] == ["Hi. How are you?", "Good. And you?", "Fine."]
+    assert units[1]['start'] == 2.2 and units[1]['end'] == 4.5 and len(units[1]['parts']) == 2
+
+
+def test_merge_can_be_disabled():
+    assert len(SegmentPlanner(merge=False).plan(DIALOGUE)) == 5
+
+
+def test_caps_keep_units_bounded():
+    capped = SegmentPlanner(max_chars=120, max_duration=60).plan(MANY)
+    assert all(len(u['text']) <= 120 for u in capped) and len(capped) == 50
+    assert len(SegmentPlanner(max_chars=10 ** 6, max_duration=10.0).plan(MANY)) == 10
+
+
+def test_unsplit_planner_places_units_whole():
+    unit = SegmentPlanner(max_gap=0.6).plan(DIALOGUE)[0]
+    assert len(SegmentPlanner(split=False).pieces(unit)) == 1
+
+
+def test_split_lands_in_silence_between_sentences():
+    planner = SegmentPlanner(max_gap=0.6)
+    unit = planner.plan(DIALOGUE)[0]
+    sr = 16000
+    tone = np.sin(2 * np.pi * 200 * np.arange(sr) / sr).astype(np.float32)
+    clip = np.concatenate([tone[:sr // 4], np.zeros(sr // 5, np.float32), tone])
+    first, second = planner.split_clip(clip, unit, sr)
+    assert sr // 4 <= len(first) <= sr // 4 + sr // 5
+    assert len(first) + len(second) == len(clip)
+
+
+def test_split_follows_word_timings():
+    planner = SegmentPlanner(max_gap=0.6)
+    unit = planner.plan(DIALOGUE)[0]             # "Hi." + "How are you?"
+    sr = 1000
+    clip = np.ones(2000, dtype=np.float32)       # no pause for the energy search to find
+    words = [{"word": "Hi", "start": 0.1, "end": 0.3},
+             {"word": "How", "start": 1.1, "end": 1.3},
+             {"word": "are", "start": 1.4, "end": 1.5},
+             {"word": "you", "start": 1.6, "end": 1.8}]
+    first, second = planner.split_clip(clip, unit, sr, words=words)
+    assert len(first) == 700 and len(second) == 1300
+
+
+def test_split_falls_back_when_words_do_not_match_text():
+    planner = SegmentPlanner(max_gap=0.6)
+    unit = planner.plan(DIALOGUE)[0]
+    sr = 16000
+    tone = np.sin(2 * np.pi * 200 * np.arange(sr) / sr).astype(np.float32)
+    clip = np.concatenate([tone[:sr // 4], np.zeros(sr // 5, np.float32), tone])
+    words = [{"word": "Bonjour", "start": 0.0, "end": 0.5}]
+    first, second = planner.split_clip(clip, unit, sr, words=words)
+    assert sr // 4 <= len(first) <= sr // 4 + sr // 5
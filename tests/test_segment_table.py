@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from src.segment_table import SegmentTable
+
+SEGMENTS = [
+    {"start": 3.0, "end": 9.0, "text": " Über längere Sätze.", "speaker": "SPEAKER_01",
+     "words": [{"word": "Über", "start": 3.0, "end": 3.4, "score": 0.9, "speaker": "SPEAKER_01"},
+               {"word": "2024", "score": 0.5}]},
+    {"start": 0.5, "end": 2.0, "text": " Hello there.", "speaker": "SPEAKER_00"},
+    {"start": 4.0, "end": 5.0, "text": " Overlap."},
+    {"start": 10.0, "end": 12.0, "text": " Last.", "speaker": "SPEAKER_00"}
+]
+EXPECTED = sorted(SEGMENTS, key=lambda seg: seg["start"])
+
+
+@pytest.fixture
+def table():
+    return SegmentTable.from_whisperx(SEGMENTS)
+
+
+def test_round_trips_whisperx_shape(table):
+    assert table.to_whisperx() == EXPECTED
+    assert table.speakers == ["SPEAKER_00", "SPEAKER_01"] and len(table) == 4 and table.n_words == 2
+    assert SegmentTable.from_whisperx([]).to_whisperx() == []
+
+
+def test_indexing_slicing_and_take(table):
+    assert table[-1]["text"] == " Last."
+    assert [seg["start"] for seg in table[1:3]] == [3.0, 4.0]
+    assert table.take([3, 1]).to_whisperx() == [EXPECTED[1], EXPECTED[3]]
+    with pytest.raises(IndexError):
+        table[4]
+
+
+def test_overlapping_lookups(table):
+    assert table.overlapping(4.5).tolist() == [1, 2]
+    assert table.overlapping(9.0).tolist() == []
+    assert table.overlapping(1.0, 3.5).tolist() == [0, 1]
+    assert table.overlapping(12.0, 20.0).tolist() == []
+
+
+def test_save_and_memory_mapped_load(table, tmp_path):
+    out_dir = str(tmp_path / "segments")
+    table.save(out_dir)
+    table.save(out_dir)                      # replaces the previous copy
+    loaded = SegmentTable.load(out_dir)
+    assert isinstance(loaded.start, np.memmap) and loaded.to_whisperx() == EXPECTED
+    assert not isinstance(SegmentTable.load(out_dir, mmap=False).start, np.memmap)
@@ -0,0 +1,75 @@
+import numpy as np
+
+from src.chunked_separation import StemModel, WavReader, WavStreamWriter
+from src.separation_service import SeparationService
+
+
+class GainModel(StemModel):
+    stems = ("Vocals", "Instrumental")
+
+    def __init__(self, filename, gain):
+        self.filename = filename
+        self.gain = gain
+
+    def separate(self, chunk, sample_rate):
+        return {"Vocals": chunk * self.gain, "Instrumental": chunk * (1 - self.gain)}
+
+
+class StubFactory:
+    """
+    model_factory that records every load.
+    """
+    def __init__(self):
+        self.loads = []
+
+    def __call__(self, model_filename):
+        self.loads.append(model_filename)
+        return GainModel(model_filename, gain=0.25 * len(self.loads))
+
+
+def make_input(tmp_path):
+    signal = (np.sin(np.arange(8000) / 5.0)[:, None] * np.array([[0.5, 0.3]])).astype(np.float32)
+    writer = WavStreamWriter(str(tmp_path / "in.wav"), 8000, 2)
+    writer.write(signal)
+    writer.close()
+    return str(tmp_path / "in.wav"), signal
+
+
+def test_models_stay_loaded_across_jobs(tmp_path):
+    audio_path, signal = make_input(tmp_path)
+    factory = StubFactory()
+    service = SeparationService(str(tmp_path / "models"), max_models=2, model_factory=factory)
+    requests = [("a.onnx", "Vocals"), ("b.onnx", "Instrumental")]
+
+    first = service.separate(audio_path, str(tmp_path), requests)
+    second = service.separate(audio_path, str(tmp_path), requests)
+    assert factory.loads == ["a.onnx", "b.onnx"]
+    assert "load:a.onnx" in first.timings and "load:a.onnx" not in second.timings
+    vocals = WavReader(second.path("a.onnx", "Vocals")).read(0, 8000)
+    assert np.abs(vocals - signal * 0.25).max() < 1e-3
+
+
+def test_least_recently_used_model_is_evicted(tmp_path):
+    factory = StubFactory()
+    service = SeparationService(str(tmp_path / "models"), max_models=2, model_factory=factory)
+    a = service.get_model("a.onnx")
+    service.get_model("b.onnx")
+    assert service.get_model("a.onnx") is a
+
+    service.get_model("c.onnx")
+    assert service.loaded_models() == ["a.onnx", "c.onnx"]
+    service.get_model("b.onnx")
+    assert service.loaded_models() == ["c.onnx", "b.onnx"]
+    assert factory.loads == ["a.onnx", "b.onnx", "c.onnx", "b.onnx"]
+
+
+def test_unload_all_makes_the_next_job_reload(tmp_path):
+    audio_path, _ = make_input(tmp_path)
+    factory = StubFactory()
+    service = SeparationService(str(tmp_path / "models"), model_factory=factory)
+    service.separate(audio_path, str(tmp_path), [("a.onnx", "Vocals")])
+    # What DubbingPipeline.transcribe does on CUDA
+    service.unload_all()
+    assert service.loaded_models() == []
+    service.separate(audio_path, str(tmp_path), [("a.onnx", "Vocals")])
+    assert factory.loads == ["a.onnx", "a.onnx"]
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from src.sharded_transcription import (
+    SAMPLE_RATE, FakeWhisperModel, ShardedTranscriber, load_fake_model, merge_shard_results, shift_segments
+)
+
+
+@pytest.fixture(scope="module")
+def dialogue():
+    # Ten minutes of noise bursts separated by pauses
+    rng = np.random.default_rng(0)
+    pieces, t = [], 0
+    while t < 600 * SAMPLE_RATE:
+        speech = int(rng.uniform(2, 8) * SAMPLE_RATE)
+        silence = int(rng.uniform(0.4, 1.5) * SAMPLE_RATE)
+        pieces.append(rng.uniform(-0.3, 0.3, speech).astype(np.float32))
+        pieces.append(np.zeros(silence, dtype=np.float32))
+        t += speech + silence
+    return np.concatenate(pieces)
+
+
+def test_cuts_land_in_pauses(dialogue):
+    shards = ShardedTranscriber(load_fake_model, workers=4, threads=1, min_shard_seconds=60).split(dialogue)
+    assert len(shards) == 4 and shards[0][0] == 0 and shards[-1][1] == len(dialogue)
+    for _, end in shards[:-1]:
+        assert np.all(dialogue[end - 160:end + 160] == 0), "cut inside speech"
+
+
+def test_short_audio_is_one_shard(dialogue):
+    sharded = ShardedTranscriber(load_fake_model, workers=4, threads=1, min_shard_seconds=600)
+    assert sharded.split(dialogue[:SAMPLE_RATE * 30]) == [(0, SAMPLE_RATE * 30)]
+
+
+def test_sharded_output_matches_one_pass(dialogue):
+    sharded = ShardedTranscriber(load_fake_model, workers=4, threads=1, min_shard_seconds=60)
+    try:
+        merged = sharded.transcribe(dialogue, task="translate")
+    finally:
+        sharded.shutdown()
+    whole = FakeWhisperModel().transcribe(dialogue, task="translate")
+    assert merged["language"] == "en"
+    assert [(s["start"], s["end"]) for s in merged["segments"]] == [(s["start"], s["end"]) for s in whole["segments"]]
+    assert merged["segments"][-1]["words"][0]["end"] == whole["segments"][-1]["end"]
+
+
+def test_merge_shifts_words_and_votes_language():
+    shifted = shift_segments([{"start": 1.0, "end": 2.0, "words": [{"word": "a", "start": 1.5}]}], 10.0)
+    assert shifted[0]["end"] == 12.0 and shifted[0]["words"][0]["start"] == 11.5
+    results = [{"language": "de"}, {"language": "en"}, {"language": "en"}]
+    assert merge_shard_results(results, [0, 1, 2])["language"] == "en"
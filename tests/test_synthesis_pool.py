@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+
+import src.synthesis_pool as synthesis_pool
+from src.synthesis_pool import SynthesisJob, SynthesisPool
+from src.tts_backend import FakeTTSBackend
+from src.tts_cache import TTSCache
+
+
+def make_pool(tmp_path, latency=0.0):
+    cache = TTSCache(str(tmp_path / "cache"))
+    return SynthesisPool(FakeTTSBackend(latency=latency), max_workers=4, cache=cache), cache
+
+
+def make_jobs(tmp_path, n):
+    return [SynthesisJob(i, f"line {i}", "en-US-AriaNeural", str(tmp_path / f"{i}.wav")) for i in range(n)]
+
+
+def test_results_come_back_in_job_order_and_stay_pinned(tmp_path):
+    pool, cache = make_pool(tmp_path)
+    results = pool.run(make_jobs(tmp_path, 6))
+    assert [result.job.index for result in results] == list(range(6))
+    assert all(result.ok and os.path.exists(result.path) for result in results)
+    assert sum(cache._pins.values()) == 6
+    pool.release(results)
+    assert sum(cache._pins.values()) == 0
+
+
+def test_closing_iter_run_early_unpins_unread_results(tmp_path):
+    pool, cache = make_pool(tmp_path, latency=0.02)
+    results = pool.iter_run(make_jobs(tmp_path, 40))
+    first = next(results)
+    results.close()
+    pool.release([first])
+    assert sum(cache._pins.values()) == 0
+    assert cache.stats()["entries"] < 40
+
+
+def test_word_timings_survive_the_cache(tmp_path):
+    pool, cache = make_pool(tmp_path)
+    job = make_jobs(tmp_path, 1)[0]
+    fresh = pool.run([job])[0]
+    cached = pool.run([job])[0]
+    assert cached.cached and fresh.words == cached.words
+    assert [word["word"] for word in cached.words] == ["line", "0"]
+    assert cached.words[1]["start"] == 5 * FakeTTSBackend().seconds_per_char
+    pool.release([fresh, cached])
+
+
+class FlakyBackend(FakeTTSBackend):
+    """
+    Fails the first `failures[index]` attempts of each job; a job with a
+    `delays[index]` longer than the timeout times out on every attempt,
+    like a stalled stream would.
+    """
+    def __init__(self, failures=None, delays=None):
+        super().__init__()
+        self.failures = dict(failures or {})
+        self.delays = dict(delays or {})
+        self.calls = {}
+        self.timeouts = []
+        self._lock = threading.Lock()
+
+    def synthesize_timed(self, text, voice, timeout=None):
+        index = int(text.split()[-1])
+        with self._lock:
+            self.calls[index] = self.calls.get(index, 0) + 1
+            self.timeouts.append(timeout)
+            failing = self.calls[index] <= self.failures.get(index, 0)
+        delay = self.delays.get(index, 0)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"no audio after {timeout}s")
+        if delay:
+            time.sleep(delay)
+        if failing:
+            raise ConnectionError(f"attempt {self.calls[index]} failed")
+        return super().synthesize_timed(text, voice, timeout)
+
+
+def test_retries_back_off_exponentially_then_succeed(tmp_path, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(synthesis_pool.time, "sleep", sleeps.append)
+    backend = FlakyBackend(failures={0: 2})
+    pool = SynthesisPool(backend, max_workers=1, retries=2, backoff=0.5)
+    result = pool.run(make_jobs(tmp_path, 1))[0]
+    assert result.ok and result.error is None
+    assert result.attempts == 3 and backend.calls == {0: 3}
+    assert sleeps == [0.5, 1.0]
+
+
+def test_gives_up_with_the_last_error(tmp_path):
+    backend = FlakyBackend(failures={0: 5})
+    result = SynthesisPool(backend, retries=2, backoff=0).run(make_jobs(tmp_path, 1))[0]
+    assert not result.ok and result.attempts == 3 and backend.calls == {0: 3}
+    assert isinstance(result.error, ConnectionError) and str(result.error) == "attempt 3 failed"
+
+
+def test_timeouts_are_retried_per_attempt(tmp_path):
+    backend = FlakyBackend(delays={0: 10})
+    start = time.perf_counter()
+    result = SynthesisPool(backend, retries=1, backoff=0, timeout=0.05).run(make_jobs(tmp_path, 1))[0]
+    assert time.perf_counter() - start < 5
+    assert isinstance(result.error, TimeoutError) and result.attempts == 2
+    assert backend.timeouts == [0.05, 0.05]
+
+
+def test_results_stay_in_order_with_failures_and_slow_jobs(tmp_path):
+    backend = FlakyBackend(failures={1: 1, 4: 9}, delays={0: 0.1, 2: 0.05})
+    results = SynthesisPool(backend, max_workers=6, retries=1, backoff=0).run(make_jobs(tmp_path, 6))
+    assert [result.job.index for result in results] == list(range(6))
+    assert [result.ok for result in results] == [True, True, True, True, False, True]
+    assert [result.attempts for result in results] == [1, 2, 1, 1, 2, 1]
+    assert all(result.data for result in results if result.ok)
@@ -0,0 +1,32 @@
+import numpy as np
+
+from src.time_stretch import TimeFitter, wsola_batch
+
+SR = 24000
+
+
+def make_tone(seconds=2, hz=220.0):
+    t = np.arange(SR * seconds) / SR
+    return (0.5 * np.sin(2 * np.pi * hz * t)).astype(np.float32)
+
+
+def test_wsola_lengths_follow_rate():
+    tone = make_tone()
+    short, long_ = wsola_batch([tone, tone], [1.25, 0.8], SR)
+    assert len(short) == int(round(len(tone) / 1.25))
+    assert len(long_) == int(round(len(tone) / 0.8))
+
+
+def test_wsola_keeps_pitch_and_level():
+    short = wsola_batch([make_tone()], [1.25], SR)[0]
+    body = short[2000:-2000]
+    peak_hz = np.argmax(np.abs(np.fft.rfft(body))) * SR / len(body)
+    assert abs(peak_hz - 220.0) < 5.0
+    assert np.abs(short).max() < 0.6
+
+
+def test_fitter_speeds_up_only_clips_that_overrun():
+    fitter = TimeFitter(SR, max_speedup=1.3)
+    rates, unresolved = fitter.plan([0.0, 1.0, 5.0], [0.9, 3.0, 6.0], [SR * 1.0, SR * 1.5, SR * 3.0])
+    assert rates[0] > 1.0 and rates[1] == 1.0 and rates[2] == 1.3
+    assert unresolved.tolist() == [False, False, False]
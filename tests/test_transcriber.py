@@ -0,0 +1,76 @@
+import sys
+import types
+import wave
+
+import numpy as np
+import pytest
+
+from src.model_registry import ModelRegistry
+from src.transcriber import Transcriber
+
+
+class StubDiarization:
+    loads = []
+
+    def __init__(self, use_auth_token=None, device=None):
+        self.token = use_auth_token
+        StubDiarization.loads.append(use_auth_token)
+
+    def __call__(self, audio, min_speakers=None, max_speakers=None):
+        return {"start": [0.0], "end": [1.0], "speaker": [f"SPEAKER_{self.token}"]}
+
+
+@pytest.fixture
+def whisperx(monkeypatch):
+    # Just enough of WhisperX for transcribe_and_diarize on CPU
+    StubDiarization.loads = []
+    module = types.ModuleType("whisperx")
+    module.__path__ = []
+    model = types.SimpleNamespace(transcribe=lambda audio, batch_size, task: {
+        "segments": [{"start": 0.0, "end": 1.0, "text": "hi"}], "language": "en"})
+    module.load_model = lambda *args, **kwargs: model
+    module.load_align_model = lambda **kwargs: (None, None)
+    module.align = lambda segments, *args, **kwargs: {"segments": segments}
+
+    def assign_word_speakers(turns, result):
+        for seg in result["segments"]:
+            seg["speaker"] = turns["speaker"][0]
+        return result
+    module.assign_word_speakers = assign_word_speakers
+    diarize = types.ModuleType("whisperx.diarize")
+    diarize.DiarizationPipeline = StubDiarization
+    pandas = types.ModuleType("pandas")
+    pandas.DataFrame = lambda records, columns: {c: [r[c] for r in records] for c in columns}
+    monkeypatch.setitem(sys.modules, "whisperx", module)
+    monkeypatch.setitem(sys.modules, "whisperx.diarize", diarize)
+    monkeypatch.setitem(sys.modules, "pandas", pandas)
+    return module
+
+
+def test_diarization_models_are_not_shared_between_tokens(whisperx):
+    registry = ModelRegistry()
+    first = Transcriber(device="cpu", hf_token="hf_alice", registry=registry)._load_diarize()
+    second = Transcriber(device="cpu", hf_token="hf_bob", registry=registry)._load_diarize()
+    again = Transcriber(device="cpu", hf_token="hf_alice", registry=registry)._load_diarize()
+    assert StubDiarization.loads == ["hf_alice", "hf_bob"]
+    assert first is again and first is not second
+    # The token itself never ends up in a registry key
+    assert not any("hf_" in str(key) for key in registry.loaded())
+
+
+def test_cached_diarization_is_keyed_by_token(whisperx, tmp_path):
+    audio = str(tmp_path / "vocals.wav")
+    with wave.open(audio, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(np.random.default_rng(0).integers(-10000, 10000, 16000, dtype=np.int16).tobytes())
+
+    def speakers(token):
+        transcriber = Transcriber(device="cpu", hf_token=token, registry=ModelRegistry(), cache_dir=str(tmp_path))
+        return [seg.get("speaker") for seg in transcriber.transcribe_and_diarize(audio).to_whisperx()]
+
+    assert speakers("a") == ["SPEAKER_a"]
+    assert speakers("b") == ["SPEAKER_b"]
+    assert speakers("a") == ["SPEAKER_a"] and StubDiarization.loads == ["a", "b"]
+    assert speakers("") == [None]
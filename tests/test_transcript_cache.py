@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from src.transcript_cache import TranscriptCache, audio_hash, diarization_to_records
+
+AUDIO = np.linspace(-1, 1, 16000, dtype=np.float32)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return TranscriptCache(str(tmp_path))
+
+
+def test_audio_hash_depends_on_samples_not_dtype():
+    assert audio_hash(AUDIO) == audio_hash(AUDIO.astype(np.float64))
+    assert audio_hash(AUDIO) != audio_hash(AUDIO[::-1])
+
+
+def test_asr_keys_separate_tasks_and_round_trip(cache):
+    digest = audio_hash(AUDIO)
+    transcribe_key = cache.make_key("asr", digest, "large-v2", "int8", "transcribe", None)
+    translate_key = cache.make_key("asr", digest, "large-v2", "int8", "translate", None)
+    assert transcribe_key != translate_key
+    assert cache.get("asr", transcribe_key) is None
+    cache.put("asr", transcribe_key, {"segments": [{"start": np.float32(0.5), "end": 1.0, "text": "hi"}],
+                                      "language": "en"})
+    assert cache.get("asr", transcribe_key)["segments"][0]["start"] == 0.5
+    assert cache.get("asr", translate_key) is None
+
+
+def test_diarization_is_keyed_by_speaker_count(cache):
+    digest = audio_hash(AUDIO)
+    turns = {"start": [0.0, 2.5], "end": [2.0, 4.0], "speaker": ["SPEAKER_00", "SPEAKER_01"]}
+    cache.put("diarize", cache.make_key("diarize", digest, None), diarization_to_records(turns))
+    assert cache.get("diarize", cache.make_key("diarize", digest, None))[1]["speaker"] == "SPEAKER_01"
+    assert cache.get("diarize", cache.make_key("diarize", digest, 2)) is None
+    assert cache.stats()["diarize"] == {"hits": 1, "misses": 1}
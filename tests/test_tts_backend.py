@@ -0,0 +1,126 @@
+import asyncio
+import io
+import sys
+import time
+import types
+import wave
+
+import pytest
+
+from src.tts_backend import TICKS_PER_SECOND, EdgeTTSBackend, FakeTTSBackend
+
+
+class StubCommunicate:
+    """
+    edge_tts.Communicate stand-in: stream() replays `script`, a list of
+    chunks, where an Exception is raised and a number is slept for.
+    """
+    script = []
+    created = []
+
+    def __init__(self, text, voice, rate=None, pitch=None, volume=None, boundary=None):
+        StubCommunicate.created.append({"text": text, "voice": voice, "rate": rate, "boundary": boundary})
+
+    async def stream(self):
+        for item in self.script:
+            if isinstance(item, Exception):
+                raise item
+            if isinstance(item, (int, float)):
+                await asyncio.sleep(item)
+                continue
+            yield item
+
+
+class OldCommunicate(StubCommunicate):
+    # edge-tts before 7.0: no boundary argument, always word boundaries
+    def __init__(self, text, voice, rate=None, pitch=None, volume=None):
+        super().__init__(text, voice, rate, pitch, volume)
+
+
+@pytest.fixture
+def edge_tts(monkeypatch):
+    module = types.ModuleType("edge_tts")
+    module.Communicate = StubCommunicate
+    monkeypatch.setitem(sys.modules, "edge_tts", module)
+    StubCommunicate.created = []
+    monkeypatch.setattr(StubCommunicate, "script", [])
+    return module
+
+
+def word(text, offset, duration):
+    return {"type": "WordBoundary", "text": text, "offset": offset, "duration": duration}
+
+
+def test_audio_chunks_are_joined_and_words_timed_in_seconds(edge_tts):
+    StubCommunicate.script = [
+        {"type": "audio", "data": b"ID3"},
+        word("Hello", 1_000_000, 4_500_000),
+        {"type": "audio", "data": b"abc"},
+        {"type": "SentenceBoundary", "text": "Hello there", "offset": 0, "duration": 9_000_000},
+        word("there", 6 * TICKS_PER_SECOND // 10, 3_000_000),
+        {"type": "audio", "data": b"def"}
+    ]
+    backend = EdgeTTSBackend(rate="+10%")
+    data, words = backend.synthesize_timed("Hello there", "en-US-AriaNeural", timeout=5)
+    assert data == b"ID3abcdef"
+    assert words == [
+        {"word": "Hello", "start": 0.1, "end": 0.55},
+        {"word": "there", "start": 0.6, "end": 0.9}
+    ]
+    assert StubCommunicate.created == [
+        {"text": "Hello there", "voice": "en-US-AriaNeural", "rate": "+10%", "boundary": "WordBoundary"}
+    ]
+    assert backend.synthesize_bytes("Hello there", "en-US-AriaNeural") == b"ID3abcdef"
+
+
+def test_older_edge_tts_without_boundary_option(edge_tts):
+    edge_tts.Communicate = OldCommunicate
+    StubCommunicate.script = [{"type": "audio", "data": b"x"}]
+    assert EdgeTTSBackend().synthesize_timed("Hi", "en-US-AriaNeural") == (b"x", None)
+    assert StubCommunicate.created[0]["boundary"] is None
+
+
+def test_stream_errors_propagate_from_the_loop(edge_tts):
+    backend = EdgeTTSBackend()
+    StubCommunicate.script = [{"type": "audio", "data": b"x"}, ConnectionError("socket closed")]
+    with pytest.raises(ConnectionError, match="socket closed"):
+        backend.synthesize_timed("Hi", "en-US-AriaNeural", timeout=5)
+
+    StubCommunicate.script = [word("Hi", 0, 100)]
+    with pytest.raises(RuntimeError, match="no audio"):
+        backend.synthesize_timed("Hi", "en-US-AriaNeural", timeout=5)
+
+
+def test_stalled_stream_times_out_and_loop_survives(edge_tts):
+    backend = EdgeTTSBackend()
+    StubCommunicate.script = [{"type": "audio", "data": b"x"}, 30]
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        backend.synthesize_timed("Hi", "en-US-AriaNeural", timeout=0.1)
+    assert time.perf_counter() - start < 5
+
+    StubCommunicate.script = [{"type": "audio", "data": b"y"}]
+    assert backend.synthesize_bytes("Hi", "en-US-AriaNeural", timeout=5) == b"y"
+
+
+def test_synthesize_writes_the_stream_to_disk(edge_tts, tmp_path):
+    StubCommunicate.script = [{"type": "audio", "data": b"abc"}]
+    path = EdgeTTSBackend().synthesize("Hi", "en-US-AriaNeural", str(tmp_path / "out.mp3"))
+    with open(path, "rb") as f:
+        assert f.read() == b"abc"
+    assert list(tmp_path.iterdir()) == [tmp_path / "out.mp3"]
+
+
+def test_fake_backend_length_and_word_timings(tmp_path):
+    backend = FakeTTSBackend(seconds_per_char=0.05, sample_rate=8000)
+    text = "Hi  there"
+    data, words = backend.synthesize_timed(text, "en-US-AriaNeural")
+    with wave.open(io.BytesIO(data)) as wav:
+        assert wav.getframerate() == 8000 and wav.getnframes() == int(len(text) * 0.05 * 8000)
+    assert words == [{"word": "Hi", "start": 0.0, "end": 0.1}, {"word": "there", "start": 0.2, "end": 0.45}]
+    assert backend.synthesize_timed("   ", "en-US-AriaNeural")[1] is None
+
+    # Voices sound different, and the file form matches the in-memory one
+    assert backend.synthesize_bytes(text, "en-GB-SoniaNeural") != data
+    with open(backend.synthesize(text, "en-US-AriaNeural", str(tmp_path / "out.wav")), "rb") as f:
+        assert f.read() == data
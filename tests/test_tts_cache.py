@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from src.tts_cache import TTSCache
+
+VOICE = "en-US-AriaNeural"
+SETTINGS = {"backend": "EdgeTTSBackend", "rate": "+0%", "pitch": "+0Hz"}
+
+
+def parts(cache_dir):
+    return [name for _, _, files in os.walk(cache_dir) for name in files if name.endswith(".part")]
+
+
+def test_key_depends_on_voice_and_prosody_not_whitespace():
+    key = TTSCache.make_key("Hello world", VOICE, SETTINGS)
+    assert TTSCache.make_key("  Hello \n world ", VOICE, SETTINGS) == key
+    # NFKC folds full-width letters to ASCII
+    assert TTSCache.make_key("Ｈｅｌｌｏ world", VOICE, SETTINGS) == key
+    assert TTSCache.make_key("Hello world", "en-GB-SoniaNeural", SETTINGS) != key
+    assert TTSCache.make_key("Hello world", VOICE, dict(SETTINGS, rate="+10%")) != key
+    assert TTSCache.make_key("Hello world", VOICE, dict(SETTINGS, pitch="-5Hz")) != key
+    assert TTSCache.make_key("Hello  World", VOICE, SETTINGS) != key
+
+
+def test_lru_eviction_skips_pinned_entries(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=250)
+    pinned = cache.put_bytes("aa01", b"x" * 100, "mp3", pin=True)
+    cache.put_bytes("bb02", b"x" * 100, "mp3", words=[{"word": "b", "start": 0.0, "end": 0.1}])
+    assert cache.get("aa01") == pinned
+    cache.put_bytes("cc03", b"x" * 100, "mp3")
+
+    # bb02 was least recently used once aa01 was read, and aa01 is pinned anyway
+    assert cache.get("bb02") is None and cache.get("aa01") == pinned
+    assert not any(name.startswith("bb02") for _, _, files in os.walk(tmp_path) for name in files)
+
+    cache.put_bytes("dd04", b"x" * 100, "mp3")
+    assert cache.get("aa01") == pinned and cache.get("cc03") is None
+    assert cache.stats()["bytes"] == 200
+
+    cache.unpin(["aa01"])
+    cache.put_bytes("ee05", b"x" * 100, "mp3")
+    cache.put_bytes("ff06", b"x" * 100, "mp3")
+    assert cache.get("aa01") is None and not os.path.exists(pinned)
+
+
+def test_stats_count_hits_misses_and_evictions(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=150)
+    assert cache.get("aa01") is None
+    cache.put_bytes("aa01", b"x" * 100, "mp3")
+    cache.get("aa01")
+    cache.get("aa01")
+    cache.put_bytes("bb02", b"x" * 100, "mp3")
+    assert cache.stats() == {
+        "hits": 2, "misses": 1, "evictions": 1, "hit_rate": 2 / 3, "entries": 1, "bytes": 100
+    }
+
+
+def test_index_reloads_in_lru_order(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    old = cache.put_bytes("aa01", b"x" * 100, "mp3")
+    new = cache.put_bytes("bb02", b"x" * 100, "mp3", words=[{"word": "hi", "start": 0.0, "end": 0.2}])
+    os.utime(old, (1000, 1000))
+
+    reopened = TTSCache(str(tmp_path), max_bytes=150)
+    # Word sidecars aren't entries of their own; the older clip goes first
+    assert reopened.stats()["entries"] == 1 and reopened.stats()["bytes"] == 100
+    assert reopened.get("bb02") == new and reopened.get("aa01") is None
+    assert reopened.words(new) == [{"word": "hi", "start": 0.0, "end": 0.2}]
+
+
+def test_failed_write_leaves_no_part_file(tmp_path, monkeypatch):
+    cache = TTSCache(str(tmp_path))
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        cache.put_bytes("aa01", b"x" * 100, "mp3")
+    source = tmp_path / "clip.mp3"
+    source.write_bytes(b"x" * 100)
+    with pytest.raises(OSError):
+        cache.put("bb02", str(source), words=[])
+    monkeypatch.undo()
+
+    assert parts(tmp_path) == [] and cache.stats()["entries"] == 0
+
+
+def test_leftover_part_files_are_removed_on_load(tmp_path):
+    leftover = tmp_path / "aa" / "aa01.mp3.1.2.part"
+    leftover.parent.mkdir()
+    leftover.write_bytes(b"x" * 10)
+    cache = TTSCache(str(tmp_path))
+    assert parts(tmp_path) == [] and cache.stats()["entries"] == 0
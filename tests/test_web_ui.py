@@ -0,0 +1,14 @@
+import importlib
+import os
+
+import src.web_ui as web_ui
+
+
+def test_shared_store_is_created_on_first_use(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    module = importlib.reload(web_ui)
+    assert not os.path.exists("jobs")
+
+    store = module.get_shared_store()
+    assert store is module.get_shared_store()
+    assert os.path.isdir("jobs")